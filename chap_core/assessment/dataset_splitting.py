@@ -102,6 +102,50 @@ def train_test_generator(
     return train_set, zip(historic_data, masked_future_data, future_data)
 
 
+def expanding_window_generator(
+        dataset: DataSet,
+        prediction_length: int,
+        n_test_sets: int = 1,
+        stride: int = 1,
+        retrain_every: int = 1,
+        future_weather_provider: Optional[FutureWeatherFetcher] = None,
+) -> Iterable[tuple[DataSet, list[tuple[DataSet, DataSet, DataSet]]]]:
+    """
+    Generate expanding training windows for backtests that retrain the model along the way.
+    The test sets are the same as from `train_test_generator`. They are grouped in windows of retrain_every
+    consecutive test sets, and each window is paired with all the data up until its first split point.
+
+    Parameters
+    ----------
+    dataset
+        The full dataset
+    prediction_length
+        How many periods to predict
+    n_test_sets
+        How many test sets to generate
+    stride
+        How many periods to stride between test sets
+    retrain_every
+        How many test sets to predict with each trained model
+    future_weather_provider
+        A function that can provide future weather data for the test sets
+
+    Returns
+    -------
+    Iterable[tuple[DataSet, list[tuple[DataSet, DataSet, DataSet]]]]
+        Tuples of a train set and the test sets to predict with a model trained on it
+    """
+    assert retrain_every >= 1, retrain_every
+    _, test_generator = train_test_generator(
+        dataset, prediction_length, n_test_sets, stride, future_weather_provider=future_weather_provider
+    )
+    test_sets = list(test_generator)
+    for start in range(0, len(test_sets), retrain_every):
+        window = test_sets[start:start + retrain_every]
+        train_set = window[0][0]
+        yield train_set, window
+
+
 def train_test_split_with_weather(
         data_set: DataSet,
         prediction_start_period: TimePeriod,
@@ -1,5 +1,9 @@
+import queue
+import tempfile
 from collections import defaultdict
-from typing import Protocol, TypeVar, Iterable, Dict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Protocol, TypeVar, Iterable, Dict, Callable, Optional
 
 from gluonts.evaluation import Evaluator
 from gluonts.model import Forecast
@@ -7,7 +11,7 @@ from matplotlib import pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 import pandas as pd
 from chap_core.assessment.dataset_splitting import (
-    train_test_generator,
+    train_test_generator, expanding_window_generator,
 )
 
 from chap_core.data.gluonts_adaptor.dataset import ForecastAdaptor
@@ -39,16 +43,112 @@ class Estimator(Protocol):
     def train(self, data: DataSet) -> Predictor: ...
 
 
+class WarmStartEstimator(Estimator, Protocol):
+    def warm_start(self, data: DataSet, predictor: Predictor) -> Predictor:
+        """Continue training the previously fitted predictor on the (larger) data set"""
+        ...
+
+
 def backtest(estimator: Estimator,
              data: DataSet,
              prediction_length,
-             n_test_sets, stride=1, weather_provider=None) -> Iterable[DataSet]:
+             n_test_sets, stride=1, weather_provider=None, n_workers=1,
+             retrain_every: Optional[int] = None, use_stride: bool = False) -> Iterable[DataSet]:
+    """
+    Train the estimator and predict on n_test_sets consecutive splits of the data. With use_stride,
+    the splits are stride periods apart instead; stride is otherwise ignored, as it always has been.
+
+    By default the estimator is trained once, on the data before the first split. If retrain_every
+    is given, the estimator is retrained on an expanding window at every retrain_every'th split,
+    and the following splits are predicted with that model. Estimators implementing `warm_start`
+    are retrained sequentially from the previous model, other estimators are retrained concurrently.
+    The splits are the same with and without retraining.
+    """
+    stride = stride if use_stride else 1
+    if retrain_every is not None:
+        yield from _expanding_window_backtest(estimator, data, prediction_length, n_test_sets, stride,
+                                              weather_provider, n_workers, retrain_every)
+        return
     train, test_generator = train_test_generator(
-        data, prediction_length, n_test_sets, future_weather_provider=weather_provider
+        data, prediction_length, n_test_sets, stride, future_weather_provider=weather_provider
     )
     predictor = estimator.train(train)
-    for historic_data, future_data, _ in test_generator:
-        yield predictor.predict(historic_data, future_data)
+    if n_workers <= 1:
+        for historic_data, future_data, _ in test_generator:
+            yield predictor.predict(historic_data, future_data)
+        return
+    yield from _predict_splits(predictor, test_generator, n_workers)
+
+
+def _expanding_window_backtest(estimator: Estimator, data: DataSet, prediction_length, n_test_sets, stride,
+                               weather_provider, n_workers, retrain_every) -> Iterable[DataSet]:
+    windows = expanding_window_generator(data, prediction_length, n_test_sets, stride, retrain_every,
+                                         future_weather_provider=weather_provider)
+    if hasattr(estimator, "warm_start"):
+        predictor = None
+        for train, test_sets in windows:
+            if predictor is None:
+                predictor = estimator.train(train)
+            else:
+                predictor = estimator.warm_start(train, predictor)
+            yield from _predict_splits(predictor, test_sets, n_workers)
+        return
+
+    def train_and_predict(worker_estimator, window):
+        train, test_sets = window
+        predictor = worker_estimator.train(train)
+        return [predictor.predict(historic_data, future_data) for historic_data, future_data, _ in test_sets]
+
+    for predictions in _map_isolated(estimator, train_and_predict, list(windows), n_workers):
+        yield from predictions
+
+
+def _predict_splits(predictor: Predictor,
+                    test_generator: Iterable[tuple[DataSet, DataSet, DataSet]],
+                    n_workers: int = 1) -> list[DataSet]:
+    """
+    Run predict for every split in the test generator, using up to n_workers threads.
+    The predictions are returned in the same order as the splits.
+    """
+    splits = [(historic_data, future_data) for historic_data, future_data, _ in test_generator]
+    return _map_isolated(predictor, lambda worker_predictor, split: worker_predictor.predict(*split),
+                         splits, n_workers)
+
+
+def _map_isolated(model, func: Callable, items: list, n_workers: int = 1) -> list:
+    """
+    Return [func(model, item) for item in items], running up to n_workers items concurrently in threads.
+
+    Models that write to disk (e.g. ExternalModel) can implement `with_working_dir`, in which case
+    each worker gets its own copy of the model working in a separate temporary directory.
+    """
+    n_workers = min(n_workers, len(items))
+    if n_workers <= 1:
+        return [func(model, item) for item in items]
+
+    with ExitStack() as stack:
+        models = queue.SimpleQueue()
+        for _ in range(n_workers):
+            if hasattr(model, "with_working_dir"):
+                working_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="chap_backtest_"))
+                worker_model = model.with_working_dir(working_dir)
+                if hasattr(worker_model, "close"):
+                    # stop e.g. model server processes before their working dir is removed
+                    stack.callback(worker_model.close)
+                models.put(worker_model)
+            else:
+                models.put(model)
+
+        def run(item):
+            worker_model = models.get()
+            try:
+                return func(worker_model, item)
+            finally:
+                models.put(worker_model)
+
+        logger.info(f"Running {len(items)} tasks using {n_workers} workers")
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            return list(executor.map(run, items))
 
 
 def evaluate_model(
@@ -58,6 +158,7 @@ def evaluate_model(
         n_test_sets=4,
         report_filename=None,
         weather_provider=None,
+        n_workers=1,
 ):
     """
     Evaluate a model on a dataset on a held out test set, making multiple predictions on the test set
@@ -73,6 +174,8 @@ def evaluate_model(
         The number of periods to predict ahead
     n_test_sets : int
         The number of test sets to evaluate on
+    n_workers : int
+        The number of test sets to predict concurrently
 
     Returns
     -------
@@ -99,7 +202,8 @@ def evaluate_model(
         _, plot_test_generatro = train_test_generator(
             data, prediction_length, n_test_sets, future_weather_provider=weather_provider
         )
-        forecasts_and_truths_generator = plot_forecasts(predictor, plot_test_generatro, truth_data, report_filename)
+        forecasts_and_truths_generator = plot_forecasts(predictor, plot_test_generatro, truth_data, report_filename,
+                                                        n_workers=n_workers)
 
     logger.info("Getting forecasts")
     #forecast_list, tss = _get_forecast_generators(predictor, test_generator, truth_data)
@@ -143,21 +247,22 @@ def _get_forecast_generators(
     return forecast_list, tss
 
 
-def _get_forecast_dict(predictor: Predictor, test_generator) -> dict[str, list[Forecast]]:
+def _get_forecast_dict(predictor: Predictor, test_generator, n_workers=1) -> dict[str, list[Forecast]]:
     forecast_dict = defaultdict(list)
-
-    for historic_data, future_data, _ in test_generator:
+    test_sets = list(test_generator)
+    for historic_data, future_data, _ in test_sets:
         assert (
                 len(future_data.period_range) > 0
         ), f"Future data must have at least one period {historic_data.period_range}, {future_data.period_range}"
-        forecasts = predictor.predict(historic_data, future_data)
+
+    for forecasts in _predict_splits(predictor, test_sets, n_workers):
         for location, samples in forecasts.items():
             forecast_dict[location].append(ForecastAdaptor.from_samples(samples))
     return forecast_dict
 
 
-def plot_forecasts(predictor, test_instance, truth, pdf_filename):
-    forecast_dict = _get_forecast_dict(predictor, test_instance)
+def plot_forecasts(predictor, test_instance, truth, pdf_filename, n_workers=1):
+    forecast_dict = _get_forecast_dict(predictor, test_instance, n_workers=n_workers)
     with PdfPages(pdf_filename) as pdf:
         for location, forecasts in forecast_dict.items():
             logging.info(f"Running on location {location}")
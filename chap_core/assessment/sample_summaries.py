@@ -0,0 +1,117 @@
+"""
+Summaries of forecast samples computed for whole prediction datasets at once.
+
+The samples of all locations and periods are stacked into one (n_rows, n_samples) array, and all requested
+quantiles are computed in a single np.quantile call, which partitions each row once for all quantile levels.
+The results are kept columnar (one array per column) and only turned into records or dataclasses at the end.
+"""
+import dataclasses
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from chap_core.datatypes import Samples, SummaryStatistics
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet, DenseDataSet
+
+
+def _stack_samples(predictions: DataSet[Samples]) -> tuple[DenseDataSet[Samples], np.ndarray]:
+    """The predictions as a dense dataset, and its samples as an (n_locations, n_periods, n_samples) array"""
+    dense = DenseDataSet.from_dataset(predictions)
+    return dense, np.asarray(dense.fields["samples"], dtype=float)
+
+
+def sample_quantiles(samples: np.ndarray, quantile_levels: Sequence[float]) -> np.ndarray:
+    """Quantiles over the last axis of samples, with the quantile levels as the last axis of the result"""
+    return np.moveaxis(np.quantile(samples, quantile_levels, axis=-1), 0, -1)
+
+
+@dataclasses.dataclass
+class QuantileTable:
+    """
+    Quantiles of forecast samples in columnar form. Each row is one forecast (org unit, period and the
+    split period it was predicted from), and values has one column per quantile level.
+    """
+
+    org_units: np.ndarray
+    periods: np.ndarray
+    split_periods: np.ndarray
+    quantile_levels: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    def from_samples(cls, org_units: Sequence[str], periods: Sequence[str], samples: np.ndarray,
+                     quantile_levels: Sequence[float], split_periods: Optional[Sequence[str]] = None) -> "QuantileTable":
+        """Quantiles of the (n_rows, n_samples) array samples, where row i is the forecast of org_units[i], periods[i]"""
+        n_rows = len(org_units)
+        if n_rows == 0:
+            values = np.empty((0, len(quantile_levels)))
+        else:
+            values = sample_quantiles(np.asarray(samples, dtype=float), quantile_levels)
+        return cls(
+            np.asarray(org_units, dtype=object),
+            np.asarray(periods, dtype=object),
+            np.asarray(split_periods if split_periods is not None else [None] * n_rows, dtype=object),
+            np.asarray(quantile_levels, dtype=float),
+            values,
+        )
+
+    @classmethod
+    def from_dataset(cls, predictions: DataSet[Samples], quantile_levels: Sequence[float],
+                     split_period: Optional[str] = None) -> "QuantileTable":
+        dense, samples = _stack_samples(predictions)
+        locations = list(dense.keys())
+        period_ids = [period.id for period in dense.period_range]
+        n_rows = len(locations) * len(period_ids)
+        return cls(
+            np.repeat(np.asarray(locations, dtype=object), len(period_ids)),
+            np.tile(np.asarray(period_ids, dtype=object), len(locations)),
+            np.full(n_rows, split_period, dtype=object),
+            np.asarray(quantile_levels, dtype=float),
+            sample_quantiles(samples, quantile_levels).reshape(n_rows, len(quantile_levels)),
+        )
+
+    @classmethod
+    def concatenate(cls, tables: Iterable["QuantileTable"]) -> "QuantileTable":
+        tables = list(tables)
+        assert all(np.array_equal(table.quantile_levels, tables[0].quantile_levels) for table in tables)
+        return cls(
+            *(np.concatenate([getattr(table, name) for table in tables])
+              for name in ("org_units", "periods", "split_periods")),
+            tables[0].quantile_levels,
+            np.concatenate([table.values for table in tables]),
+        )
+
+    def __len__(self):
+        return len(self.org_units)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Long format with one row per (forecast, quantile level), ordered by forecast"""
+        n_levels = len(self.quantile_levels)
+        return pd.DataFrame({
+            "orgUnit": np.repeat(self.org_units, n_levels),
+            "period": np.repeat(self.periods, n_levels),
+            "quantile": np.tile(self.quantile_levels, len(self)),
+            "value": self.values.ravel(),
+            "splitPeriod": np.repeat(self.split_periods, n_levels),
+        })
+
+    def to_records(self) -> list[dict]:
+        """One dict per (forecast, quantile level), with the fields of EvaluationEntry"""
+        return self.to_pandas().to_dict("records")
+
+
+def summarize_samples(predictions: DataSet[Samples], q_low=0.25, q_high=0.75) -> DataSet[SummaryStatistics]:
+    """Samples.summaries for all locations of predictions, computed on the stacked samples"""
+    dense, samples = _stack_samples(predictions)
+    median, quantile_low, quantile_high = np.quantile(samples, [0.5, q_low, q_high], axis=-1)
+    fields = {
+        "mean": samples.mean(axis=-1),
+        "median": median,
+        "std": samples.std(axis=-1),
+        "min": samples.min(axis=-1),
+        "max": samples.max(axis=-1),
+        "quantile_low": quantile_low,
+        "quantile_high": quantile_high,
+    }
+    return DataSet._from_field_arrays(SummaryStatistics, dense.period_range, list(dense.keys()), fields)
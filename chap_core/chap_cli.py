@@ -11,6 +11,7 @@ from cyclopts import App
 from chap_core.api_types import PredictionRequest
 from chap_core.assessment.forecast import forecast_ahead
 from chap_core.assessment.prediction_evaluator import evaluate_model
+from chap_core.assessment.sample_summaries import summarize_samples
 from chap_core.datatypes import FullData
 from chap_core.rest_api_src.worker_functions import dataset_from_request_v1
 from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
@@ -126,7 +127,7 @@ def predict(
     model = registry.get_model(model_id)
     samples = forecast_ahead(model, data_set, prediction_length)
     if do_summary:
-        predictions = DataSet({location: samples.summaries() for location, samples in samples.items()})
+        predictions = summarize_samples(samples)
     else:
         predictions = samples
     predictions.to_csv(output_filename)
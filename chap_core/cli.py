@@ -284,7 +284,7 @@ class AreaPolygons: ...
 
 @app.command()
 def backtest(data_filename: Path, model_name: registry.model_type, out_folder: Path, prediction_length: int = 12,
-             n_test_sets: int = 20, stride: int = 2):
+             n_test_sets: int = 20, stride: int = 2, n_workers: int = 1, retrain_every: Optional[int] = None):
     """
     Run a backtest on a dataset using the specified model
 
@@ -292,6 +292,8 @@ def backtest(data_filename: Path, model_name: registry.model_type, out_folder: P
         data_filename: Path: Path to the data file
         model_name: str: Name of the model to use
         out_folder: Path: Path to the output folder
+        n_workers: int: Number of test sets to predict concurrently
+        retrain_every: int: If given, retrain the model on an expanding window every retrain_every test sets
     """
     dataset = DataSet.from_csv(data_filename, FullData)
     print(dataset)
@@ -299,7 +301,8 @@ def backtest(data_filename: Path, model_name: registry.model_type, out_folder: P
     logger.info(f"Dataset period range: {dataset.period_range}, locations: {list(dataset.locations())}")
     estimator = registry.get_model(model_name)
     predictions_list = _backtest(estimator, dataset, prediction_length=prediction_length,
-                                 n_test_sets=n_test_sets, stride=stride, weather_provider=QuickForecastFetcher)
+                                 n_test_sets=n_test_sets, stride=stride, weather_provider=QuickForecastFetcher,
+                                 n_workers=n_workers, retrain_every=retrain_every)
     response = samples_to_evaluation_response(
         predictions_list,
         quantiles=[0.05, 0.25, 0.5, 0.75, 0.95],
@@ -314,6 +317,32 @@ def backtest(data_filename: Path, model_name: registry.model_type, out_folder: P
         out_file.write(serialized_response)
 
 
+@app.command()
+def build_environments(model_paths: Optional[list[str]] = None):
+    """
+    Build and cache the python environments of models, so that they are not built when the models are run
+
+    Parameters:
+        model_paths: list[str]: Model directories or github urls pinned to a commit. Defaults to all registry models
+    """
+    from chap_core.external.environment_pool import prewarm_environments, prewarm_registry_environments
+    env_dirs = prewarm_environments(model_paths) if model_paths else prewarm_registry_environments()
+    for env_dir in env_dirs:
+        print(env_dir)
+
+
+@app.command()
+def list_environments():
+    """
+    List the cached model environments
+    """
+    from chap_core.external.environment_pool import get_environment_pool
+    for environment in get_environment_pool().list_environments():
+        python_env = environment["python_env"]
+        print(f"{environment['hash']}  python {python_env.get('python', '-')}  created {environment['created']}  "
+              f"{environment['project']}")
+
+
 def main_function():
     """
     This function should just be type hinted with common types,
@@ -1,61 +1,174 @@
 import dataclasses
-from collections import defaultdict
+import threading
+from typing import Optional
 
 import numpy as np
-from sklearn import linear_model
 
 from .datatypes import ClimateData, SimpleClimateData
-from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet, DenseDataSet
 from chap_core.time_period import PeriodRange, Month, Week
 
 
-def get_climate_predictor(train_data: DataSet[ClimateData]):
+def get_climate_predictor(train_data: DataSet[ClimateData], trend: bool = False,
+                          cache: Optional["SeasonalStatisticsCache"] = None):
     if isinstance(train_data.period_range[0], Month):
-        estimator = MonthlyClimatePredictor()
+        estimator = MonthlyClimatePredictor(trend)
     else:
         assert isinstance(train_data.period_range[0], Week)
-        estimator = WeeklyClimatePredictor()
-    estimator.train(train_data)
+        estimator = WeeklyClimatePredictor(trend)
+    estimator.train(train_data, cache)
     return estimator
 
 
-class MonthlyClimatePredictor:
+@dataclasses.dataclass
+class SeasonalStatistics:
+    """
+    Sums over the observed (non-nan) values of each (location, season, field), from which the seasonal
+    profiles and trends are computed. The sums are additive over periods, so the statistics of a longer
+    training period are the statistics of a shorter one plus those of the extra periods.
+    """
+    count: np.ndarray
+    sum_y: np.ndarray
+    sum_t: np.ndarray
+    sum_tt: np.ndarray
+    sum_ty: np.ndarray
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, season_index: np.ndarray, t: np.ndarray, n_seasons: int):
+        """values has shape (n_locations, n_periods, n_fields), season_index and t have shape (n_periods,)"""
+        observed = ~np.isnan(values)
+        y = np.where(observed, values, 0.0)
+        one_hot = (season_index[:, None] == np.arange(n_seasons)).astype(float).T
+        one_hot_t = one_hot * t
+        return cls(
+            one_hot @ observed,
+            one_hot @ y,
+            one_hot_t @ observed,
+            (one_hot_t * t) @ observed,
+            one_hot_t @ y,
+        )
+
+    def __add__(self, other: "SeasonalStatistics") -> "SeasonalStatistics":
+        return SeasonalStatistics(*(getattr(self, f.name) + getattr(other, f.name) for f in dataclasses.fields(self)))
+
+    def __sub__(self, other: "SeasonalStatistics") -> "SeasonalStatistics":
+        return SeasonalStatistics(*(getattr(self, f.name) - getattr(other, f.name) for f in dataclasses.fields(self)))
+
+
+class SeasonalStatisticsCache:
+    """
+    Keeps the training values and statistics of the last training, so that training on data that shares a
+    prefix with it (like the expanding training sets of a backtest) only processes the periods that differ.
+    """
+
     def __init__(self):
-        self._models = defaultdict(dict)
-        self._cls = None
+        self._lock = threading.Lock()
+        self._key = None
+        self._values = None
+        self._season_index = None
+        self._t = None
+        self._statistics = None
+
+    def statistics(self, key, values: np.ndarray, season_index: np.ndarray, t: np.ndarray, n_seasons: int):
+        with self._lock:
+            n_shared = 0
+            if key == self._key:
+                n_shared = min(values.shape[1], self._values.shape[1])
+                if not np.array_equal(values[:, :n_shared], self._values[:, :n_shared], equal_nan=True):
+                    n_shared = 0
+            if n_shared == 0:
+                statistics = SeasonalStatistics.from_values(values, season_index, t, n_seasons)
+            elif values.shape[1] >= self._values.shape[1]:
+                statistics = self._statistics + SeasonalStatistics.from_values(
+                    values[:, n_shared:], season_index[n_shared:], t[n_shared:], n_seasons)
+            else:
+                statistics = self._statistics - SeasonalStatistics.from_values(
+                    self._values[:, n_shared:], self._season_index[n_shared:], self._t[n_shared:], n_seasons)
+            self._key, self._values, self._season_index, self._t = key, values, season_index, t
+            self._statistics = statistics
+            return statistics
+
+
+_statistics_cache = SeasonalStatisticsCache()
+
 
-    def _feature_matrix(self, time_period: PeriodRange):
-        return time_period.month[:, None] == np.arange(1, 13)
-
-    def train(self, train_data: DataSet[ClimateData]):
-        train_data = train_data.remove_field("disease_cases")
-        for location, data in train_data.items():
-            self._cls = data.__class__
-            x = self._feature_matrix(data.time_period)
-            for field in dataclasses.fields(data):
-                if field.name in ("time_period"):
-                    continue
-                y = getattr(data, field.name)
-                model = linear_model.LinearRegression()
-                model.fit(x, y[:, None])
-                self._models[location][field.name] = model
+class MonthlyClimatePredictor:
+    """
+    Predicts each climate field as the mean per season (month of year) for each location, optionally with a
+    linear trend per location and field. Profiles for all locations and fields are computed in one pass over
+    the stacked training data, and seasons with no observations are predicted by the overall mean.
+    """
+
+    n_seasons = 12
+
+    def __init__(self, trend: bool = False):
+        self._trend = trend
+        self._cls = None
+        self._locations = None
+        self._field_names = None
+        self._profiles = None
+        self._slopes = None
+        self._start_ordinal = None
+        self._step = None
+
+    def _season_index(self, time_period: PeriodRange) -> np.ndarray:
+        return time_period.month - 1
+
+    def _time_index(self, time_period: PeriodRange) -> np.ndarray:
+        return (time_period.ordinals - self._start_ordinal) / self._step
+
+    def train(self, train_data: DataSet[ClimateData], cache: Optional[SeasonalStatisticsCache] = None):
+        train_data = DenseDataSet.from_dataset(train_data).remove_field("disease_cases")
+        self._cls = next(iter(train_data.values())).__class__
+        self._locations = list(train_data.keys())
+        self._field_names = list(train_data.fields)
+        period_range = train_data.period_range
+        self._start_ordinal = period_range.ordinals[0]
+        self._step = period_range.ordinals[1] - self._start_ordinal if len(period_range) > 1 else 1
+        values = np.stack([train_data.fields[name] for name in self._field_names], axis=-1).astype(float)
+        season_index, t = self._season_index(period_range), self._time_index(period_range)
+        if cache is None:
+            statistics = SeasonalStatistics.from_values(values, season_index, t, self.n_seasons)
+        else:
+            key = (type(self), tuple(self._locations), tuple(self._field_names), period_range[0].id)
+            statistics = cache.statistics(key, values, season_index, t, self.n_seasons)
+        self._fit(statistics)
+
+    def _fit(self, statistics: SeasonalStatistics):
+        count = statistics.count
+        total = count.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self._trend:
+                # slope of the model y = profile[season] + slope * t, from the within-season (co)variances
+                observed = count > 0
+                s_tt = np.where(observed, statistics.sum_tt - statistics.sum_t ** 2 / count, 0).sum(axis=1, keepdims=True)
+                s_ty = np.where(observed, statistics.sum_ty - statistics.sum_t * statistics.sum_y / count, 0).sum(
+                    axis=1, keepdims=True)
+                slopes = np.where(s_tt > 0, s_ty / s_tt, 0.0)
+            else:
+                slopes = np.zeros_like(total)
+            detrended = statistics.sum_y - slopes * statistics.sum_t
+            overall = detrended.sum(axis=1, keepdims=True) / total
+            profiles = np.where(count > 0, detrended / count, overall)
+        self._profiles = profiles
+        self._slopes = slopes[:, 0]
 
     def predict(self, time_period: PeriodRange):
-        x = self._feature_matrix(time_period)
-        prediction_dict = {}
-        for location, models in self._models.items():
-            prediction_dict[location] = self._cls(
-                time_period,
-                **{field: model.predict(x).ravel() for field, model in models.items()},
-            )
-        return DataSet(prediction_dict)
+        season_index = self._season_index(time_period)
+        predictions = self._profiles[:, season_index]
+        if self._trend:
+            predictions = predictions + self._time_index(time_period)[None, :, None] * self._slopes[:, None, :]
+        fields = {name: predictions[..., i] for i, name in enumerate(self._field_names)}
+        return DataSet._from_field_arrays(self._cls, time_period, self._locations, fields)
 
 
 class WeeklyClimatePredictor(MonthlyClimatePredictor):
-    def _feature_matrix(self, time_period: PeriodRange):
-        t = time_period.week[:, None] == np.arange(1, 53)
-        t[..., -1] |= time_period.week == 53
-        return t
+    """Seasonal profiles by week of year. Week 53 shares its profile with week 52"""
+
+    n_seasons = 52
+
+    def _season_index(self, time_period: PeriodRange) -> np.ndarray:
+        return np.minimum(time_period.week, 52) - 1
 
 
 class FutureWeatherFetcher:
@@ -70,8 +183,13 @@ class SeasonalForecastFetcher:
 
 
 class QuickForecastFetcher:
-    def __init__(self, historical_data: DataSet[SimpleClimateData]):
-        self._climate_predictor = get_climate_predictor(historical_data)
+    """
+    Future weather from the seasonal profiles of the historical data. The training statistics are shared
+    between fetchers, so the fetchers for the splits of a backtest only process the periods added by each split.
+    """
+
+    def __init__(self, historical_data: DataSet[SimpleClimateData], trend: bool = False):
+        self._climate_predictor = get_climate_predictor(historical_data, trend, cache=_statistics_cache)
 
     def get_future_weather(self, period_range: PeriodRange) -> DataSet[SimpleClimateData]:
         return self._climate_predictor.predict(period_range)
@@ -0,0 +1,73 @@
+import csv
+import io
+import itertools
+import json
+import logging
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel
+
+from chap_core.training_control import TrainingControl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+def _batched(rows: Iterable[tuple], batch_size: int):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def _copy_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        # JSON columns
+        return json.dumps(value)
+    return value
+
+
+def _copy_batch(session: Session, table_name: str, columns: Sequence[str], batch: list[tuple]):
+    """Write a batch of rows through PostgreSQL COPY on the session's own connection"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_copy_value(value) for value in row] for row in batch)
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def bulk_insert(
+    session: Session,
+    model: type[SQLModel],
+    columns: Sequence[str],
+    rows: Iterable[tuple],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    control: Optional[TrainingControl] = None,
+) -> int:
+    """
+    Insert rows (tuples ordered as `columns`) into the table of `model` in batches, without creating ORM objects.
+    Uses COPY on PostgreSQL and executemany inserts on other databases (i.e. SQLite).
+    Rows are consumed lazily, so they can be streamed from a generator.
+    Does not commit, so the insert is part of the session's current transaction.
+    Returns the number of inserted rows.
+    """
+    table = model.__table__
+    use_copy = session.get_bind().dialect.name == "postgresql"
+    n_rows = 0
+    for batch in _batched(rows, batch_size):
+        if use_copy:
+            _copy_batch(session, table.name, columns, batch)
+        else:
+            session.execute(insert(table), [dict(zip(columns, row)) for row in batch])
+        n_rows += len(batch)
+        if control is not None:
+            control.register_progress(len(batch))
+        logger.debug(f"Inserted {n_rows} rows into {table.name}")
+    return n_rows
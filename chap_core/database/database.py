@@ -1,23 +1,38 @@
 import dataclasses
 import time
-from typing import Optional
+from typing import Iterator, Optional, Literal, Sequence
 
+import numpy as np
 import psycopg2
 import sqlalchemy
-from sqlmodel import SQLModel, create_engine, Session, select
-from .tables import BackTest, BackTestForecast, Prediction, PredictionForecast
+from sqlalchemy import func
+from sqlalchemy.orm import defer
+from sqlmodel import SQLModel, create_engine, Session, select, delete
+from .tables import BackTest, BackTestForecast, BackTestQuantiles, ForecastSamples, Prediction, PredictionForecast
 from .model_spec_tables import seeded_feature_types, seeded_models
 from .debug import DebugEntry
-from .dataset_tables import Observation, DataSet
+from .dataset_tables import Observation, ObservationBase, DataSet, DataSetArrays, DataSetVersion
+from .bulk_insert import bulk_insert, DEFAULT_BATCH_SIZE
 # CHeck if CHAP_DATABASE_URL is set in the environment
 import os
 
-from chap_core.time_period import TimePeriod
+from chap_core.time_period import TimePeriod, PeriodRange
+from ..assessment.sample_summaries import QuantileTable
+from ..training_control import TrainingControl
 from ..spatio_temporal_data.converters import observations_to_dataset
-from ..spatio_temporal_data.temporal_dataclass import DataSet as _DataSet
+from ..datatypes import create_tsdataclass
+from ..spatio_temporal_data.temporal_dataclass import DataSet as _DataSet, DenseDataSet
 import logging
 logger = logging.getLogger(__name__)
 engine = None
+
+# Quantile levels stored with each backtest, so that requests for them do not need the forecast samples
+STANDARD_QUANTILES = (0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.975)
+
+ForecastStorage = Literal["forecasts", "arrays"]
+DEFAULT_FORECAST_STORAGE: ForecastStorage = os.getenv("CHAP_FORECAST_STORAGE", "forecasts")
+DatasetStorage = Literal["observations", "arrays"]
+DEFAULT_DATASET_STORAGE: DatasetStorage = os.getenv("CHAP_DATASET_STORAGE", "observations")
 database_url = os.getenv("CHAP_DATABASE_URL", default=None)
 logger.info(f"Database url: {database_url}")
 if database_url is not None:
@@ -67,53 +82,449 @@ class SessionWrapper:
             self.session.commit()
         return model
 
-    def add_evaluation_results(self, evaluation_results, last_train_period: TimePeriod, dataset_id, model_id):
+    def add_evaluation_results(self, evaluation_results, last_train_period: TimePeriod, dataset_id, model_id,
+                               storage: ForecastStorage = DEFAULT_FORECAST_STORAGE, batch_size=DEFAULT_BATCH_SIZE,
+                               control: Optional[TrainingControl] = None):
+        """
+        Store the forecasts of a backtest and return its id. With storage='forecasts' each forecast is stored as a
+        BackTestForecast row. With storage='arrays' the samples of each split are stored as one float32 array in
+        ForecastSamples. evaluation_results is consumed lazily, and each split is written as soon as it is produced,
+        so the results of a backtest never have to be held in memory together.
+        """
         backtest = BackTest(dataset_id=dataset_id,
                             model_id=model_id,
                             last_train_period=last_train_period.id)
         self.session.add(backtest)
-        for eval_result in evaluation_results:
-            first_period: TimePeriod = eval_result.period_range[0]
-            for location, samples in eval_result.items():
-                for period, value in zip(eval_result.period_range, samples.samples):
-                    forecast = BackTestForecast(period=period.id, org_unit=location,
-                                                last_train_period=last_train_period.id,
-                                                last_seen_period=first_period.id, values=value.tolist())
-                    backtest.forecasts.append(forecast)
+        self.session.flush()
+        quantile_tables = []
+        splits = self._with_quantile_tables(evaluation_results, quantile_tables)
+        if storage == "arrays":
+            for eval_result in splits:
+                forecast_samples = self._forecast_samples(eval_result, backtest_id=backtest.id,
+                                                          last_train_period=last_train_period.id,
+                                                          last_seen_period=eval_result.period_range[0].id)
+                self.session.add(forecast_samples)
+                self.session.flush()
+                self.session.expunge(forecast_samples)
+        else:
+            rows = (row for eval_result in splits
+                    for row in self._backtest_forecast_rows(eval_result, backtest.id, last_train_period.id))
+            n_rows = bulk_insert(self.session, BackTestForecast,
+                                 ("backtest_id", "period", "org_unit", "last_train_period", "last_seen_period", "values"),
+                                 rows, batch_size=batch_size, control=control)
+            logger.info(f"Added {n_rows} forecasts to backtest {backtest.id}")
+        if quantile_tables:
+            self.session.add(self._backtest_quantiles(backtest.id, QuantileTable.concatenate(quantile_tables)))
         self.session.commit()
         return backtest.id
 
-    def add_predictions(self, predictions, dataset_id, model_id):
+    @staticmethod
+    def _with_quantile_tables(evaluation_results, quantile_tables: list[QuantileTable]):
+        """Yields the evaluation results, adding the quantile table of each to quantile_tables on the way"""
+        for eval_result in evaluation_results:
+            quantile_tables.append(QuantileTable.from_dataset(eval_result, STANDARD_QUANTILES,
+                                                              split_period=eval_result.period_range[0].id))
+            yield eval_result
+
+    @staticmethod
+    def _backtest_forecast_rows(eval_result: _DataSet, backtest_id: int, last_train_period: str):
+        """One (backtest_id, period, org_unit, last_train_period, last_seen_period, values) tuple per forecast"""
+        period_ids = [period.id for period in eval_result.period_range]
+        for location, samples in eval_result.items():
+            for period_id, values in zip(period_ids, samples.samples.tolist()):
+                yield backtest_id, period_id, location, last_train_period, period_ids[0], values
+
+    @staticmethod
+    def _backtest_quantiles(backtest_id: int, table: QuantileTable) -> BackTestQuantiles:
+        return BackTestQuantiles(backtest_id=backtest_id,
+                                 quantile_levels=table.quantile_levels.tolist(),
+                                 org_units=[str(org_unit) for org_unit in table.org_units],
+                                 periods=table.periods.tolist(),
+                                 split_periods=table.split_periods.tolist(),
+                                 values=table.values.astype(float).tobytes())
+
+    def get_evaluation_quantiles(self, backtest_id: int, quantiles: Sequence[float]) -> QuantileTable:
+        """
+        Quantiles of the forecasts of a backtest. Answered from the quantiles stored with the backtest when
+        all requested levels are stored, and otherwise computed from the forecast samples.
+        """
+        stored = self.session.exec(select(BackTestQuantiles).where(BackTestQuantiles.backtest_id == backtest_id)).first()
+        if stored is not None:
+            levels = np.asarray(stored.quantile_levels)
+            matches = np.isclose(np.asarray(quantiles, dtype=float)[:, None], levels)
+            if matches.any(axis=1).all():
+                values = np.frombuffer(bytearray(stored.values), dtype=float).reshape(len(stored.org_units), len(levels))
+                return QuantileTable(np.asarray(stored.org_units, dtype=object),
+                                     np.asarray(stored.periods, dtype=object),
+                                     np.asarray(stored.split_periods, dtype=object),
+                                     np.asarray(quantiles, dtype=float),
+                                     values[:, matches.argmax(axis=1)])
+        stored_samples = self._get_forecast_samples(ForecastSamples.backtest_id == backtest_id)
+        if stored_samples:
+            return QuantileTable.concatenate(
+                QuantileTable.from_samples(*self._forecast_samples_index(samples),
+                                           self._forecast_samples_array(samples).reshape(-1, samples.n_samples),
+                                           quantiles,
+                                           split_periods=[samples.last_seen_period] * samples.n_periods * len(samples.org_units))
+                for samples in stored_samples)
+        forecasts = self.session.get(BackTest, backtest_id).forecasts
+        return QuantileTable.from_samples(
+            [forecast.org_unit for forecast in forecasts],
+            [forecast.period for forecast in forecasts],
+            np.array([forecast.values for forecast in forecasts], dtype=float),
+            quantiles,
+            split_periods=[forecast.last_seen_period for forecast in forecasts],
+        )
+
+    @staticmethod
+    def _forecast_samples(predictions: _DataSet, **keys) -> ForecastSamples:
+        dense = DenseDataSet.from_dataset(predictions)
+        samples = np.asarray(dense.fields["samples"], dtype=np.float32)
+        return ForecastSamples(start_period=dense.period_range[0].id,
+                               n_periods=len(dense.period_range),
+                               n_samples=samples.shape[-1],
+                               org_units=[str(location) for location in dense.keys()],
+                               values=samples.tobytes(),
+                               **keys)
+
+    def _get_forecast_samples(self, *where, load_values=True) -> list[ForecastSamples]:
+        """The stored samples matching where. Without load_values, each values blob is only loaded when accessed"""
+        query = select(ForecastSamples).where(*where).order_by(ForecastSamples.id)
+        if not load_values:
+            query = query.options(defer(ForecastSamples.values))
+        return self.session.exec(query).all()
+
+    @classmethod
+    def _forecast_samples_array(cls, samples: ForecastSamples) -> np.ndarray:
+        """The samples as an (n_org_units, n_periods, n_samples) array backed by the stored bytes, without copying"""
+        cls._check_samples_length(samples, len(samples.values))
+        return np.frombuffer(samples.values, dtype=np.float32).reshape(
+            len(samples.org_units), samples.n_periods, samples.n_samples)
+
+    @staticmethod
+    def _check_samples_length(samples: ForecastSamples, n_bytes: int):
+        """Raise a ValueError if the stored array does not have the size given by its org units, periods and samples"""
+        expected = len(samples.org_units) * samples.n_periods * samples.n_samples * np.dtype(np.float32).itemsize
+        if n_bytes != expected:
+            raise ValueError(f"Forecast samples {samples.id} has {n_bytes} bytes, expected {expected} for "
+                             f"{len(samples.org_units)} org units, {samples.n_periods} periods "
+                             f"and {samples.n_samples} samples")
+
+    @staticmethod
+    def _period_range(samples: ForecastSamples) -> PeriodRange:
+        return PeriodRange.from_start_and_n_periods(TimePeriod.from_id(samples.start_period), samples.n_periods)
+
+    @classmethod
+    def _period_ids(cls, samples: ForecastSamples) -> list[str]:
+        return [period.id for period in cls._period_range(samples)]
+
+    @classmethod
+    def _forecast_samples_index(cls, samples: ForecastSamples) -> tuple[np.ndarray, np.ndarray]:
+        """The org unit and period of each forecast, in the order of the flattened array"""
+        period_ids = cls._period_ids(samples)
+        return (np.repeat(np.asarray(samples.org_units, dtype=object), len(period_ids)),
+                np.tile(np.asarray(period_ids, dtype=object), len(samples.org_units)))
+
+    @classmethod
+    def _sample_offset(cls, samples: ForecastSamples, org_unit: str, period: str) -> Optional[int]:
+        """Byte offset of the samples for org_unit and period in the stored array, or None if they are not in it"""
+        if org_unit not in samples.org_units:
+            return None
+        period_range = cls._period_range(samples)
+        position = int(period_range.searchsorted(TimePeriod.from_id(period)))
+        if position >= len(period_range) or period_range[position].id != period:
+            return None
+        row = samples.org_units.index(org_unit) * samples.n_periods + position
+        return row * samples.n_samples * np.dtype(np.float32).itemsize
+
+    def get_backtest_forecasts(self, backtest_id: int) -> Iterator[BackTestForecast]:
+        """
+        The forecasts of a backtest regardless of how they are stored. With storage='arrays' the stored arrays are
+        loaded and decoded one split at a time while iterating, so only the forecasts that are kept by the caller
+        stay in memory. A caller that needs all of them, like the backtest endpoint, still holds them all as lists.
+        """
+        stored_samples = self._get_forecast_samples(ForecastSamples.backtest_id == backtest_id, load_values=False)
+        if not stored_samples:
+            yield from self.session.get(BackTest, backtest_id).forecasts
+            return
+        for samples in stored_samples:
+            for org_unit, period, values in self._iter_forecast_samples(samples):
+                yield BackTestForecast(backtest_id=backtest_id, period=period, org_unit=org_unit,
+                                       last_train_period=samples.last_train_period,
+                                       last_seen_period=samples.last_seen_period, values=values)
+
+    def get_prediction_forecasts(self, prediction_id: int) -> Iterator[PredictionForecast]:
+        """The forecasts of a prediction regardless of how they are stored, decoded while iterating"""
+        stored_samples = self._get_forecast_samples(ForecastSamples.prediction_id == prediction_id, load_values=False)
+        if not stored_samples:
+            yield from self.session.get(Prediction, prediction_id).forecasts
+            return
+        for samples in stored_samples:
+            for org_unit, period, values in self._iter_forecast_samples(samples):
+                yield PredictionForecast(prediction_id=prediction_id, period=period, org_unit=org_unit, values=values)
+
+    @classmethod
+    def _iter_forecast_samples(cls, samples: ForecastSamples):
+        """The org unit, period and samples (as a list) of each forecast in samples, one org unit decoded at a time"""
+        array = cls._forecast_samples_array(samples)
+        period_ids = cls._period_ids(samples)
+        for org_unit, org_unit_samples in zip(samples.org_units, array):
+            yield from zip([org_unit] * len(period_ids), period_ids, org_unit_samples.tolist())
+
+    def get_backtest_samples(self, backtest_id: int, org_unit: str, period: str) -> dict[str, np.ndarray]:
+        """
+        The samples of the forecasts of a backtest for one org unit and period, by the period they were forecast
+        from (last_seen_period). With storage='arrays' the position of the samples is found from the org units
+        and period range of each split, and only those bytes are read from the database.
+        """
+        stored_samples = self._get_forecast_samples(ForecastSamples.backtest_id == backtest_id, load_values=False)
+        if not stored_samples:
+            forecasts = self.session.exec(select(BackTestForecast).where(
+                BackTestForecast.backtest_id == backtest_id,
+                BackTestForecast.org_unit == org_unit,
+                BackTestForecast.period == period)).all()
+            return {forecast.last_seen_period: np.asarray(forecast.values) for forecast in forecasts}
+        result = {}
+        for samples in stored_samples:
+            offset = self._sample_offset(samples, org_unit, period)
+            if offset is None:
+                continue
+            n_bytes = samples.n_samples * np.dtype(np.float32).itemsize
+            # substr is 1-indexed, and substr and length work on both sqlite blobs and postgres bytea
+            values, length = self.session.exec(select(func.substr(ForecastSamples.values, offset + 1, n_bytes),
+                                                      func.length(ForecastSamples.values)).where(
+                ForecastSamples.id == samples.id)).one()
+            self._check_samples_length(samples, length)
+            result[samples.last_seen_period] = np.frombuffer(values, dtype=np.float32)
+        return result
+
+    def add_predictions(self, predictions, dataset_id, model_id, storage: ForecastStorage = DEFAULT_FORECAST_STORAGE,
+                        batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Store the forecasts of a prediction and return its id. With storage='arrays' the samples are stored as
+        one float32 array in ForecastSamples instead of as PredictionForecast rows.
+        """
         n_periods = len(list(predictions.values())[0])
         prediction = Prediction(dataset_id=dataset_id,
                                 estimator_id=model_id,
-                                n_periods=n_periods,
-                                forecasts = [
-                                    PredictionForecast(period=period.id,
-                                                       org_unit=location,
-                                                       values=value.tolist())
-                                for location, data in predictions.items() for period, value in zip(data.time_period, data.samples)])
+                                n_periods=n_periods)
         self.session.add(prediction)
+        self.session.flush()
+        if storage == "arrays":
+            self.session.add(self._forecast_samples(predictions, prediction_id=prediction.id))
+        else:
+            rows = ((prediction.id, period.id, location, value)
+                    for location, data in predictions.items()
+                    for period, value in zip(data.time_period, data.samples.tolist()))
+            bulk_insert(self.session, PredictionForecast, ("prediction_id", "period", "org_unit", "values"), rows,
+                        batch_size=batch_size)
         self.session.commit()
         return prediction.id
 
 
-    def add_dataset(self, dataset_name, orig_dataset: _DataSet, polygons):
+    def add_dataset(self, dataset_name, orig_dataset: _DataSet, polygons, batch_size=DEFAULT_BATCH_SIZE,
+                    control: Optional[TrainingControl] = None, storage: DatasetStorage = DEFAULT_DATASET_STORAGE):
+        """
+        Store a dataset and return its id. With storage='observations' (the default unless CHAP_DATASET_STORAGE
+        is set) each value is stored as a row in
+        the observation table. With storage='arrays' all values are stored as one binary array in DataSetArrays,
+        which is much more compact and faster to load. If a dataset with the same name and content was added
+        before and has not been appended to since, its id is returned and nothing is stored.
+        """
         logger.info(f"Adding dataset {dataset_name} wiht {len(list(orig_dataset.locations()))} locations")
+        content_hash = orig_dataset.content_hash()
+        existing_id = self._find_unchanged_dataset(dataset_name, content_hash)
+        if existing_id is not None:
+            logger.info(f"Dataset {dataset_name} is unchanged, reusing dataset {existing_id}")
+            return existing_id
         dataset = DataSet(name=dataset_name, polygons=polygons)
-        for location, data in orig_dataset.items():
-            field_names = [field.name for field in dataclasses.fields(data) if field.name not in ["time_period", "location"]]
-            for row in data:
-                for field in field_names:
-                    observation = Observation(period=row.time_period.id, org_unit=location, value=float(getattr(row, field)),
-                                              element_id=field)
-                    dataset.observations.append(observation)
         self.session.add(dataset)
+        self.session.flush()
+        self.session.add(self._dataset_version(dataset.id, 1, orig_dataset, content_hash))
+        if storage == "arrays":
+            self.session.add(self._dataset_arrays(dataset.id, orig_dataset))
+            self.session.commit()
+            return dataset.id
+        if control is not None:
+            control.set_total_samples(self._n_observations(orig_dataset))
+        n_rows = bulk_insert(self.session, Observation, ("dataset_id", "period", "org_unit", "value", "element_id"),
+                             self._observation_rows(orig_dataset, dataset.id), batch_size=batch_size, control=control)
+        logger.info(f"Added {n_rows} observations to dataset {dataset.id}")
         self.session.commit()
         assert self.session.exec(select(Observation).where(Observation.dataset_id==dataset.id)).first() is not None
         return dataset.id
 
+    def append_to_dataset(self, dataset_id, new_data: _DataSet, batch_size=DEFAULT_BATCH_SIZE,
+                          control: Optional[TrainingControl] = None) -> int:
+        """
+        Add new periods and/or locations to an existing dataset, and return the new version number.
+        Values in new_data replace any stored values for the same period, location and element.
+        If new_data is the same as the data of the latest version, nothing is stored and that version is returned.
+        """
+        content_hash = new_data.content_hash()
+        versions = self.get_dataset_versions(dataset_id)
+        if versions and versions[-1].content_hash == content_hash:
+            logger.info(f"Data is unchanged since version {versions[-1].version} of dataset {dataset_id}")
+            return versions[-1].version
+        arrays = self._get_dataset_arrays(dataset_id)
+        if arrays is not None:
+            self._append_to_arrays(arrays, new_data)
+        else:
+            new_dense = DenseDataSet.from_dataset(new_data)
+            period_ids = [period.id for period in new_dense.period_range]
+            self.session.execute(delete(Observation).where(
+                Observation.dataset_id == dataset_id,
+                Observation.period.in_(period_ids),
+                Observation.org_unit.in_([str(location) for location in new_dense.keys()]),
+                Observation.element_id.in_(list(new_dense.fields))))
+            if control is not None:
+                control.set_total_samples(self._n_observations(new_data))
+            bulk_insert(self.session, Observation, ("dataset_id", "period", "org_unit", "value", "element_id"),
+                        self._observation_rows(new_data, dataset_id), batch_size=batch_size, control=control)
+        version = self._dataset_version(dataset_id, max((v.version for v in versions), default=1) + 1, new_data,
+                                        content_hash)
+        self.session.add(version)
+        self.session.commit()
+        return version.version
+
+    def _append_to_arrays(self, arrays: DataSetArrays, new_data: _DataSet):
+        old = self._arrays_to_dataset(arrays, create_tsdataclass(arrays.element_ids))
+        new = DenseDataSet.from_dataset(new_data)
+        element_ids = list(arrays.element_ids) + [name for name in new.fields
+                                                  if name != "location" and name not in arrays.element_ids]
+        org_units = list(arrays.org_units) + [str(location) for location in new.keys()
+                                              if str(location) not in arrays.org_units]
+        period_range = PeriodRange.from_time_periods(min(old.period_range[0], new.period_range[0]),
+                                                     max(old.period_range[-1], new.period_range[-1]))
+        values = np.full((len(element_ids), len(org_units), len(period_range)), np.nan)
+        location_index = {location: i for i, location in enumerate(org_units)}
+        for dataset in (old, new):
+            offset = period_range.searchsorted(dataset.period_range[0])
+            time_slice = slice(offset, offset + len(dataset.period_range))
+            rows = [location_index[str(location)] for location in dataset.keys()]
+            for i, element_id in enumerate(element_ids):
+                if element_id not in dataset.fields:
+                    continue
+                field = dataset.fields[element_id].astype(float)
+                current = values[i, rows, time_slice]
+                values[i, rows, time_slice] = np.where(np.isnan(field), current, field)
+        arrays.start_period = period_range[0].id
+        arrays.n_periods = len(period_range)
+        arrays.org_units = org_units
+        arrays.element_ids = element_ids
+        arrays.values = values.tobytes()
+        self.session.add(arrays)
+
+    @staticmethod
+    def _dataset_version(dataset_id: int, version: int, dataset: _DataSet, content_hash: str) -> DataSetVersion:
+        return DataSetVersion(dataset_id=dataset_id, version=version,
+                              start_period=dataset.period_range[0].id,
+                              end_period=dataset.period_range[-1].id,
+                              org_units=[str(location) for location in dataset.keys()],
+                              content_hash=content_hash)
+
+    def _find_unchanged_dataset(self, dataset_name: str, content_hash: str) -> Optional[int]:
+        """Id of a dataset with the given name that was added with this content and never appended to"""
+        candidates = self.session.exec(
+            select(DataSetVersion.dataset_id).join(DataSet, DataSet.id == DataSetVersion.dataset_id).where(
+                DataSetVersion.version == 1,
+                DataSetVersion.content_hash == content_hash,
+                DataSet.name == dataset_name)).all()
+        for dataset_id in candidates:
+            if len(self.get_dataset_versions(dataset_id)) == 1:
+                return dataset_id
+        return None
+
+    def get_dataset_versions(self, dataset_id) -> list[DataSetVersion]:
+        return self.session.exec(select(DataSetVersion).where(DataSetVersion.dataset_id == dataset_id)
+                                 .order_by(DataSetVersion.version)).all()
+
+    @classmethod
+    def _dataset_arrays(cls, dataset_id: int, orig_dataset: _DataSet) -> DataSetArrays:
+        dense = DenseDataSet.from_dataset(orig_dataset)
+        element_ids = [name for name in dense.fields if name != "location"]
+        values = np.stack([dense.fields[name].astype(float) for name in element_ids])
+        return DataSetArrays(dataset_id=dataset_id,
+                             start_period=dense.period_range[0].id,
+                             n_periods=len(dense.period_range),
+                             org_units=[str(location) for location in dense.keys()],
+                             element_ids=element_ids,
+                             values=values.tobytes())
+
+    def _get_dataset_arrays(self, dataset_id) -> Optional[DataSetArrays]:
+        return self.session.exec(select(DataSetArrays).where(DataSetArrays.dataset_id == dataset_id)).first()
+
+    @staticmethod
+    def _arrays_to_dataset(arrays: DataSetArrays, dataclass: type) -> _DataSet:
+        """
+        Decode stored arrays without copying them. The fields of the returned DenseDataSet are read-only views
+        into the stored bytes, so operations that need to change them must work on copies.
+        """
+        values = np.frombuffer(arrays.values, dtype=float).reshape(
+            len(arrays.element_ids), len(arrays.org_units), arrays.n_periods)
+        period_range = PeriodRange.from_start_and_n_periods(TimePeriod.from_id(arrays.start_period), arrays.n_periods)
+        element_index = {element_id: i for i, element_id in enumerate(arrays.element_ids)}
+        fields = {field.name: values[element_index[field.name]]
+                  for field in dataclasses.fields(dataclass) if field.name != "time_period"}
+        return DenseDataSet.from_arrays(dataclass, period_range, arrays.org_units, fields)
+
+    def migrate_dataset_to_arrays(self, dataset_id, remove_observations=True):
+        """Convert a dataset stored as observation rows to the compact DataSetArrays storage"""
+        if self._get_dataset_arrays(dataset_id) is not None:
+            return
+        observations = self.session.get(DataSet, dataset_id).observations
+        element_ids = sorted({observation.element_id for observation in observations})
+        dataset = observations_to_dataset(create_tsdataclass(element_ids), observations, fill_missing=True)
+        self.session.add(self._dataset_arrays(dataset_id, dataset))
+        if remove_observations:
+            self.session.execute(delete(Observation).where(Observation.dataset_id == dataset_id))
+        self.session.commit()
+
+    def migrate_datasets_to_arrays(self, remove_observations=True) -> list[int]:
+        """Convert all datasets stored as observation rows to the compact DataSetArrays storage"""
+        migrated_ids = {arrays.dataset_id for arrays in self.list_all(DataSetArrays)}
+        dataset_ids = [dataset.id for dataset in self.list_all(DataSet) if dataset.id not in migrated_ids]
+        for dataset_id in dataset_ids:
+            logger.info(f"Migrating dataset {dataset_id} to array storage")
+            self.migrate_dataset_to_arrays(dataset_id, remove_observations)
+        return dataset_ids
+
+    def get_observations(self, dataset_id) -> list[ObservationBase]:
+        """Get the observations of a dataset regardless of how it is stored"""
+        arrays = self._get_dataset_arrays(dataset_id)
+        if arrays is None:
+            return self.session.get(DataSet, dataset_id).observations
+        dataset = self._arrays_to_dataset(arrays, create_tsdataclass(arrays.element_ids))
+        return [ObservationBase(period=period, org_unit=org_unit, element_id=element_id,
+                                value=None if np.isnan(value) else value)
+                for _, period, org_unit, value, element_id in self._observation_rows(dataset, dataset_id)]
+
+    @staticmethod
+    def _field_names(data):
+        return [field.name for field in dataclasses.fields(data) if field.name not in ["time_period", "location"]]
+
+    @classmethod
+    def _n_observations(cls, dataset: _DataSet):
+        return sum(len(data) * len(cls._field_names(data)) for data in dataset.values())
+
+    @classmethod
+    def _observation_rows(cls, dataset: _DataSet, dataset_id: int):
+        """One (dataset_id, period, org_unit, value, element_id) tuple per observation, in location, period, field order"""
+        period_ids = {}
+        for location, data in dataset.items():
+            field_names = cls._field_names(data)
+            key = (data.time_period.start_timestamp.date, data.time_period.end_timestamp.date)
+            if key not in period_ids:
+                period_ids[key] = [period.id for period in data.time_period]
+            values = np.column_stack([getattr(data, field) for field in field_names]).astype(float).tolist()
+            for period_id, row in zip(period_ids[key], values):
+                for field, value in zip(field_names, row):
+                    yield dataset_id, period_id, location, value, field
+
     def get_dataset(self, dataset_id, dataclass: type) -> _DataSet:
+        arrays = self._get_dataset_arrays(dataset_id)
+        if arrays is not None:
+            return self._arrays_to_dataset(arrays, dataclass)
         dataset = self.session.get(DataSet, dataset_id)
         observations = dataset.observations
         new_dataset = observations_to_dataset(dataclass, observations)
@@ -1,7 +1,9 @@
+from datetime import datetime, timezone
 from typing import Optional, List
 
 from pydantic_geojson import FeatureModel
 
+from sqlalchemy import Column, JSON, LargeBinary
 from sqlmodel import Field, Relationship
 
 from chap_core.database.base_tables import DBModel, PeriodID
@@ -42,3 +44,34 @@ class DataSet(DataSetBase, table=True):
 class DataSetWithObservations(DataSetBase):
     id: int
     observations: List[ObservationBase]
+
+
+class DataSetArrays(DBModel, table=True):
+    """
+    Compact storage of a dataset: the values of all elements as one float64 array
+    of shape (n_elements, n_org_units, n_periods), starting at start_period.
+    Used instead of Observation rows when a dataset is stored with storage='arrays'.
+    """
+    id: Optional[int] = Field(primary_key=True, default=None)
+    dataset_id: int = Field(foreign_key="dataset.id", unique=True)
+    start_period: PeriodID
+    n_periods: int
+    org_units: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    element_ids: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    values: bytes = Field(sa_column=Column(LargeBinary))
+
+
+class DataSetVersion(DBModel, table=True):
+    """
+    One row per change to a dataset: version 1 when it is added, and one more for each append.
+    start_period, end_period and org_units describe the data added in that version, and content_hash
+    identifies it, so that adding or appending the same data again can reuse the stored dataset.
+    """
+    id: Optional[int] = Field(primary_key=True, default=None)
+    dataset_id: int = Field(foreign_key="dataset.id")
+    version: int
+    created: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    start_period: PeriodID
+    end_period: PeriodID
+    org_units: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    content_hash: Optional[str] = Field(default=None, index=True)
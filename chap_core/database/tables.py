@@ -1,6 +1,6 @@
 from typing import Optional, List
 
-from sqlalchemy import create_engine, Column, JSON
+from sqlalchemy import create_engine, Column, JSON, LargeBinary
 from sqlmodel import Field, Relationship, Session, select
 
 from chap_core.database.base_tables import PeriodID, DBModel
@@ -58,6 +58,40 @@ class BackTestForecast(ForecastBase, table=True):
     values: List[float] = Field(default_factory=list, sa_column=Column(JSON))
 
 
+class ForecastSamples(DBModel, table=True):
+    """
+    Compact storage of forecast samples: the samples of one backtest split or one prediction as a single float32
+    array of shape (n_org_units, n_periods, n_samples), starting at start_period. Used instead of BackTestForecast
+    or PredictionForecast rows when results are stored with storage='arrays'. The samples for an org unit and
+    period are found from their positions in org_units and the period range, without decoding the whole array.
+    """
+    id: Optional[int] = Field(primary_key=True, default=None)
+    backtest_id: Optional[int] = Field(default=None, foreign_key="backtest.id", index=True)
+    prediction_id: Optional[int] = Field(default=None, foreign_key="prediction.id", index=True)
+    last_train_period: Optional[PeriodID] = None
+    last_seen_period: Optional[PeriodID] = None
+    start_period: PeriodID
+    n_periods: int
+    n_samples: int
+    org_units: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    values: bytes = Field(sa_column=Column(LargeBinary))
+
+
+class BackTestQuantiles(DBModel, table=True):
+    """
+    Quantiles of the forecast samples of a backtest at the levels in quantile_levels, computed when the backtest
+    is stored. values is a float64 array of shape (n_forecasts, n_quantile_levels), where forecast i is the
+    forecast for org_units[i] and periods[i] made at split_periods[i].
+    """
+    id: Optional[int] = Field(primary_key=True, default=None)
+    backtest_id: int = Field(foreign_key="backtest.id", unique=True)
+    quantile_levels: List[float] = Field(default_factory=list, sa_column=Column(JSON))
+    org_units: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    periods: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    split_periods: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    values: bytes = Field(sa_column=Column(LargeBinary))
+
+
 class BackTestMetric(DBModel, table=True):
     id: Optional[int] = Field(primary_key=True, default=None)
     backtest_id: int = Field(foreign_key="backtest.id")
@@ -94,7 +94,7 @@ class TimeSeriesData:
         try:
             time_strings = data.time_period.astype(str)
             # check unique
-            assert len(time_strings) == len(set(time_strings)), f'{time_strings} has duplicates'
+            assert time_strings.is_unique, f'{time_strings} has duplicates'
             time = PeriodRange.from_strings(time_strings, fill_missing=fill_missing)
         except Exception:
             print("Error in time period: ", data.time_period)
@@ -339,15 +339,16 @@ class Samples(TimeSeriesData):
     to_pandas = topandas
 
     def summaries(self, q_low=0.25, q_high=0.75):
+        median, quantile_low, quantile_high = np.quantile(self.samples, [0.5, q_low, q_high], axis=-1)
         return SummaryStatistics(
             self.time_period,
             mean=np.mean(self.samples, axis=-1),
-            median=np.median(self.samples, axis=-1),
+            median=median,
             std=np.std(self.samples, axis=-1),
             min=np.min(self.samples, axis=-1),
             max=np.max(self.samples, axis=-1),
-            quantile_low=np.quantile(self.samples, q_low, axis=-1),
-            quantile_high=np.quantile(self.samples, q_high, axis=-1),
+            quantile_low=quantile_low,
+            quantile_high=quantile_high,
         )
 
 
@@ -1,25 +1,48 @@
+import atexit
+import hashlib
 import os
+import threading
+import time
 from pathlib import Path
+from typing import Optional
+
 import docker
+import docker.errors
 import logging
+
+from chap_core.exceptions import CommandLineException
+
 logger = logging.getLogger(__name__)
 
-def create_docker_image(dockerfile_directory: Path | str):
+CONTENT_HASH_LABEL = "chap.content_hash"
+
+
+def create_docker_image(dockerfile_directory: Path | str, client=None):
     """Creates a docker image based on path to a directory that should contain a Dockerfile.
     Uses the final directory name as the name for the image (e.g. /path/to/name/ -> name)
     Returns the name.
+    The image is labeled with a hash of the Dockerfile, and is only rebuilt if the Dockerfile has changed.
     """
     name = Path(dockerfile_directory).stem
     logging.info(f"Creating docker image {name} from Dockerfile in {dockerfile_directory}")
     dockerfile = Path(dockerfile_directory) / "Dockerfile"
     logging.info(f"Looking for dockerfile {dockerfile}")
-    fileobject = open(dockerfile, "rb")
-    return docker_image_from_fo(fileobject, name)
+    content = dockerfile.read_bytes()
+    content_hash = hashlib.sha256(content).hexdigest()
+    client = client or docker.from_env()
+    try:
+        if client.images.get(name).labels.get(CONTENT_HASH_LABEL) == content_hash:
+            logger.info(f"Docker image {name} is up to date with {dockerfile}, not rebuilding")
+            return name
+    except docker.errors.ImageNotFound:
+        pass
+    with open(dockerfile, "rb") as fileobject:
+        return docker_image_from_fo(fileobject, name, client=client, labels={CONTENT_HASH_LABEL: content_hash})
 
 
-def docker_image_from_fo(fileobject, name):
-    client = docker.from_env()
-    response = client.api.build(fileobj=fileobject, tag=name, decode=True)
+def docker_image_from_fo(fileobject, name, client=None, labels: Optional[dict[str, str]] = None):
+    client = client or docker.from_env()
+    response = client.api.build(fileobj=fileobject, tag=name, decode=True, labels=labels)
     for line in response:
         if "stream" in line:
             print(line["stream"])  # .encode("utf-8"))
@@ -28,9 +51,141 @@ def docker_image_from_fo(fileobject, name):
     return name
 
 
+class WarmContainers:
+    """
+    Keeps one running container per (image, working dir), and runs commands in it with `exec`,
+    instead of creating and removing a new container for each command.
+    The containers are stopped and removed by stop, or when the process exits.
+    """
+
+    def __init__(self):
+        self._containers = {}
+        self._lock = threading.Lock()
+
+    def _get_container(self, client, image: str, working_dir: str):
+        key = (image, working_dir)
+        with self._lock:
+            container = self._containers.get(key)
+            if container is not None:
+                container.reload()
+                if container.status == "running":
+                    return container
+                self._remove(container)
+            logger.info(f"Starting container for {image} with mount {working_dir}:/home/run/")
+            container = client.containers.run(
+                image,
+                entrypoint=["tail", "-f", "/dev/null"],
+                volumes=[f"{working_dir}:/home/run/"],
+                working_dir="/home/run",
+                detach=True,
+            )
+            self._containers[key] = container
+            return container
+
+    def run_command(self, client, image: str, working_dir: str | Path, command: str) -> str:
+        working_dir = os.path.abspath(working_dir)
+        container = self._get_container(client, image, working_dir)
+        logger.info(f"Running command {command} in container {container.id} ({image})")
+        exit_code, output = container.exec_run(command, workdir="/home/run")
+        output = output.decode("utf-8")
+        if exit_code != 0:
+            raise CommandLineException(f"Command '{command}' failed with exit code {exit_code} in {image}: {output}")
+        return output
+
+    @staticmethod
+    def _remove(container):
+        try:
+            container.remove(force=True)
+        except docker.errors.APIError as e:
+            logger.warning(f"Could not remove container {container.id}: {e}")
+
+    def stop(self, image: Optional[str] = None, working_dir: Optional[str | Path] = None):
+        """Stops the containers for image and working_dir, or all containers if they are not given"""
+        working_dir = os.path.abspath(working_dir) if working_dir is not None else None
+        with self._lock:
+            for key in list(self._containers):
+                if (image is None or key[0] == image) and (working_dir is None or key[1] == working_dir):
+                    self._remove(self._containers.pop(key))
+
+
+warm_containers = WarmContainers()
+atexit.register(warm_containers.stop)
+
+
+class ImageEvictionPolicy:
+    """
+    Decides when docker images used by CHAP are removed. Images are never removed by default. The last use
+    of each image is recorded in the cache, and evict removes the least recently used images when there are
+    more than max_images of them, as well as images that have not been used for max_unused_days.
+    Only images that have been used through record_use are considered.
+    """
+
+    _cache_key = "docker_image_last_used"
+
+    def __init__(self, max_images: Optional[int] = None, max_unused_days: Optional[float] = None, cache=None):
+        self._max_images = max_images
+        self._max_unused_days = max_unused_days
+        self._cache = cache
+
+    @classmethod
+    def from_env(cls) -> Optional["ImageEvictionPolicy"]:
+        """Policy from CHAP_DOCKER_MAX_IMAGES and CHAP_DOCKER_MAX_UNUSED_DAYS, or None if neither is set"""
+        max_images = os.getenv("CHAP_DOCKER_MAX_IMAGES")
+        max_unused_days = os.getenv("CHAP_DOCKER_MAX_UNUSED_DAYS")
+        if max_images is None and max_unused_days is None:
+            return None
+        return cls(int(max_images) if max_images is not None else None,
+                   float(max_unused_days) if max_unused_days is not None else None)
+
+    def _get_cache(self):
+        if self._cache is None:
+            from chap_core.services.cache_manager import get_cache
+
+            self._cache = get_cache()
+        return self._cache
+
+    def record_use(self, image: str):
+        cache = self._get_cache()
+        with cache.transact():
+            last_used = cache.get(self._cache_key, default={})
+            last_used[image] = time.time()
+            cache.set(self._cache_key, last_used)
+
+    def images_to_evict(self, last_used: dict[str, float], now: float) -> list[str]:
+        by_age = sorted(last_used, key=last_used.get)
+        evict = set()
+        if self._max_unused_days is not None:
+            evict.update(image for image in by_age if now - last_used[image] > self._max_unused_days * 24 * 3600)
+        if self._max_images is not None:
+            remaining = [image for image in by_age if image not in evict]
+            evict.update(remaining[:max(len(remaining) - self._max_images, 0)])
+        return [image for image in by_age if image in evict]
+
+    def evict(self, client, in_use: tuple[str, ...] = ()) -> list[str]:
+        """Removes the images selected by the policy, except those in in_use. Returns the removed images"""
+        cache = self._get_cache()
+        with cache.transact():
+            last_used = cache.get(self._cache_key, default={})
+            to_evict = [image for image in self.images_to_evict(last_used, time.time()) if image not in in_use]
+            removed = []
+            for image in to_evict:
+                logger.info(f"Removing docker image {image}")
+                try:
+                    client.images.remove(image, force=True)
+                except docker.errors.ImageNotFound:
+                    pass
+                except docker.errors.APIError as e:
+                    logger.warning(f"Could not remove docker image {image}: {e}")
+                    continue
+                last_used.pop(image)
+                removed.append(image)
+            cache.set(self._cache_key, last_used)
+        return removed
+
+
 def run_command_through_docker_container(docker_image_name: str, working_directory: str, command: str,
-                                        remove_after_run: bool = False):
-    client = docker.from_env()
+                                        remove_after_run: bool = False, client=None):
+    client = client or docker.from_env()
     try:
         working_dir_full_path = os.path.abspath(working_directory)
     except FileNotFoundError:
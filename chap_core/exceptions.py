@@ -12,6 +12,10 @@ class CommandLineException(Exception):
     ...
 
 
+class ModelServerError(Exception):
+    """The model server could not be started, or stopped without answering"""
+
+
 class NoPredictionsError(Exception):
     pass
 
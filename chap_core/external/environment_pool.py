@@ -0,0 +1,173 @@
+"""
+Pool of pre-built python environments for models with a python_env in their MLproject file.
+
+Instead of letting mlflow resolve and build the environment on every run, each environment is built once with
+virtualenv and pip, and stored in a directory named by a hash of the environment spec (the python_env file and any
+requirement files it refers to). Models with the same spec share the environment. The train and predict commands
+are then run directly in the environment.
+
+The pool is used for mlflow models when the CHAP_ENVIRONMENT_POOL environment variable is set, otherwise the models
+are run with `mlflow run` as before.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from shutil import which
+from typing import Optional
+
+import yaml
+from diskcache import Lock
+
+from chap_core.services.cache_manager import get_cache
+
+logger = logging.getLogger(__name__)
+
+SPEC_FILE_NAME = "environment.json"
+
+
+def _default_pool_dir() -> Path:
+    default = Path(__file__).parent.parent.parent / "cache" / "environments"
+    return Path(os.getenv("CHAP_ENVIRONMENT_POOL_DIR", default=default))
+
+
+def environment_pool_enabled() -> bool:
+    return os.getenv("CHAP_ENVIRONMENT_POOL", "").lower() in ("1", "true", "yes")
+
+
+def read_python_env(project_dir: Path) -> Optional[dict]:
+    """The parsed python_env file of the MLproject in project_dir, or None if the project has no python_env"""
+    with open(Path(project_dir) / "MLproject") as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    if "python_env" not in config:
+        return None
+    with open(Path(project_dir) / config["python_env"]) as file:
+        return yaml.load(file, Loader=yaml.FullLoader)
+
+
+def _requirement_files(python_env: dict) -> list[str]:
+    requirements = python_env.get("build_dependencies", []) + python_env.get("dependencies", [])
+    return [requirement.split(maxsplit=1)[1] for requirement in requirements
+            if requirement.startswith("-r ") or requirement.startswith("--requirement ")]
+
+
+def environment_spec_hash(project_dir: Path, python_env: dict) -> str:
+    digest = hashlib.sha256(json.dumps(python_env, sort_keys=True).encode())
+    for file_name in _requirement_files(python_env):
+        digest.update((Path(project_dir) / file_name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _find_python(version: Optional[str]) -> str:
+    """Path to a python interpreter of the given version, installing it with pyenv if possible"""
+    if version is None:
+        return sys.executable
+    if which("pyenv") is not None:
+        subprocess.run(["pyenv", "install", "--skip-existing", version], check=True)
+        root = subprocess.run(["pyenv", "root"], check=True, capture_output=True, text=True).stdout.strip()
+        return str(Path(root) / "versions" / version / "bin" / "python")
+    major_minor = ".".join(version.split(".")[:2])
+    logger.warning(f"pyenv is not available, looking for an installed python {major_minor} instead of {version}")
+    return major_minor
+
+
+class EnvironmentPool:
+    def __init__(self, pool_dir: Optional[Path] = None):
+        self._pool_dir = Path(pool_dir) if pool_dir is not None else _default_pool_dir()
+
+    def environment_dir(self, project_dir: Path, python_env: dict) -> Path:
+        return self._pool_dir / environment_spec_hash(project_dir, python_env)
+
+    def get_environment(self, project_dir: Path) -> Optional[Path]:
+        """The environment for the model in project_dir, building it if needed. None if the model has no python_env"""
+        python_env = read_python_env(project_dir)
+        if python_env is None:
+            return None
+        env_dir = self.environment_dir(project_dir, python_env)
+        if (env_dir / SPEC_FILE_NAME).exists():
+            return env_dir
+        with Lock(get_cache(), f"environment_pool_{env_dir.name}"):
+            if not (env_dir / SPEC_FILE_NAME).exists():
+                self._build(Path(project_dir), python_env, env_dir)
+        return env_dir
+
+    def _build(self, project_dir: Path, python_env: dict, env_dir: Path):
+        logger.info(f"Building environment {env_dir.name} for {project_dir}")
+        shutil.rmtree(env_dir, ignore_errors=True)
+        python = _find_python(python_env.get("python"))
+        try:
+            subprocess.run([sys.executable, "-m", "virtualenv", "-p", python, str(env_dir)], check=True)
+            env_python = str(env_dir / "bin" / "python")
+            for key in ("build_dependencies", "dependencies"):
+                requirements = [argument for requirement in python_env.get(key, [])
+                                for argument in requirement.split(maxsplit=1)]
+                if requirements:
+                    subprocess.run([env_python, "-m", "pip", "install", *requirements], check=True, cwd=project_dir)
+        except (subprocess.CalledProcessError, OSError):
+            shutil.rmtree(env_dir, ignore_errors=True)
+            raise
+        # written last, so that an environment is only used if the build finished
+        spec = {"python_env": python_env, "project": str(project_dir), "created": datetime.now().isoformat()}
+        (env_dir / SPEC_FILE_NAME).write_text(json.dumps(spec))
+
+    def environment_variables(self, env_dir: Path) -> dict[str, str]:
+        """Environment variables for running commands in the environment, like activating it"""
+        env = os.environ.copy()
+        env["VIRTUAL_ENV"] = str(env_dir)
+        env["PATH"] = os.pathsep.join([str(env_dir / "bin"), env.get("PATH", "")])
+        env.pop("PYTHONHOME", None)
+        return env
+
+    def list_environments(self) -> list[dict]:
+        if not self._pool_dir.exists():
+            return []
+        environments = []
+        for env_dir in sorted(self._pool_dir.iterdir()):
+            spec_file = env_dir / SPEC_FILE_NAME
+            if spec_file.exists():
+                environments.append({"hash": env_dir.name, "path": str(env_dir), **json.loads(spec_file.read_text())})
+        return environments
+
+
+def get_environment_pool() -> EnvironmentPool:
+    return EnvironmentPool()
+
+
+def prewarm_environments(model_paths: list[str], pool: Optional[EnvironmentPool] = None) -> list[Path]:
+    """
+    Builds the environments for the models, given as local directories or github urls (pinned with @commit).
+    Pinned github models are checked out through the model checkout cache. Returns the environment directories.
+    """
+    from chap_core.external.model_checkout_cache import get_checkout_cache
+
+    pool = pool or get_environment_pool()
+    env_dirs = []
+    for model_path in model_paths:
+        if model_path.startswith("https://github.com"):
+            if "@" not in model_path:
+                logger.warning(f"Skipping {model_path}, only models pinned to a commit can be pre-built")
+                continue
+            url, commit = model_path.split("@")
+            project_dir = get_checkout_cache().checkout(url, commit)
+        else:
+            project_dir = Path(model_path)
+        try:
+            env_dir = pool.get_environment(project_dir)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.error(f"Could not build the environment for {model_path}: {e}")
+            continue
+        if env_dir is not None:
+            env_dirs.append(env_dir)
+    return env_dirs
+
+
+def prewarm_registry_environments(pool: Optional[EnvironmentPool] = None) -> list[Path]:
+    """Builds the environments for all models in the model registry"""
+    from chap_core.predictor.published_models import model_dict
+
+    return prewarm_environments([spec.github_link for spec in model_dict.values()], pool)
@@ -1,12 +1,10 @@
 import logging
 import shutil
-from datetime import datetime
 from pathlib import Path
-from typing import Literal, Protocol, TypeVar
+from typing import Literal, Optional, Protocol, TypeVar
 import os
 import git
 import yaml
-import uuid
 from chap_core.data import DataSet
 from chap_core.datatypes import (
     ClimateHealthTimeSeries,
@@ -14,6 +12,8 @@ from chap_core.datatypes import (
     HealthData,
 )
 from chap_core.exceptions import InvalidModelException
+from chap_core.external.model_checkout_cache import get_checkout_cache
+from chap_core.external.run_directory import DataFileStore, RunDirectoryManager
 from chap_core.external.mlflow_wrappers import (
     ExternalModel,
     get_train_predict_runner,
@@ -112,6 +112,7 @@ def get_model_from_directory_or_github_url(model_path, base_working_dir=Path("ru
         logging.warning(f"Model path {model_path} does not exist. Will create a directory for the run (using the name 'latest')")
         run_dir_type = "latest"
 
+    run_directories = RunDirectoryManager.from_env(base_working_dir)
     if run_dir_type == "latest":
         working_dir = base_working_dir / model_name / "latest"
         # clear working dir
@@ -119,10 +120,7 @@ def get_model_from_directory_or_github_url(model_path, base_working_dir=Path("ru
             logger.info(f"Removing previous working dir {working_dir}")
             shutil.rmtree(working_dir)
     elif run_dir_type == "timestamp":
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        unique_identifier = timestamp + "_" + str(uuid.uuid4())[:8]
-        #timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S%f")
-        working_dir = base_working_dir / model_name / unique_identifier
+        working_dir = run_directories.new_run_dir(model_name)
         # check that working dir does not exist
         assert not working_dir.exists(), f"Working dir {working_dir} already exists. This should not happen if make_run_dir is True"
     elif run_dir_type == "use_existing":
@@ -135,17 +133,17 @@ def get_model_from_directory_or_github_url(model_path, base_working_dir=Path("ru
 
     if is_github:
         working_dir.mkdir(parents=True)
-        repo = git.Repo.clone_from(model_path, working_dir)
         if commit:
-            logger.info(f'Checking out commit {commit}')
-            repo.git.checkout(commit)
+            logger.info(f'Copying commit {commit} from the model checkout cache')
+            get_checkout_cache().copy_to(model_path, commit, working_dir)
+        else:
+            git.Repo.clone_from(model_path, working_dir)
 
     elif run_dir_type == "use_existing":
         logging.info("Not copying any model files, using existing directory")
     else:
         # copy contents of model_path to working_dir
-        logger.info(f"Copying files from {model_path} to {working_dir}")
-        shutil.copytree(model_path, working_dir)
+        run_directories.copy_model_files(model_path, working_dir)
 
 
     logging.error(f"Current directory is {os.getcwd()}")
@@ -154,12 +152,13 @@ def get_model_from_directory_or_github_url(model_path, base_working_dir=Path("ru
     assert os.path.isdir(os.path.abspath(working_dir)), working_dir
     # assert that a config file exists
     if (working_dir / "MLproject").exists():
-        return get_model_from_mlproject_file(working_dir / "MLproject", ignore_env=ignore_env)
+        return get_model_from_mlproject_file(working_dir / "MLproject", ignore_env=ignore_env,
+                                             data_store=run_directories.data_store)
     else:
         raise InvalidModelException("No MLproject file found in model directory")
 
 
-def get_model_from_mlproject_file(mlproject_file, ignore_env=False) -> ExternalModel:
+def get_model_from_mlproject_file(mlproject_file, ignore_env=False, data_store: Optional[DataFileStore] = None) -> ExternalModel:
     """parses file and returns the model
     Will not use MLflows project setup if docker is specified
     """
@@ -185,6 +184,8 @@ def get_model_from_mlproject_file(mlproject_file, ignore_env=False) -> ExternalM
         adapters=adapters,
         data_type=data_type,
         working_dir=Path(mlproject_file).parent,
+        data_format=config.get("data_format", "csv"),
+        data_store=data_store,
     )
 
 
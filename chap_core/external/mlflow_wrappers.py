@@ -1,5 +1,8 @@
+import copy
+import shutil
+import subprocess
 from pathlib import Path
-from typing import Generic, TypeVar, Literal
+from typing import Generic, TypeVar, Literal, Optional
 import logging
 import pandas as pd
 #import mlflow
@@ -8,30 +11,48 @@ from mlflow.utils.process import ShellCommandException
 import mlflow.projects
 import mlflow.exceptions
 from chap_core.datatypes import HealthData, Samples
-from chap_core.exceptions import CommandLineException, ModelConfigurationException, ModelFailedException
+from chap_core.external.environment_pool import environment_pool_enabled, get_environment_pool
+from chap_core.external.run_directory import DataFileStore
+from chap_core.exceptions import CommandLineException, ModelConfigurationException, ModelFailedException, \
+    ModelServerError
 from chap_core.exceptions import NoPredictionsError
 from chap_core.geometry import Polygons
 from chap_core.runners.command_line_runner import CommandLineRunner
 from chap_core.runners.docker_runner import DockerRunner
+from chap_core.runners.model_server import ModelServer
 from chap_core.runners.runner import TrainPredictRunner
 from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
-from chap_core.time_period import TimePeriod
 
 logger = logging.getLogger(__name__)
 
 FeatureType = TypeVar("FeatureType")
 
+DataFormat = Literal["csv", "parquet", "arrow"]
+data_format_suffixes = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
 
 def get_train_predict_runner(mlproject_file: Path, runner_type: Literal["mlflow", "docker"],
                              skip_environment=False) -> TrainPredictRunner:
     """
     Returns a TrainPredictRunner based on the runner_type.
-    If runner_type is "mlflow", returns an MlFlowTrainPredictRunner.
+    If runner_type is "mlflow", returns an MlFlowTrainPredictRunner, unless the environment pool is enabled
+    (CHAP_ENVIRONMENT_POOL) and the model has a python_env that it can build (see chap_core.external.environment_pool).
+    Then the commands are run directly in the pooled environment.
     If runner_type is "docker", the mlproject file is parsed to create a runner
     if skip_environment, mlflow and docker is not used, instead returning a TrainPredictRunner that uses the command line
     """
     logger.info(f'skip_environement: {skip_environment}, runner_type: {runner_type}')
-    if skip_environment or runner_type == "docker":
+    env = None
+    if runner_type == "mlflow" and not skip_environment and environment_pool_enabled():
+        try:
+            env_dir = get_environment_pool().get_environment(mlproject_file.parent)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.warning(f"Could not build environment from the environment pool, will use mlflow: {e}")
+            env_dir = None
+        if env_dir is not None:
+            logger.info(f"Using environment {env_dir} from the environment pool")
+            env = get_environment_pool().environment_variables(env_dir)
+    if skip_environment or runner_type == "docker" or env is not None:
         working_dir = mlproject_file.parent
 
         # read yaml file into a dict
@@ -41,14 +62,18 @@ def get_train_predict_runner(mlproject_file: Path, runner_type: Literal["mlflow"
         train_command = data["entry_points"]["train"]["command"]
         predict_command = data["entry_points"]["predict"]["command"]
 
-        if skip_environment:
-            return CommandLineTrainPredictRunner(CommandLineRunner(working_dir), train_command, predict_command)
+        if skip_environment or env is not None:
+            command_runner = CommandLineRunner(working_dir, env)
+            runner = CommandLineTrainPredictRunner(command_runner, train_command, predict_command)
         else:
             assert "docker_env" in data, "Runner type is docker, but no docker_env in mlproject file"
-
-        logging.info(f"Docker image is {data['docker_env']['image']}")
-        command_runner = DockerRunner(data["docker_env"]["image"], working_dir)
-        return DockerTrainPredictRunner(command_runner, train_command, predict_command)
+            logging.info(f"Docker image is {data['docker_env']['image']}")
+            command_runner = DockerRunner(data["docker_env"]["image"], working_dir)
+            runner = DockerTrainPredictRunner(command_runner, train_command, predict_command)
+        if "serve" in data["entry_points"] and command_runner.supports_server:
+            logger.info("Model has a serve entry point, will keep one model process running for train and predict")
+            return ModelServerTrainPredictRunner(runner, data["entry_points"]["serve"]["command"])
+        return runner
     else:
         assert runner_type == "mlflow"
         return MlFlowTrainPredictRunner(mlproject_file.parent)
@@ -93,6 +118,9 @@ class MlFlowTrainPredictRunner(TrainPredictRunner):
             },
         )
 
+    def with_working_dir(self, working_dir):
+        return MlFlowTrainPredictRunner(working_dir)
+
 
 class CommandLineTrainPredictRunner(TrainPredictRunner):
     def __init__(self, runner: CommandLineRunner, train_command: str, predict_command: str):
@@ -134,6 +162,9 @@ class CommandLineTrainPredictRunner(TrainPredictRunner):
         command = self._format_command(self._predict_command, keys)
         return self._runner.run_command(command)
 
+    def with_working_dir(self, working_dir):
+        return self.__class__(self._runner.with_working_dir(working_dir), self._train_command, self._predict_command)
+
 
 class DockerTrainPredictRunner(CommandLineTrainPredictRunner):
     """This is basically a CommandLineTrainPredictRunner, but with a DockerRunner
@@ -145,10 +176,97 @@ class DockerTrainPredictRunner(CommandLineTrainPredictRunner):
     def teardown(self):
         self._runner.teardown()
 
+    def close(self):
+        self._runner.close()
+
+
+def _samples_from_predictions(df: pd.DataFrame) -> DataSet[Samples]:
+    """
+    Samples dataset from a predictions dataframe with location, time_period and sample_0, ..., sample_n columns.
+    All the samples are scattered into one array at once, instead of parsing each location separately.
+    """
+    n_samples = sum(1 for column in df.columns if str(column).startswith("sample_"))
+    if n_samples and len(df):
+        location_codes, locations = pd.factorize(df["location"], sort=True)
+        period_codes, period_strings = pd.factorize(df["time_period"].astype(str))
+        samples = df[[f"sample_{i}" for i in range(n_samples)]].to_numpy()
+        dataset = DataSet._from_codes(Samples, location_codes, locations, period_codes, period_strings,
+                                      {"samples": samples})
+        if dataset is not None:
+            return dataset
+    return DataSet.from_pandas(df, Samples)
+
+
+class ModelServerTrainPredictRunner(TrainPredictRunner):
+    """
+    Runs train and predict as requests to one long-lived model process started from the serve command
+    (see chap_core.runners.model_server), instead of starting a new process for each call.
+    If the server can not be started or stops unexpectedly, the one-shot commands of fallback are used instead.
+    """
+
+    def __init__(self, fallback: CommandLineTrainPredictRunner, serve_command: str):
+        self._fallback = fallback
+        self._serve_command = serve_command
+        self._server = ModelServer(fallback._runner, serve_command)
+        self._use_server = True
+
+    def _request(self, command: str, run_one_shot, **arguments):
+        if self._use_server:
+            try:
+                return self._server.request(command, **arguments)
+            except ModelServerError as e:
+                logger.warning(f"{e}. Falling back to the one-shot {command} command")
+                self._server.stop()
+                self._use_server = False
+        return run_one_shot()
+
+    def train(self, train_file_name, model_file_name, polygons_file_name=None):
+        arguments = {"train_data": train_file_name, "model": model_file_name}
+        if polygons_file_name is not None:
+            arguments["polygons"] = polygons_file_name
+        return self._request(
+            "train", lambda: self._fallback.train(train_file_name, model_file_name, polygons_file_name), **arguments
+        )
+
+    def predict(self, model_file_name, historic_data, future_data, output_file, polygons_file_name=None):
+        arguments = {
+            "model": model_file_name,
+            "historic_data": historic_data,
+            "future_data": future_data,
+            "out_file": output_file,
+        }
+        if polygons_file_name is not None:
+            arguments["polygons"] = polygons_file_name
+        return self._request(
+            "predict",
+            lambda: self._fallback.predict(model_file_name, historic_data, future_data, output_file,
+                                           polygons_file_name),
+            **arguments,
+        )
+
+    def teardown(self):
+        """The server is kept running between predictions, it is stopped by close"""
+
+    def close(self):
+        self._server.stop()
+        self._fallback.close()
+        self._fallback.teardown()
+
+    def with_working_dir(self, working_dir):
+        return self.__class__(self._fallback.with_working_dir(working_dir), self._serve_command)
+
 
 class ExternalModel(Generic[FeatureType]):
     """
     Wrapper around an mlflow model with commands for training and predicting
+
+    The data is exchanged with the model through files in data_format, which is set by `data_format`
+    in the MLproject file. For "parquet" and "arrow" (Arrow IPC/feather) the files have the same columns as
+    the csv files, with time_period as strings, and the predictions file is read in the same format.
+
+    With a data_store, the input data files are written through the store, so that identical files
+    in different run directories share one copy on disk. The files can then be links to the stored copy, and
+    must only be replaced through the store, never opened for writing.
     """
 
     def __init__(
@@ -158,7 +276,12 @@ class ExternalModel(Generic[FeatureType]):
             adapters=None,
             working_dir="./",
             data_type=HealthData,
+            data_format: DataFormat = "csv",
+            data_store: Optional[DataFileStore] = None,
     ):
+        if data_format not in data_format_suffixes:
+            raise ModelConfigurationException(
+                f"Unknown data_format {data_format}, should be one of {list(data_format_suffixes)}")
         self._runner = runner  # MlFlowTrainPredictRunner(model_path)
         # self.model_path = model_path
         self._adapters = adapters
@@ -168,6 +291,8 @@ class ExternalModel(Generic[FeatureType]):
         self._data_type = data_type
         self._name = name
         self._polygons_file_name = None
+        self._data_format = data_format
+        self._data_store = data_store
 
     @property
     def name(self):
@@ -176,6 +301,52 @@ class ExternalModel(Generic[FeatureType]):
     def __call__(self):
         return self
 
+    def with_working_dir(self, working_dir: str | Path) -> "ExternalModel":
+        """
+        Returns a copy of this model that works in working_dir. The current working dir, including
+        any trained model files, is copied over so that the copy can predict independently of this model.
+        Used to run predictions concurrently without the runs overwriting each other's files.
+        """
+        shutil.copytree(self._working_dir, working_dir, dirs_exist_ok=True)
+        model = copy.copy(self)
+        model._working_dir = working_dir
+        model._runner = self._runner.with_working_dir(working_dir)
+        if self._polygons_file_name is not None:
+            model._polygons_file_name = Path(working_dir) / "polygons.geojson"
+        return model
+
+    def close(self):
+        """Stops the model server, if the model runs as one"""
+        self._runner.close()
+
+    def _file_name(self, name: str) -> str:
+        return name + data_format_suffixes[self._data_format]
+
+    def _write_data(self, df: pd.DataFrame, file_name: Path):
+        if self._data_store is not None:
+            self._data_store.write(lambda path: self._write_data_file(df, path), file_name)
+        else:
+            self._write_data_file(df, file_name)
+
+    def _write_data_file(self, df: pd.DataFrame, file_name: Path):
+        if self._data_format == "csv":
+            df.to_csv(file_name)
+            return
+        df = df.assign(time_period=df["time_period"].astype(str)).reset_index(drop=True)
+        if self._data_format == "parquet":
+            df.to_parquet(file_name, index=False)
+        else:
+            df.to_feather(file_name)
+
+    def _read_predictions(self, file_name: Path) -> pd.DataFrame:
+        if file_name.stat().st_size == 0:
+            raise pd.errors.EmptyDataError(f"{file_name} is empty")
+        if self._data_format == "parquet":
+            return pd.read_parquet(file_name)
+        if self._data_format == "arrow":
+            return pd.read_feather(file_name)
+        return pd.read_csv(file_name)
+
     def _write_polygons_to_geojson(self, dataset: DataSet, out_file_name):
         if dataset.polygons is not None:
             logging.info(f"Writing polygons to {out_file_name}")
@@ -185,7 +356,7 @@ class ExternalModel(Generic[FeatureType]):
         if extra_args is None:
             extra_args = ""
 
-        train_file_name = "training_data.csv"
+        train_file_name = self._file_name("training_data")
         train_file_name_full = Path(self._working_dir) / Path(train_file_name)
         if train_data.polygons is not None:
             self._polygons_file_name = Path(self._working_dir) / "polygons.geojson"
@@ -194,7 +365,7 @@ class ExternalModel(Generic[FeatureType]):
 
         pd = train_data.to_pandas()
         new_pd = self._adapt_data(pd)
-        new_pd.to_csv(train_file_name_full)
+        self._write_data(new_pd, train_file_name_full)
 
         try:
             self._runner.train(train_file_name, self._model_file_name,
@@ -249,8 +420,8 @@ class ExternalModel(Generic[FeatureType]):
 
     def predict(self, historic_data: DataSet, future_data: DataSet) -> DataSet:
         logging.info("Running predict")
-        future_data_name = Path(self._working_dir) / "future_data.csv"
-        historic_data_name = Path(self._working_dir) / "historic_data.csv"
+        future_data_name = Path(self._working_dir) / self._file_name("future_data")
+        historic_data_name = Path(self._working_dir) / self._file_name("historic_data")
         start_time = future_data.start_timestamp
         logger.info(f"Predicting on dataset from {start_time} to {future_data.end_timestamp}")
 
@@ -258,22 +429,21 @@ class ExternalModel(Generic[FeatureType]):
             (future_data_name, future_data),
             (historic_data_name, historic_data),
         ]:
-            with open(filename, "w"):
-                adapted_dataset = self._adapt_data(dataset.to_pandas())
-                adapted_dataset.to_csv(filename)
+            adapted_dataset = self._adapt_data(dataset.to_pandas())
+            self._write_data(adapted_dataset, filename)
 
-        predictions_file = Path(self._working_dir) / "predictions.csv"
+        predictions_file = Path(self._working_dir) / self._file_name("predictions")
 
-        # touch predictions.csv
+        # touch predictions file
         with open(predictions_file, "w") as _:
             pass
 
         try:
             self._runner.predict(
                 self._model_file_name,
-                "historic_data.csv",
-                "future_data.csv",
-                "predictions.csv",
+                historic_data_name.name,
+                future_data_name.name,
+                predictions_file.name,
                 "polygons.geojson" if self._polygons_file_name is not None else None,
             )
         except CommandLineException as e:
@@ -281,7 +451,7 @@ class ExternalModel(Generic[FeatureType]):
             raise ModelFailedException(str(e))
 
         try:
-            df = pd.read_csv(predictions_file)
+            df = self._read_predictions(predictions_file)
         except pd.errors.EmptyDataError:
             # todo: Probably deal with this in an other way, throw an exception istead
             logger.warning("No data returned from model (empty file from predictions)")
@@ -290,10 +460,6 @@ class ExternalModel(Generic[FeatureType]):
         if self._location_mapping is not None:
             df["location"] = df["location"].apply(self._location_mapping.index_to_name)
 
-        time_periods = [TimePeriod.parse(s) for s in df.time_period.astype(str)]
-        mask = [start_time <= time_period.start_timestamp for time_period in time_periods]
-        df = df[mask]
-
         self._runner.teardown()
 
-        return DataSet.from_pandas(df, Samples)
+        return _samples_from_predictions(df).restrict_time_period(slice(future_data.period_range[0], None))
@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import git
+
+logger = logging.getLogger(__name__)
+
+
+def _default_cache_dir() -> Path:
+    default = Path(__file__).parent.parent.parent / "cache" / "model_checkouts"
+    return Path(os.getenv("CHAP_MODEL_CHECKOUT_CACHE", default=default))
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ModelCheckoutCache:
+    """
+    Local checkouts of model repositories, keyed by (repo url, commit), so that a pinned model is only
+    cloned once. Run directories are filled with copies of the cached checkout (without the .git directory).
+
+    With link_files=True, files are hardlinked instead of copied. This is faster and saves disk space, but
+    the model must then not modify files from its repository in place.
+    At most max_checkouts checkouts are kept, the least recently used ones are removed first.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_checkouts: int = 20, link_files: bool = False):
+        self._cache_dir = Path(cache_dir) if cache_dir is not None else _default_cache_dir()
+        self._max_checkouts = max_checkouts
+        self._link_files = link_files
+
+    def _checkout_dir(self, repo_url: str, commit: str) -> Path:
+        url_hash = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+        return self._cache_dir / f"{url_hash}_{commit}"
+
+    def checkout(self, repo_url: str, commit: str) -> Path:
+        """Returns the directory of the cached checkout of commit, cloning the repository if it is not cached"""
+        checkout_dir = self._checkout_dir(repo_url, commit)
+        if not checkout_dir.exists():
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_dir = self._cache_dir / f".tmp_{uuid.uuid4().hex}"
+            logger.info(f"Cloning {repo_url} at commit {commit} into the model checkout cache")
+            try:
+                repo = git.Repo.clone_from(repo_url, tmp_dir)
+                repo.git.checkout(commit)
+                repo.close()
+                tmp_dir.rename(checkout_dir)
+            except OSError:
+                # another process stored the same checkout first
+                if not checkout_dir.exists():
+                    raise
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            logger.info(f"Using cached checkout of {repo_url} at commit {commit}")
+        os.utime(checkout_dir)
+        self.evict(keep=checkout_dir)
+        return checkout_dir
+
+    def copy_to(self, repo_url: str, commit: str, target_dir: Path) -> Path:
+        """Fills target_dir with the files of the given commit of the repository"""
+        checkout_dir = self.checkout(repo_url, commit)
+        shutil.copytree(checkout_dir, target_dir, ignore=shutil.ignore_patterns(".git"), dirs_exist_ok=True,
+                        copy_function=_link_or_copy if self._link_files else shutil.copy2)
+        return Path(target_dir)
+
+    def evict(self, keep: Optional[Path] = None):
+        """Removes the least recently used checkouts, so that at most max_checkouts are left"""
+        if not self._cache_dir.exists():
+            return
+        checkouts = [path for path in self._cache_dir.iterdir() if path.is_dir() and not path.name.startswith(".")]
+        checkouts.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in checkouts[self._max_checkouts:]:
+            if path == keep:
+                continue
+            logger.info(f"Removing cached model checkout {path}")
+            trash = self._cache_dir / f".trash_{uuid.uuid4().hex}"
+            try:
+                path.rename(trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+
+
+_checkout_cache = None
+
+
+def get_checkout_cache() -> ModelCheckoutCache:
+    global _checkout_cache
+    if _checkout_cache is None:
+        _checkout_cache = ModelCheckoutCache(
+            max_checkouts=int(os.getenv("CHAP_MODEL_CHECKOUT_CACHE_SIZE", "20")),
+            link_files=os.getenv("CHAP_MODEL_CHECKOUT_LINK_FILES", "").lower() in ("1", "true", "yes"),
+        )
+    return _checkout_cache
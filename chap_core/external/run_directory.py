@@ -0,0 +1,184 @@
+"""
+Lifecycle of the run directories (runs/<model>/<run>/) that models are trained and run in.
+
+Paths for new run directories are made by RunDirectoryManager.new_run_dir, which also removes old runs according to the
+configured limits: a maximum number of runs per model, a maximum age and a quota for the total size of all runs.
+The age of a run is the time since its directory was last modified. This does not tell whether a run is still in use:
+a trained model can be used for predictions long after its directory was written. Pruning is therefore off unless a
+limit is configured, and should only be enabled where runs are not used after the job that made them. Runs that have
+been modified within the last protect_hours are never removed, so protect_hours should cover the longest job.
+
+Input data files written to run directories can go through a DataFileStore, which keeps one copy of each distinct
+file and hardlinks it into the run directories, so that parallel jobs on the same data share one file. Writing into
+such a link in place would change the file for every run that shares it, so the store is only used with link_files.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from chap_core.external.model_checkout_cache import _link_or_copy
+
+logger = logging.getLogger(__name__)
+
+DATA_STORE_NAME = ".data"
+
+
+def _directory_size(path: Path) -> int:
+    """Size of the files in path, counting hardlinked files only once per directory tree"""
+    seen, size = set(), 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            stat = os.lstat(os.path.join(root, name))
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                size += stat.st_size
+    return size
+
+
+class DataFileStore:
+    """
+    Content-addressed store of data files. Each file is written once, and hardlinked to where it is used.
+    A stored file that is no longer linked from anywhere else has a link count of one, and is removed by
+    collect_garbage.
+    """
+
+    def __init__(self, store_dir: Path):
+        self._store_dir = Path(store_dir)
+
+    def write(self, write_file: Callable[[Path], None], target: Path) -> Path:
+        """Writes a file with write_file(path), and puts a link to the stored copy of it at target"""
+        self._store_dir.mkdir(parents=True, exist_ok=True)
+        target = Path(target)
+        # replace the target instead of writing into it, since it can be a link to another stored file
+        target.unlink(missing_ok=True)
+        tmp_path = self._store_dir / f".tmp_{uuid.uuid4().hex}{target.suffix}"
+        try:
+            write_file(tmp_path)
+            digest = hashlib.sha256()
+            with open(tmp_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            stored = self._store_dir / f"{digest.hexdigest()}{target.suffix}"
+            try:
+                _link_or_copy(stored, target)
+            except FileNotFoundError:
+                # the target is linked before the file is published, so that a concurrent collect_garbage
+                # never sees the new stored file with a link count of one
+                _link_or_copy(tmp_path, target)
+                os.replace(tmp_path, stored)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return target
+
+    def collect_garbage(self) -> int:
+        """Removes stored files that are not linked from any run directory. Returns the number of removed files"""
+        if not self._store_dir.exists():
+            return 0
+        removed = 0
+        for path in self._store_dir.iterdir():
+            if not path.name.startswith(".tmp_") and path.stat().st_nlink == 1:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class RunDirectoryManager:
+    def __init__(self, base_dir: Path = Path("runs/"), max_runs_per_model: Optional[int] = None,
+                 max_age_days: Optional[float] = None, max_total_bytes: Optional[int] = None,
+                 protect_hours: float = 1.0, link_files: bool = False):
+        self._base_dir = Path(base_dir)
+        self._max_runs_per_model = max_runs_per_model
+        self._max_age_days = max_age_days
+        self._max_total_bytes = max_total_bytes
+        self._protect_hours = protect_hours
+        self._link_files = link_files
+        self._data_store = DataFileStore(self._base_dir / DATA_STORE_NAME)
+
+    @property
+    def data_store(self) -> Optional[DataFileStore]:
+        """The store to write input data files through, if files are linked into the run directories"""
+        return self._data_store if self._link_files else None
+
+    @classmethod
+    def from_env(cls, base_dir: Path = Path("runs/")) -> "RunDirectoryManager":
+        """
+        Manager with limits from CHAP_RUNS_MAX_PER_MODEL, CHAP_RUNS_MAX_AGE_DAYS, CHAP_RUNS_MAX_TOTAL_GB,
+        CHAP_RUNS_PROTECT_HOURS and CHAP_RUNS_LINK_FILES. Runs are only removed if one of the limits is set
+        """
+        max_runs_per_model = os.getenv("CHAP_RUNS_MAX_PER_MODEL")
+        max_age_days = os.getenv("CHAP_RUNS_MAX_AGE_DAYS")
+        max_total_gb = os.getenv("CHAP_RUNS_MAX_TOTAL_GB")
+        return cls(
+            base_dir,
+            max_runs_per_model=int(max_runs_per_model) if max_runs_per_model is not None else None,
+            max_age_days=float(max_age_days) if max_age_days is not None else None,
+            max_total_bytes=int(float(max_total_gb) * 1024**3) if max_total_gb is not None else None,
+            protect_hours=float(os.getenv("CHAP_RUNS_PROTECT_HOURS", "1")),
+            link_files=os.getenv("CHAP_RUNS_LINK_FILES", "").lower() in ("1", "true", "yes"),
+        )
+
+    def new_run_dir(self, model_name: str) -> Path:
+        """Path for a new timestamped run directory for the model. Old runs are removed first"""
+        self.collect_garbage()
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        return self._base_dir / model_name / f"{timestamp}_{str(uuid.uuid4())[:8]}"
+
+    def copy_model_files(self, source_dir: Path, run_dir: Path):
+        """
+        Copies the model files from source_dir to run_dir. With link_files, the files are hardlinked instead,
+        and the model must then not modify its files in place.
+        """
+        logger.info(f"Copying files from {source_dir} to {run_dir}")
+        shutil.copytree(source_dir, run_dir, copy_function=_link_or_copy if self._link_files else shutil.copy2,
+                        dirs_exist_ok=True)
+
+    def _runs(self) -> list[tuple[Path, float]]:
+        """All timestamped run directories with their modification time, oldest first"""
+        if not self._base_dir.exists():
+            return []
+        runs = []
+        for model_dir in self._base_dir.iterdir():
+            if not model_dir.is_dir() or model_dir.name == DATA_STORE_NAME:
+                continue
+            for run_dir in model_dir.iterdir():
+                if run_dir.is_dir() and run_dir.name != "latest":
+                    runs.append((run_dir, run_dir.stat().st_mtime))
+        return sorted(runs, key=lambda run: run[1])
+
+    def runs_to_remove(self, now: Optional[float] = None) -> list[Path]:
+        now = time.time() if now is None else now
+        runs = [(path, modified) for path, modified in self._runs() if now - modified > self._protect_hours * 3600]
+        remove = set()
+        if self._max_age_days is not None:
+            remove.update(path for path, modified in runs if now - modified > self._max_age_days * 24 * 3600)
+        if self._max_runs_per_model is not None:
+            all_runs = self._runs()
+            for model_dir in {path.parent for path, _ in runs}:
+                model_runs = [path for path, _ in all_runs if path.parent == model_dir]
+                n_extra = len(model_runs) - self._max_runs_per_model
+                removable = [path for path, _ in runs if path.parent == model_dir]
+                remove.update(removable[:max(n_extra, 0)])
+        if self._max_total_bytes is not None:
+            total = sum(_directory_size(path) for path, _ in self._runs() if path not in remove)
+            for path, _ in runs:
+                if total <= self._max_total_bytes:
+                    break
+                if path not in remove:
+                    total -= _directory_size(path)
+                    remove.add(path)
+        return [path for path, _ in runs if path in remove]
+
+    def collect_garbage(self) -> list[Path]:
+        """Removes the runs selected by the limits, and data files no longer used by any run"""
+        removed = self.runs_to_remove()
+        for path in removed:
+            logger.info(f"Removing old run directory {path}")
+            shutil.rmtree(path, ignore_errors=True)
+        self._data_store.collect_garbage()
+        return removed
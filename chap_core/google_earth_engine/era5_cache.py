@@ -0,0 +1,85 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+import numpy as np
+
+from chap_core.datatypes import SimpleClimateData
+from chap_core.google_earth_engine.gee_era5 import bands
+from chap_core.services.cache_manager import get_cache
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.time_period import PeriodRange
+
+logger = logging.getLogger(__name__)
+
+
+def geometry_hash(feature: dict) -> str:
+    return hashlib.sha256(json.dumps(feature.get("geometry"), sort_keys=True).encode()).hexdigest()
+
+
+class CachedEra5Client:
+    """
+    Caches the climate data from an Era5LandGoogleEarthEngine client per (feature id, geometry hash, period id, band),
+    so that only locations and periods that have not been fetched before are requested from GEE.
+
+    The values for one feature and band are stored together as a {period_id: value} dict in the cache,
+    to avoid one cache lookup per period.
+    """
+
+    def __init__(self, client, cache=None):
+        self._client = client
+        self._cache = cache if cache is not None else get_cache()
+        self._indicators = [band.indicator for band in bands]
+
+    def _key(self, feature: dict, indicator: str) -> tuple:
+        return "era5", feature["id"], geometry_hash(feature), indicator
+
+    def _get_cached(self, feature: dict) -> dict[str, dict[str, float]]:
+        return {indicator: self._cache.get(self._key(feature, indicator), default={})
+                for indicator in self._indicators}
+
+    def _missing_period_span(self, cached: dict[str, dict[str, float]], period_ids: list[str]) -> Optional[tuple[int, int]]:
+        missing = [i for i, period_id in enumerate(period_ids)
+                   if any(period_id not in cached[indicator] for indicator in self._indicators)]
+        if not missing:
+            return None
+        return missing[0], missing[-1] + 1
+
+    def _store(self, features_by_id: dict[str, dict], fetched: DataSet):
+        for location, data in fetched.items():
+            feature = features_by_id[location]
+            period_ids = [period.id for period in data.time_period]
+            for indicator in self._indicators:
+                key = self._key(feature, indicator)
+                values = self._cache.get(key, default={})
+                values.update({period_id: float(value)
+                               for period_id, value in zip(period_ids, getattr(data, indicator))
+                               if not np.isnan(value)})
+                self._cache.set(key, values)
+
+    def get_historical_era5(self, features: dict, periodes: PeriodRange) -> DataSet[SimpleClimateData]:
+        period_ids = [period.id for period in periodes]
+        features_by_id = {feature["id"]: feature for feature in features["features"]}
+        missing_spans = {location: self._missing_period_span(self._get_cached(feature), period_ids)
+                         for location, feature in features_by_id.items()}
+        missing_spans = {location: span for location, span in missing_spans.items() if span is not None}
+        if missing_spans:
+            start = min(span[0] for span in missing_spans.values())
+            stop = max(span[1] for span in missing_spans.values())
+            logger.info(f"Fetching climate data for {len(missing_spans)} of {len(features_by_id)} locations, "
+                        f"{stop - start} of {len(period_ids)} periods")
+            missing_features = {**features,
+                                "features": [features_by_id[location] for location in missing_spans]}
+            fetched = self._client.get_historical_era5(missing_features, periodes=periodes[start:stop])
+            self._store(features_by_id, fetched)
+
+        result = {}
+        for location, feature in features_by_id.items():
+            cached = self._get_cached(feature)
+            result[location] = SimpleClimateData(
+                periodes,
+                **{indicator: np.array([cached[indicator].get(period_id, np.nan) for period_id in period_ids])
+                   for indicator in self._indicators},
+            )
+        return DataSet(result)
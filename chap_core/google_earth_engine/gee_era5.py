@@ -1,5 +1,8 @@
 import datetime
+import itertools
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable, List, Callable
 from dotenv import find_dotenv, load_dotenv
 import ee
@@ -14,6 +17,10 @@ from chap_core.time_period.date_util_wrapper import PeriodRange, TimePeriod
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+DEFAULT_PAGE_SIZE = 5_000
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_RETRIES = 3
+
 
 def meter_to_mm(m):
     return round(m * 1000, 3)
@@ -61,7 +68,31 @@ class Periode(BaseModel):
     endDate: datetime.datetime
 
 
+def chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def call_with_retry(func: Callable, max_retries: int = DEFAULT_MAX_RETRIES, backoff: float = 1.0):
+    """Call func, retrying with exponential backoff if it raises. Used for the network calls to GEE (getInfo)"""
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries:
+                raise GEEError(f"Request to Google Earth Engine failed after {max_retries + 1} attempts") from e
+            wait = backoff * 2 ** attempt
+            logger.warning(f"Request to Google Earth Engine failed ({e}), retrying in {wait} seconds")
+            time.sleep(wait)
+
+
 class Era5LandGoogleEarthEngineHelperFunctions:
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES,
+                 retry_backoff: float = 1.0, page_size: int = DEFAULT_PAGE_SIZE):
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._page_size = page_size
+
     # Get every dayli image that exisist within a periode, and reduce it to a periodeReducer value
     def get_image_for_period(self, p: Periode, band: Band, collection: ee.ImageCollection) -> ee.Image:
         p = ee.Dictionary(p)
@@ -116,17 +147,26 @@ class Era5LandGoogleEarthEngineHelperFunctions:
             for f in data
         ]
 
-    def feature_collection_to_list(self, feature_collection: "ee.FeatureCollection"):
-        size = feature_collection.size().getInfo()
-        result: List = []
-        take = 5_000
+    def feature_collection_to_list(self, feature_collection: "ee.FeatureCollection", page_size: int = None):
+        return self.feature_collections_to_list([feature_collection], page_size)
 
-        # Keeps every f.properties, and replace the band values with the converted values
-        for i in range(0, size, take):
-            result = result + (feature_collection.toList(take, i).getInfo())
-            logger.log(logging.INFO, f" Fetched {i+take} of {size}")
+    def feature_collections_to_list(self, feature_collections: List["ee.FeatureCollection"],
+                                    page_size: int = None) -> List:
+        """
+        Fetch all features in the feature collections, in order. The pages of page_size features
+        are fetched concurrently, using at most max_workers requests at a time.
+        """
+        take = page_size or self._page_size
 
-        return result
+        def retry(func):
+            return call_with_retry(func, self._max_retries, self._retry_backoff)
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            sizes = list(executor.map(lambda fc: retry(lambda: fc.size().getInfo()), feature_collections))
+            pages = [(fc, i) for fc, size in zip(feature_collections, sizes) for i in range(0, size, take)]
+            logger.info(f"Fetching {sum(sizes)} features in {len(pages)} pages")
+            results = executor.map(lambda page: retry(lambda: page[0].toList(take, page[1]).getInfo()), pages)
+            return list(itertools.chain.from_iterable(results))
 
     @staticmethod
     def parse_gee_properties(property_dicts: list[dict]) -> DataSet:
@@ -149,8 +189,11 @@ class Era5LandGoogleEarthEngineHelperFunctions:
 
 
 class Era5LandGoogleEarthEngine:
-    def __init__(self, usecwd=False):
-        self.gee_helper = Era5LandGoogleEarthEngineHelperFunctions()
+    def __init__(self, usecwd=False, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_periods_per_request: int = 52, max_features_per_request: int = 100):
+        self.gee_helper = Era5LandGoogleEarthEngineHelperFunctions(max_workers=max_workers)
+        self._max_periods_per_request = max_periods_per_request
+        self._max_features_per_request = max_features_per_request
         self.is_initialized = False
         self._usecwd = usecwd
         self._initialize_client()
@@ -190,6 +233,23 @@ class Era5LandGoogleEarthEngine:
             raise GEEError("Could not initialize Google Earth Engine") from e
 
     def get_historical_era5(self, features: dict, periodes: Iterable[TimePeriod]):
+        """
+        Get the ERA5 aggregates for each feature and period. Large requests are split into sub-requests
+        of at most max_features_per_request features and max_periods_per_request periods, which are fetched
+        concurrently.
+        """
+        periodes = list(periodes)
+        feature_collections = [
+            self._get_reduced_feature_collection({**features, "features": feature_chunk}, period_chunk)
+            for feature_chunk in chunks(features["features"], self._max_features_per_request)
+            for period_chunk in chunks(periodes, self._max_periods_per_request)
+        ]
+        result = self.gee_helper.feature_collections_to_list(feature_collections)
+        parsed_result = self.gee_helper.convert_value_by_band_converter(result, bands)
+
+        return self.gee_helper.parse_gee_properties(parsed_result)
+
+    def _get_reduced_feature_collection(self, features: dict, periodes: List[TimePeriod]) -> "ee.FeatureCollection":
         ee_reducer_type = "mean"
 
         collection = ee.ImageCollection("ECMWF/ERA5_LAND/DAILY_AGGR").select([band.name for band in bands])
@@ -216,12 +276,7 @@ class Era5LandGoogleEarthEngine:
             )
         ).flatten()
 
-        feature_collection: ee.FeatureCollection = ee.FeatureCollection(reduced)
-
-        result = self.gee_helper.feature_collection_to_list(feature_collection)
-        parsed_result = self.gee_helper.convert_value_by_band_converter(result, bands)
-
-        return self.gee_helper.parse_gee_properties(parsed_result)
+        return ee.FeatureCollection(reduced)
 
     def get_daily_data(self, regions, periodes: Iterable[TimePeriod]):
 
@@ -263,22 +318,8 @@ class Era5LandGoogleEarthEngine:
             Returns:
                 pd.DataFrame: A Pandas DataFrame containing the FeatureCollection data.
             """
-            # Initialize an empty DataFrame to store results
-            full_data = []
-
-            # Get the total number of elements in the FeatureCollection
-            total_size = feature_collection.size().getInfo()
-
-            # Fetch data in chunks
-            for start in range(0, total_size, chunk_size):
-                # Get a chunk of features
-                features = feature_collection.toList(chunk_size, start).getInfo()
-                # Extract properties and append to the list
-                for feature in features:
-                    full_data.append(feature["properties"])
-
-            # Convert the full data list into a DataFrame
-            return pd.DataFrame(full_data)
+            features = self.gee_helper.feature_collection_to_list(feature_collection, page_size=chunk_size)
+            return pd.DataFrame([feature["properties"] for feature in features])
         """ def ee_to_df(feature_collection):
             features = feature_collection.getInfo()["features"]
             data = []
@@ -1,4 +1,5 @@
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Callable, Generic, List
@@ -8,6 +9,7 @@ from celery.result import AsyncResult
 from dotenv import find_dotenv, load_dotenv
 
 import celery
+import celery.signals
 from pydantic import BaseModel
 from sqlalchemy import create_engine
 
@@ -91,6 +93,16 @@ app.conf.update(
 )
 
 
+@celery.signals.worker_ready.connect
+def prewarm_model_environments(**kwargs):
+    """Build the environments of the registry models in the background when CHAP_PREWARM_ENVIRONMENTS is set"""
+    if os.getenv("CHAP_PREWARM_ENVIRONMENTS", "").lower() not in ("1", "true", "yes"):
+        return
+    from ..external.environment_pool import prewarm_registry_environments
+    logger.info("Pre-building model environments")
+    threading.Thread(target=prewarm_registry_environments, daemon=True).start()
+
+
 # logger.warning("No database URL set")
 # This is hacky, but defaults to using the test database. Should be synched with what is setup in conftest
 # engine = create_engine("sqlite:///test.db", connect_args={"check_same_thread": False})
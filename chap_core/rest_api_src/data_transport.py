@@ -0,0 +1,79 @@
+"""
+Passing datasets from the api to the workers.
+
+Instead of serializing the full dataset into the job message, the api writes it as an .npz file to
+a directory shared with the workers (CHAP_SHARED_DATA_DIR), and only a small reference to the file
+is sent with the job. Files are named by a hash of their content, so the same dataset is only written once.
+
+Since one file can be referenced by several queued jobs, files are not removed when they are loaded. Instead,
+store_dataset removes files that have not been stored for CHAP_SHARED_DATA_MAX_AGE_HOURS (default 24 hours),
+so a job must be picked up by a worker within that time.
+"""
+import logging
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Type
+
+import numpy as np
+from pydantic import BaseModel
+
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet, FeaturesT, _arrays_hash
+
+logger = logging.getLogger(__name__)
+
+
+class DataSetReference(BaseModel):
+    file_name: str
+
+
+def get_shared_data_dir() -> Path:
+    path = Path(os.getenv("CHAP_SHARED_DATA_DIR", default=Path(tempfile.gettempdir()) / "chap_shared_data"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _max_age_hours() -> float:
+    return float(os.getenv("CHAP_SHARED_DATA_MAX_AGE_HOURS", "24"))
+
+
+def remove_old_datasets(max_age_hours: Optional[float] = None, now: Optional[float] = None) -> int:
+    """Removes the stored datasets that were last stored more than max_age_hours ago. Returns the number removed"""
+    max_age_hours = _max_age_hours() if max_age_hours is None else max_age_hours
+    now = time.time() if now is None else now
+    removed = 0
+    for path in get_shared_data_dir().glob("*.npz"):
+        try:
+            if now - path.stat().st_mtime > max_age_hours * 3600:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    if removed:
+        logger.info(f"Removed {removed} old datasets from {get_shared_data_dir()}")
+    return removed
+
+
+def store_dataset(dataset: DataSet) -> DataSetReference:
+    arrays = dataset._npz_arrays()
+    file_name = f"{_arrays_hash(arrays)}.npz"
+    path = get_shared_data_dir() / file_name
+    try:
+        # a new job refers to the file, so it is kept for another max age from now
+        os.utime(path)
+    except FileNotFoundError:
+        tmp_path = path.with_name(f"{uuid.uuid4().hex}.tmp.npz")
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        logger.info(f"Stored dataset in {path}")
+    remove_old_datasets()
+    return DataSetReference(file_name=file_name)
+
+
+def load_dataset(data: DataSetReference | dict, dataclass: Type[FeaturesT]) -> DataSet[FeaturesT]:
+    """Load a dataset sent to a worker, either as a DataSetReference or as a DataSet.model_dump() dict"""
+    if isinstance(data, DataSetReference):
+        return DataSet.from_npz(get_shared_data_dir() / data.file_name, dataclass)
+    return DataSet.from_dict(data, dataclass)
@@ -1,16 +1,19 @@
+from typing import Optional
+
 from chap_core.assessment.forecast import forecast_ahead
 from chap_core.climate_predictor import QuickForecastFetcher
-from chap_core.database.database import SessionWrapper
+from chap_core.database.database import SessionWrapper, DatasetStorage, DEFAULT_DATASET_STORAGE
 from chap_core.datatypes import FullData, HealthPopulationData
 from chap_core.predictor.model_registry import registry
 from chap_core.assessment.prediction_evaluator import backtest as _backtest
 from chap_core.rest_api_src.data_models import DatasetMakeRequest
+from chap_core.rest_api_src.data_transport import load_dataset
 from chap_core.rest_api_src.worker_functions import harmonize_health_dataset, WorkerConfig
 from chap_core.data import DataSet as InMemoryDataSet
 
 
 def run_backtest(estimator_id: registry.model_type, dataset_id: str, n_periods: int, n_splits: int, stride: int,
-                 session: SessionWrapper):
+                 session: SessionWrapper, n_workers: int = 1, retrain_every: Optional[int] = None):
     dataset = session.get_dataset(dataset_id, FullData)
     estimator = registry.get_model(estimator_id, ignore_env=True)
     predictions_list = _backtest(estimator,
@@ -18,7 +21,9 @@ def run_backtest(estimator_id: registry.model_type, dataset_id: str, n_periods:
                                  prediction_length=n_periods,
                                  n_test_sets=n_splits,
                                  stride=stride,
-                                 weather_provider=QuickForecastFetcher)
+                                 weather_provider=QuickForecastFetcher,
+                                 n_workers=n_workers,
+                                 retrain_every=retrain_every)
     last_train_period = dataset.period_range[-1]
     db_id = session.add_evaluation_results(predictions_list, last_train_period, dataset_id, estimator_id)
     assert db_id is not None
@@ -39,12 +44,22 @@ def debug(session: SessionWrapper):
 
 
 def harmonize_and_add_health_dataset(health_dataset: FullData, name: str, session: SessionWrapper,
-                                     worker_config=WorkerConfig()) -> FullData:
-    health_dataset = InMemoryDataSet.from_dict(health_dataset, HealthPopulationData)
+                                     worker_config=WorkerConfig(),
+                                     storage: DatasetStorage = DEFAULT_DATASET_STORAGE) -> FullData:
+    health_dataset = load_dataset(health_dataset, HealthPopulationData)
     dataset = harmonize_health_dataset(health_dataset, usecwd_for_credentials=False, worker_config=worker_config)
-    db_id = session.add_dataset(name, dataset, polygons=health_dataset.polygons.model_dump_json())
+    db_id = session.add_dataset(name, dataset, polygons=health_dataset.polygons.model_dump_json(), storage=storage)
     return db_id
 
+def harmonize_and_append_health_dataset(health_dataset, dataset_id: int, session: SessionWrapper,
+                                        worker_config=WorkerConfig()) -> int:
+    """Harmonize only the new periods/locations with climate data and append them to an existing dataset"""
+    health_dataset = load_dataset(health_dataset, HealthPopulationData)
+    dataset = harmonize_health_dataset(health_dataset, usecwd_for_credentials=False, worker_config=worker_config)
+    session.append_to_dataset(dataset_id, dataset)
+    return dataset_id
+
+
 def harmonize_and_add_composite_dataset(
         health_dataset: InMemoryDataSet[HealthPopulationData],
         request: DatasetMakeRequest,
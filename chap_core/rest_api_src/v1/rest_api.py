@@ -15,6 +15,7 @@ from chap_core.model_spec import ModelSpec
 from chap_core.predictor.feature_spec import Feature, all_features
 from chap_core.rest_api_src.data_models import FullPredictionResponse
 import chap_core.rest_api_src.worker_functions as wf
+from chap_core.rest_api_src.data_transport import store_dataset
 from chap_core.predictor.model_registry import registry
 from chap_core.worker.interface import SeededJob
 from chap_core.rest_api_src.celery_tasks import CeleryPool
@@ -151,7 +152,7 @@ async def predict(data: PredictionRequest, worker_settings=Depends(get_settings)
         func = wf.predict_pipeline_from_health_data if not data.include_data else wf.predict_pipeline_from_full_data
         job = worker.queue(
             func,
-            health_data.model_dump(), data.estimator_id,
+            store_dataset(health_data), data.estimator_id,
             data.n_periods, target_id, worker_config=worker_settings)
         internal_state.current_job = job
     except Exception as e:
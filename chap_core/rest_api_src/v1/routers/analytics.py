@@ -9,16 +9,17 @@ from sqlmodel import Session
 
 from chap_core.api_types import EvaluationEntry, DataList, DataElement, PredictionEntry, FeatureCollectionModel
 from chap_core.database.base_tables import DBModel
+from chap_core.database.database import SessionWrapper
 from chap_core.datatypes import HealthPopulationData
 from chap_core.spatio_temporal_data.converters import dataset_model_to_dataset, observations_to_dataset
 from .crud import JobResponse, DatasetCreate
 from .dependencies import get_session, get_database_url, get_settings
 from chap_core.database.tables import BackTest
-from chap_core.database.dataset_tables import DataSet
 import logging
 
 from ...celery_tasks import CeleryPool
 from ...data_models import DatasetMakeRequest
+from ...data_transport import store_dataset
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -69,12 +70,8 @@ async def get_evaluation_entries(
     backtest = session.get(BackTest, backtest_id)
     if backtest is None:
         raise HTTPException(status_code=404, detail="BackTest not found")
-    return [
-        EvaluationEntry(period=forecast.period, orgUnit=forecast.org_unit, quantile=q,
-                        splitPeriod=forecast.last_seen_period,
-                        value=np.quantile(forecast.values, q)) for forecast in backtest.forecasts for q in
-        quantiles
-    ]
+    table = SessionWrapper(session=session).get_evaluation_quantiles(backtest_id, quantiles)
+    return table.to_records()
 
 
 class PredictionCreate(DatasetCreate):
@@ -104,7 +101,7 @@ async def make_prediction(dataset: PredictionCreate,
     data = dataset_model_to_dataset(HealthPopulationData, dataset)
 
     job = worker.queue_db(wf.predict_pipeline_from_health_dataset,
-                          data.model_dump(), dataset.name, model_id,
+                          store_dataset(data), dataset.name, model_id,
                           database_url=datababase_url, worker_config=worker_settings)
 
     return JobResponse(id=job.id)
@@ -121,13 +118,12 @@ async def get_actual_cases(backtest_id: Annotated[int, Path(alias="backtestId")]
                            session: Session = Depends(get_session)):
     backtest = session.get(BackTest, backtest_id)
     logger.info(f"Backtest: {backtest}")
-    data = session.get(DataSet, backtest.dataset_id)
-    logger.info(f"Data: {data}")
     if backtest is None:
         raise HTTPException(status_code=404, detail="BackTest not found")
+    observations = SessionWrapper(session=session).get_observations(backtest.dataset_id)
     data_list = [DataElement(pe=observation.period, ou=observation.org_unit, value=float(observation.value) if not (
-            np.isnan(observation.value) or observation.value is None) else None) for
-                 observation in data.observations if observation.element_id == "disease_cases"]
+            observation.value is None or np.isnan(observation.value)) else None) for
+                 observation in observations if observation.element_id == "disease_cases"]
     logger.info(f"DataList: {len(data_list)}")
     return DataList(
         featureId="disease_cases",
@@ -20,7 +20,6 @@ from functools import partial
 from fastapi import Path
 from typing import Optional, List, Annotated
 
-import pandas as pd
 from pydantic import BaseModel, Field
 from sqlmodel import select
 
@@ -28,7 +27,7 @@ from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from sqlmodel import Session
 
 from chap_core.api_types import FeatureCollectionModel
-from chap_core.database.database import SessionWrapper
+from chap_core.database.database import SessionWrapper, DatasetStorage, DEFAULT_DATASET_STORAGE
 from chap_core.database.model_spec_tables import FeatureSource, ModelSpecRead, ModelSpec
 from chap_core.datatypes import FullData, HealthPopulationData
 from chap_core.geometry import Polygons
@@ -38,10 +37,12 @@ from chap_core.rest_api_src.celery_tasks import CeleryPool
 from chap_core.database.tables import BackTest, BackTestMetric, BackTestForecast, BackTestBase, Prediction, \
     PredictionRead
 from chap_core.database.debug import DebugEntry
-from chap_core.database.dataset_tables import ObservationBase, DataSetBase, DataSet, DataSetWithObservations
+from chap_core.database.dataset_tables import ObservationBase, DataSetBase, DataSet, DataSetWithObservations, \
+    DataSetVersion
 from chap_core.database.base_tables import DBModel
 from chap_core.data import DataSet as InMemoryDataSet
 import chap_core.rest_api_src.db_worker_functions as wf
+from chap_core.rest_api_src.data_transport import store_dataset
 
 router = APIRouter(prefix="/crud", tags=["crud"])
 
@@ -57,7 +58,7 @@ class JobResponse(BaseModel):
 
 
 class BackTestCreate(BackTestBase):
-    ...
+    n_workers: int = 1
 
 
 class BackTestRead(BackTestBase):
@@ -82,12 +83,14 @@ async def get_backtest(backtest_id: Annotated[int, Path(alias="backtestId")],
     backtest = session.get(BackTest, backtest_id)
     if backtest is None:
         raise HTTPException(status_code=404, detail="BackTest not found")
-    return backtest
+    forecasts = list(SessionWrapper(session=session).get_backtest_forecasts(backtest_id))
+    return BackTestFull(**backtest.model_dump(), metrics=backtest.metrics, forecasts=forecasts)
 
 
 @router.post("/backtest", response_model=JobResponse)
 async def create_backtest(backtest: BackTestCreate, database_url: str = Depends(get_database_url)):
     job = worker.queue_db(wf.run_backtest, backtest.model_id, backtest.dataset_id, 12, 2, 1,
+                          n_workers=backtest.n_workers,
                           database_url=database_url)
 
     return JobResponse(id=job.id)
@@ -110,7 +113,8 @@ async def get_prediction(prediction_id: Annotated[int, Path(alias="predictionId"
     prediction = session.get(Prediction, prediction_id)
     if prediction is None:
         raise HTTPException(status_code=404, detail="Prediction not found")
-    return prediction
+    forecasts = list(SessionWrapper(session=session).get_prediction_forecasts(prediction_id))
+    return PredictionRead(**prediction.model_dump(), forecasts=forecasts)
 
 
 @router.get("/backtest", response_model=list[BackTestRead])
@@ -121,16 +125,18 @@ async def get_backtests(session: Session = Depends(get_session)):
 
 class DatasetCreate(DataSetBase):
     observations: List[ObservationBase]
+    storage: DatasetStorage = DEFAULT_DATASET_STORAGE
 
 
 @router.get('/datasets/{datasetId}', response_model=DataSetWithObservations)
 async def get_dataset(dataset_id: Annotated[int, Path(alias='datasetId')], session: Session = Depends(get_session)):
     # dataset = session.exec(select(DataSet).where(DataSet.id == dataset_id)).first()
     dataset = session.get(DataSet, dataset_id)
-    assert len(dataset.observations) > 0
     if dataset is None:
         raise HTTPException(status_code=404, detail="Dataset not found")
-    return dataset
+    observations = SessionWrapper(session=session).get_observations(dataset_id)
+    assert len(observations) > 0
+    return DataSetWithObservations(**dataset.model_dump(), observations=observations)
 
 
 class DataBaseResponse(DBModel):
@@ -142,18 +148,49 @@ async def create_dataset(data: DatasetCreate, datababase_url=Depends(get_databas
                          worker_settings=Depends(get_settings)) -> JobResponse:
     health_data = observations_to_dataset(HealthPopulationData, data.observations, fill_missing=True)
     health_data.set_polygons(FeatureCollectionModel.model_validate_json(data.geojson))
-    job = worker.queue_db(wf.harmonize_and_add_health_dataset, health_data.model_dump(), data.name,
+    job = worker.queue_db(wf.harmonize_and_add_health_dataset, store_dataset(health_data), data.name,
+                          database_url=datababase_url, worker_config=worker_settings, storage=data.storage)
+    return JobResponse(id=job.id)
+
+
+class DatasetAppend(DBModel):
+    geojson: str
+    observations: List[ObservationBase]
+
+
+@router.post('/datasets/{datasetId}/append')
+async def append_to_dataset(dataset_id: Annotated[int, Path(alias="datasetId")],
+                            data: DatasetAppend,
+                            session: Session = Depends(get_session),
+                            datababase_url=Depends(get_database_url),
+                            worker_settings=Depends(get_settings)) -> JobResponse:
+    """
+    Add new periods and/or locations to an existing dataset. Only the new data should be posted,
+    climate data is fetched for just those periods and locations.
+    """
+    if session.get(DataSet, dataset_id) is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    health_data = observations_to_dataset(HealthPopulationData, data.observations, fill_missing=True)
+    health_data.set_polygons(FeatureCollectionModel.model_validate_json(data.geojson))
+    job = worker.queue_db(wf.harmonize_and_append_health_dataset, store_dataset(health_data), dataset_id,
                           database_url=datababase_url, worker_config=worker_settings)
     return JobResponse(id=job.id)
 
 
+@router.get('/datasets/{datasetId}/versions', response_model=List[DataSetVersion])
+async def get_dataset_versions(dataset_id: Annotated[int, Path(alias="datasetId")],
+                               session: Session = Depends(get_session)):
+    if session.get(DataSet, dataset_id) is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return SessionWrapper(session=session).get_dataset_versions(dataset_id)
+
+
 @router.post('/datasets/csvFile')
 async def create_dataset_csv(csv_file: UploadFile = File(..., alias='csvFile'),
                              geojson_file: UploadFile = File(..., alias='geojsonFile'),
                              session: Session = Depends(get_session),
                              ) -> DataBaseResponse:
-    csv_content = await csv_file.read()
-    dataset = InMemoryDataSet.from_csv(pd.io.common.BytesIO(csv_content), dataclass=FullData)
+    dataset = InMemoryDataSet.from_csv(csv_file.file, dataclass=FullData)
     geo_json_content = await geojson_file.read()
     features = Polygons.from_geojson(json.loads(geo_json_content), id_property='NAME_1').feature_collection()
     dataset_id = SessionWrapper(session=session).add_dataset('csv_file', dataset, features.model_dump_json())
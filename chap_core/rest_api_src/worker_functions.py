@@ -1,15 +1,16 @@
 import json
 import os
-from typing import Optional, Tuple, List, Union
+from typing import Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel
 
-from chap_core.api_types import RequestV1, PredictionRequest, EvaluationEntry, EvaluationResponse, DataList, \
+from chap_core.api_types import RequestV1, PredictionRequest, EvaluationResponse, DataList, \
     DataElement, DataElementV2
 from chap_core.assessment.forecast import forecast_with_predicted_weather, forecast_ahead
 from chap_core.assessment.prediction_evaluator import backtest
+from chap_core.assessment.sample_summaries import QuantileTable, summarize_samples
 from chap_core.climate_data.seasonal_forecasts import SeasonalForecast
 from chap_core.climate_predictor import QuickForecastFetcher
 from chap_core.datatypes import FullData, Samples, HealthData, HealthPopulationData, create_tsdataclass, TimeSeriesArray
@@ -18,8 +19,10 @@ from chap_core.external.external_model import (
     get_model_from_directory_or_github_url,
 )
 from chap_core.google_earth_engine.gee_era5 import Era5LandGoogleEarthEngine
+from chap_core.google_earth_engine.era5_cache import CachedEra5Client
 from chap_core.predictor.model_registry import registry
 from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.rest_api_src.data_transport import load_dataset
 import dataclasses
 import logging
 
@@ -48,13 +51,13 @@ def initialize_gee_client(usecwd=False, worker_config: WorkerConfig = WorkerConf
         from chap_core.testing.mocks import GEEMock
         return GEEMock()
     gee_client = Era5LandGoogleEarthEngine(usecwd=usecwd)
-    return gee_client
+    return CachedEra5Client(gee_client)
 
 
 def predict_pipeline_from_health_data(health_dataset: DataSet[HealthPopulationData],
                                       estimator_id: str, n_periods: int,
                                       target_id='disease_cases', worker_config: WorkerConfig = WorkerConfig()):
-    health_dataset = DataSet.from_dict(health_dataset, HealthPopulationData)
+    health_dataset = load_dataset(health_dataset, HealthPopulationData)
     dataset = harmonize_health_dataset(health_dataset, usecwd_for_credentials=False, worker_config=worker_config)
     estimator = registry.get_model(estimator_id,
                                    ignore_env=estimator_id.startswith('chap_ewars'))
@@ -65,7 +68,7 @@ def predict_pipeline_from_health_data(health_dataset: DataSet[HealthPopulationDa
 def predict_pipeline_from_full_data(dataset: dict,
                                     estimator_id: str, n_periods: int,
                                     target_id='disease_cases', worker_config: WorkerConfig = WorkerConfig()):
-    dataset = DataSet.from_dict(dataset, FullData)
+    dataset = load_dataset(dataset, FullData)
     estimator = registry.get_model(estimator_id,
                                    ignore_env=estimator_id.startswith('chap_ewars'))
     predictions = forecast_ahead(estimator, dataset, n_periods)
@@ -80,7 +83,7 @@ def predict(json_data: PredictionRequest):
 
 
 def sample_dataset_to_prediction_response(predictions: DataSet[Samples], target_id: str) -> dict:
-    summaries = DataSet({location: samples.summaries() for location, samples in predictions.items()})
+    summaries = summarize_samples(predictions)
     attrs = ["median", "quantile_high", "quantile_low"]
     data_values = predictions_to_datavalue(summaries, attribute_mapping=dict(zip(attrs, attrs)))
     json_body = [dataclasses.asdict(element) for element in data_values]
@@ -133,22 +136,13 @@ def __clean_actual_cases(real_data: DataList) -> DataList:
 
 
 def samples_to_evaluation_response(predictions_list, quantiles, real_data: DataList):
-    evaluation_entries: List[EvaluationEntry] = []
-    for predictions in predictions_list:
-        first_period = predictions.period_range[0]
-        for location, samples in predictions.items():
-            quantiles = {q: np.quantile(samples.samples, q, axis=-1) for q in quantiles}
-            for q, quantile in quantiles.items():
-                for period, value in zip(predictions.period_range, quantile):
-                    entry = EvaluationEntry(orgUnit=location,
-                                            period=period.id,
-                                            quantile=q,
-                                            value=value,
-                                            splitPeriod=first_period.id)
-                    evaluation_entries.append(entry)
+    table = QuantileTable.concatenate(
+        QuantileTable.from_dataset(predictions, quantiles, split_period=predictions.period_range[0].id)
+        for predictions in predictions_list
+    )
     real_data = __clean_actual_cases(real_data)
     return EvaluationResponse(actualCases=real_data,
-                              predictions=evaluation_entries)  # .model_dump()
+                              predictions=table.to_records())  # .model_dump()
 
 
 def train_on_json_data(json_data: RequestV1, model_name, model_path, control=None):
@@ -163,7 +157,7 @@ def train_on_json_data(json_data: RequestV1, model_name, model_path, control=Non
 
     predictor = model.train(train_data)  # , extra_args=data.area_polygons)
     predictions = forecast_with_predicted_weather(predictor, train_data, 3)
-    summaries = DataSet({location: samples.summaries() for location, samples in predictions.items()})
+    summaries = summarize_samples(predictions)
     attrs = ["median", "quantile_high", "quantile_low"]
     data_values = predictions_to_datavalue(summaries, attribute_mapping=dict(zip(attrs, attrs)))
     json_body = [dataclasses.asdict(element) for element in data_values]
@@ -1,23 +1,36 @@
 import logging
 import subprocess
 from pathlib import Path
+from typing import Optional
 from chap_core.exceptions import CommandLineException
 from chap_core.runners.runner import Runner
 
 logger = logging.getLogger(__name__)
 
 class CommandLineRunner(Runner):
-    def __init__(self, working_dir: str | Path):
+    supports_server = True
+
+    def __init__(self, working_dir: str | Path, env: Optional[dict[str, str]] = None):
         self._working_dir = working_dir
+        self._env = env
 
     def run_command(self, command):
-        return run_command(command, self._working_dir)
+        return run_command(command, self._working_dir, env=self._env)
 
     def store_file(self):
         pass
 
+    def start_process(self, command: str) -> subprocess.Popen:
+        """Starts a long-lived process with line-buffered text pipes for stdin, stdout and stderr"""
+        logger.info(f"Starting process: {command}")
+        return subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                cwd=self._working_dir, env=self._env, shell=True, text=True, bufsize=1)
+
+    def with_working_dir(self, working_dir: str | Path) -> "CommandLineRunner":
+        return CommandLineRunner(working_dir, self._env)
+
 
-def run_command(command: str, working_directory=Path(".")):
+def run_command(command: str, working_directory=Path("."), env: Optional[dict[str, str]] = None):
     """Runs a unix command using subprocess"""
     logging.info(f"Running command: {command}")
     # command = command.split()
@@ -25,7 +38,7 @@ def run_command(command: str, working_directory=Path(".")):
     try:
         process = subprocess.Popen(command, stdout=subprocess.PIPE, 
                                    stderr=subprocess.PIPE, 
-                                   cwd=working_directory, shell=True)
+                                   cwd=working_directory, env=env, shell=True)
         stdout, stderr = process.communicate()
         output = stdout.decode() + "\n" + stderr.decode()
         """
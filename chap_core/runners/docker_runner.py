@@ -1,8 +1,16 @@
+import copy
+import os
+import shlex
+import subprocess
 from pathlib import Path
+from typing import Optional
+
 import docker
 from ..docker_helper_functions import (
+    ImageEvictionPolicy,
     create_docker_image,
     run_command_through_docker_container,
+    warm_containers,
 )
 from .runner import Runner
 import logging
@@ -10,39 +18,101 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class DockerImageRunner(Runner):
-    """A runner based on a docker image (Dockerfile)"""
+def _reuse_containers_from_env() -> bool:
+    return os.getenv("CHAP_DOCKER_REUSE_CONTAINERS", "").lower() in ("1", "true", "yes")
 
-    def __init__(self, docker_file_path: str, working_dir: str | Path):
-        self._docker_file_path = Path(working_dir) / docker_file_path
-        self._docker_name = None
+
+class DockerRunner(Runner):
+    """
+    Runs through a docker image specified by name (e.g. on dockerhub), not a Dockerfile
+
+    If reuse_container is True, one container is kept running per (image, working dir), and commands are run in it
+    with `exec` instead of starting a new container each time. The default is taken from the
+    CHAP_DOCKER_REUSE_CONTAINERS environment variable.
+    The image is only removed on teardown if an eviction_policy is given (by default from the environment,
+    see ImageEvictionPolicy.from_env), and then only when the policy says so.
+    """
+
+    supports_server = True
+
+    def __init__(self, docker_name: Optional[str], working_dir: str | Path, reuse_container: Optional[bool] = None,
+                 eviction_policy: Optional[ImageEvictionPolicy] = None, client=None):
+        self._docker_name = docker_name
         self._working_dir = working_dir
+        self._reuse_container = _reuse_containers_from_env() if reuse_container is None else reuse_container
+        self._eviction_policy = ImageEvictionPolicy.from_env() if eviction_policy is None else eviction_policy
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    def run_command(self, command):
+        logger.info(f"Running command {command} in docker container {self._docker_name} in {self._working_dir}")
+        if self._eviction_policy is not None:
+            self._eviction_policy.record_use(self._docker_name)
+        if self._reuse_container:
+            return warm_containers.run_command(self.client, self._docker_name, self._working_dir, command)
+        return run_command_through_docker_container(self._docker_name, self._working_dir, command, client=self.client)
+
+    def start_process(self, command: str) -> subprocess.Popen:
+        """Starts a long-lived container for the command, with stdin kept open"""
+        working_dir = os.path.abspath(self._working_dir)
+        docker_command = ["docker", "run", "-i", "--rm", "-w", "/home/run", "-v", f"{working_dir}:/home/run/",
+                          self._docker_name, *shlex.split(command)]
+        logger.info(f"Starting process: {' '.join(docker_command)}")
+        return subprocess.Popen(docker_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, bufsize=1)
+
+    def with_working_dir(self, working_dir: str | Path) -> "DockerRunner":
+        return DockerRunner(self._docker_name, working_dir, self._reuse_container, self._eviction_policy,
+                            self._client)
+
+    def teardown(self):
+        """Removes images if the eviction policy says so. The image of this runner is kept"""
+        if self._eviction_policy is not None:
+            self._eviction_policy.evict(self.client, in_use=(self._docker_name,))
+
+    def close(self):
+        """Stops the warm container for this working dir"""
+        if self._reuse_container:
+            warm_containers.stop(self._docker_name, self._working_dir)
+
+
+class DockerImageRunner(DockerRunner):
+    """A runner based on a docker image (Dockerfile). The image is only rebuilt when the Dockerfile changes"""
+
+    def __init__(self, docker_file_path: str, working_dir: str | Path, reuse_container: Optional[bool] = None,
+                 eviction_policy: Optional[ImageEvictionPolicy] = None, client=None):
+        super().__init__(None, working_dir, reuse_container, eviction_policy, client)
+        self._docker_file_path = Path(working_dir) / docker_file_path
         self._is_setup = False
 
     def setup(self):
         if self._is_setup:
             return
-        self._docker_name = create_docker_image(self._docker_file_path)
+        self._docker_name = create_docker_image(self._docker_file_path, client=self.client)
         self._is_setup = True
 
     def run_command(self, command):
         self.setup()
-        return run_command_through_docker_container(self._docker_name, self._working_dir, command)
-
-
-class DockerRunner(Runner):
-    """Runs through a docker image specified by name (e.g. on dockerhub), not a Dockerfile"""
+        return super().run_command(command)
 
-    def __init__(self, docker_name: str, working_dir: str | Path):
-        self._docker_name = docker_name
-        self._working_dir = working_dir
+    def start_process(self, command: str) -> subprocess.Popen:
+        self.setup()
+        return super().start_process(command)
 
-    def run_command(self, command):
-        logger.info(f"Running command {command} in docker container {self._docker_name} in {self._working_dir}")
-        return run_command_through_docker_container(self._docker_name, self._working_dir, command)
+    def with_working_dir(self, working_dir: str | Path) -> "DockerImageRunner":
+        runner = copy.copy(self)
+        runner._working_dir = working_dir
+        return runner
 
     def teardown(self):
-        # remove the docker image
-        client = docker.from_env()
-        client.images.remove(self._docker_name, force=True)
+        if self._is_setup:
+            super().teardown()
 
+    def close(self):
+        if self._is_setup:
+            super().close()
@@ -0,0 +1,122 @@
+"""
+Long-lived model processes.
+
+A model can declare a `serve` entry point in its MLproject file. The serve command is started once, and each
+train/predict call is sent to it as one JSON object per line on stdin, instead of starting a new process per call:
+
+    {"command": "train", "train_data": "training_data.csv", "model": "model"}
+    {"command": "predict", "model": "model", "historic_data": "historic_data.csv",
+     "future_data": "future_data.csv", "out_file": "predictions.csv"}
+
+A "polygons" key is added when the data has polygons. The file names are relative to the working directory of the
+process. The model answers each request with one JSON line on stdout, either {"status": "ok"} or
+{"status": "error", "message": "..."}. Other lines on stdout, and everything on stderr, are logged as model output.
+Train should still write the model file, since predictions can be sent to a new server in another working directory.
+"""
+import json
+import logging
+import queue
+import subprocess
+import threading
+import weakref
+from typing import Optional
+
+from chap_core.exceptions import CommandLineException, ModelServerError
+
+logger = logging.getLogger(__name__)
+
+
+def _read_lines(stream, lines: queue.Queue):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def _log_lines(stream):
+    for line in stream:
+        logger.info(f"model: {line.rstrip()}")
+
+
+def _stop_process(process: subprocess.Popen, timeout: float):
+    if process.poll() is not None:
+        return
+    try:
+        process.stdin.close()
+        process.wait(timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        process.kill()
+        process.wait()
+
+
+class ModelServer:
+    """
+    A model process speaking the JSON-lines protocol above. The process is started by runner.start_process,
+    so that it runs in the same environment (e.g. docker container) as the one-shot commands would.
+    The runner must support servers (runner.supports_server).
+    """
+
+    def __init__(self, runner, command: str, request_timeout: Optional[float] = None, stop_timeout: float = 10.0):
+        self._runner = runner
+        self._command = command
+        self._request_timeout = request_timeout
+        self._stop_timeout = stop_timeout
+        self._process = None
+        self._lines = None
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        if self.is_running:
+            return
+        if not self._runner.supports_server:
+            raise ModelServerError(f"{type(self._runner).__name__} can not run model server '{self._command}'")
+        logger.info(f"Starting model server: {self._command}")
+        try:
+            self._process = self._runner.start_process(self._command)
+        except OSError as e:
+            raise ModelServerError(f"Could not start model server '{self._command}'") from e
+        self._lines = queue.Queue()
+        threading.Thread(target=_read_lines, args=(self._process.stdout, self._lines), daemon=True).start()
+        threading.Thread(target=_log_lines, args=(self._process.stderr,), daemon=True).start()
+        self._finalizer = weakref.finalize(self, _stop_process, self._process, self._stop_timeout)
+
+    def request(self, command: str, **arguments) -> dict:
+        """Send one request and wait for its answer. Raises CommandLineException if the model reports an error"""
+        with self._lock:
+            self.start()
+            message = json.dumps({"command": command, **{key: str(value) for key, value in arguments.items()}})
+            try:
+                self._process.stdin.write(message + "\n")
+                self._process.stdin.flush()
+            except OSError as e:
+                raise ModelServerError(f"Model server stopped, could not send {command} request") from e
+            response = self._read_response()
+        if response.get("status") != "ok":
+            raise CommandLineException(f"Model server failed on {command}: {response.get('message', response)}")
+        return response
+
+    def _read_response(self) -> dict:
+        while True:
+            try:
+                line = self._lines.get(timeout=self._request_timeout)
+            except queue.Empty:
+                self.stop()
+                raise ModelServerError(f"No answer from model server within {self._request_timeout} seconds")
+            if line is None:
+                raise ModelServerError(f"Model server exited with return code {self._process.wait()}")
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                response = None
+            if isinstance(response, dict) and "status" in response:
+                return response
+            logger.info(f"model: {line.rstrip()}")
+
+    def stop(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self._process = None
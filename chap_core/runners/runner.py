@@ -2,15 +2,27 @@ from typing import Optional
 
 
 class Runner:
+    # Whether start_process is implemented, so that models can run as a server (see chap_core.runners.model_server)
+    supports_server = False
+
     def run_command(self, command): ...
 
     def store_file(self, file_path): ...
 
+    def start_process(self, command):
+        """Starts a long-lived process for the command, returning a subprocess.Popen with text pipes for
+        stdin, stdout and stderr. Only available when supports_server is True"""
+        raise NotImplementedError
+
     def teardown(self):
         """To be called after the runner is done with train and predict. This is to clean up the runner, e.g.
         to remove docker images, etc"""
         ...
 
+    def close(self):
+        """Stops anything kept running between commands, e.g. a reused docker container"""
+        ...
+
 
 class TrainPredictRunner:
     """
@@ -30,3 +42,11 @@ class TrainPredictRunner:
 
     def teardown(self): ...
 
+    def close(self):
+        """Stops anything kept running between train and predict calls, e.g. a model server"""
+        ...
+
+    def with_working_dir(self, working_dir) -> "TrainPredictRunner":
+        """Returns a copy of this runner that runs its commands in working_dir"""
+        raise NotImplementedError
+
@@ -1,10 +1,12 @@
 import tarfile
 from pathlib import Path
+from typing import Iterable, Optional
 
 import pooch
 
 from chap_core.datatypes import FullData
 from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.time_period import PeriodRange
 
 
 class MultiCountryDataSet:
@@ -40,6 +42,23 @@ class MultiCountryDataSet:
         data = {file.stem: DataSet.from_csv(file, dataclass) for file in csv_files}
         return MultiCountryDataSet(data)
 
+    def to_parquet(self, folder_path):
+        """Write one parquet file per country to folder_path"""
+        folder_path = Path(folder_path)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        for name, data in self.items():
+            data.to_parquet(folder_path / f"{name}.parquet")
+
+    @classmethod
+    def from_parquet(cls, folder_path, dataclass=FullData, countries: Optional[Iterable[str]] = None,
+                     period_range: Optional[PeriodRange] = None):
+        """Read the parquet files written by to_parquet, optionally only for some countries and periods"""
+        files = {file.stem: file for file in Path(folder_path).glob("*.parquet")}
+        if countries is not None:
+            files = {name: files[name] for name in countries}
+        data = {name: DataSet.from_parquet(file, dataclass, period_range=period_range) for name, file in files.items()}
+        return MultiCountryDataSet(data)
+
     @property
     def period_range(self):
         return list(self._data.values())[0].period_range
@@ -1,5 +1,8 @@
+import functools
+import hashlib
+import operator
 import pickle
-from typing import Generic, Iterable, Tuple, Type, Callable
+from typing import Generic, Iterable, Tuple, Type, Callable, Optional
 
 import numpy as np
 import pandas as pd
@@ -13,14 +16,43 @@ from ..datatypes import (
     TimeSeriesArray,
     TimeSeriesData,
 )
-from ..time_period import PeriodRange
-from ..time_period.date_util_wrapper import TimeStamp, clean_timestring
+from ..time_period import PeriodRange, TimePeriod
+from ..time_period.date_util_wrapper import TimeStamp, clean_timestrings, parse_period_strings, _ordinal_time_delta
 import dataclasses
 from typing import TypeVar
 
 FeaturesT = TypeVar("FeaturesT")
 TemporalIndexType = slice
 
+def _global_codes(values: pd.Series, index: dict) -> np.ndarray:
+    """Integer codes for the values, where index maps each value seen so far (also in earlier chunks) to its code"""
+    codes, uniques = pd.factorize(values)
+    mapping = np.array([index.setdefault(value, len(index)) for value in uniques], dtype=int)
+    if not len(mapping):
+        return np.full(len(codes), -1)
+    return np.where(codes < 0, -1, mapping[np.maximum(codes, 0)])
+
+
+def _arrays_hash(arrays: dict[str, np.ndarray]) -> str:
+    """sha256 of named arrays, including their dtypes and shapes"""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _arrow_column_to_numpy(column) -> np.ndarray:
+    """Numpy array from a (chunked) arrow column. List columns, i.e. samples, give a 2d array"""
+    import pyarrow as pa
+
+    column = column.combine_chunks()
+    if pa.types.is_fixed_size_list(column.type) or pa.types.is_list(column.type):
+        return column.flatten().to_numpy(zero_copy_only=False).reshape(len(column), -1)
+    return column.to_numpy(zero_copy_only=False)
+
+
 class TemporalDataclass(Generic[FeaturesT]):
     """
     Wraps a dataclass in a object that is can be sliced by time period.
@@ -258,14 +290,90 @@ class DataSet(Generic[FeaturesT]):
         ... )
         >>> DataSet.from_pandas(df, HealthData)
         """
+        df = df.assign(time_period=clean_timestrings(df['time_period']))
+        dataset = cls._from_pandas_dense(df, dataclass, fill_missing)
+        if dataset is not None:
+            return dataset
         data_dict = {}
         for location, data in df.groupby("location"):
-            data['time_period'] = data['time_period'].apply(clean_timestring)
             data_dict[location] = dataclass.from_pandas(data.sort_values(by='time_period'), fill_missing)
         data_dict = cls._fill_missing(data_dict)
 
         return cls(data_dict)
 
+    @classmethod
+    def _from_pandas_dense(cls, df: pd.DataFrame, dataclass: Type[FeaturesT], fill_missing=False):
+        """
+        Build the dataset by factorizing locations and periods once and scattering each field
+        into a (n_locations, n_periods) array. Returns None if the dataframe can not be handled
+        this way (unknown period format, custom from_pandas, duplicates, non-consecutive periods),
+        in which case the per-location path is used.
+        """
+        if dataclass.from_pandas.__func__ is not TimeSeriesData.from_pandas.__func__:
+            return None
+        field_names = [field.name for field in dataclasses.fields(dataclass) if field.name != "time_period"]
+        if not len(df) or any(name not in df.columns for name in field_names):
+            return None
+        location_codes, locations = pd.factorize(df["location"], sort=True)
+        period_codes, period_strings = pd.factorize(df["time_period"])
+        return cls._from_codes(dataclass, location_codes, locations, period_codes, period_strings,
+                               {name: df[name].to_numpy() for name in field_names}, fill_missing)
+
+    @classmethod
+    def _from_codes(cls, dataclass, location_codes: np.ndarray, locations, period_codes: np.ndarray, period_strings,
+                    field_values: dict[str, np.ndarray], fill_missing=False):
+        """
+        Scatter one value per row into (n_locations, n_periods) arrays, given the location and period
+        codes of each row. The locations should be sorted. Returns None if this is not possible.
+        """
+        parsed = parse_period_strings(period_strings)
+        if parsed is None:
+            return None
+        ordinals, time_delta = parsed
+        return cls._from_ordinal_codes(dataclass, location_codes, locations, period_codes, ordinals, time_delta,
+                                       field_values, fill_missing)
+
+    @classmethod
+    def _from_ordinal_codes(cls, dataclass, location_codes: np.ndarray, locations, period_codes: np.ndarray,
+                            ordinals: np.ndarray, time_delta, field_values: dict[str, np.ndarray], fill_missing=False):
+        """
+        Same as _from_codes, but with the periods given as integer ordinals (see PeriodRange.ordinals).
+        Field values can have extra dimensions after the row dimension, i.e. samples.
+        """
+        if np.any(location_codes < 0) or np.any(period_codes < 0):
+            return None
+        period_range, _ = PeriodRange._from_ordinal_array(np.unique(ordinals), time_delta, fill_missing=True)
+        period_index = np.searchsorted(period_range.ordinals, ordinals)[period_codes]
+        n_locations, n_periods = len(locations), len(period_range)
+        flat_index = location_codes * n_periods + period_index
+        counts = np.bincount(flat_index, minlength=n_locations * n_periods)
+        if np.any(counts > 1):
+            return None
+        if not fill_missing:
+            first = np.full(n_locations, n_periods)
+            last = np.full(n_locations, -1)
+            np.minimum.at(first, location_codes, period_index)
+            np.maximum.at(last, location_codes, period_index)
+            if np.any(np.bincount(location_codes, minlength=n_locations) != last - first + 1):
+                return None
+        is_complete = len(location_codes) == n_locations * n_periods
+        fields = {}
+        for name, values in field_values.items():
+            shape = (n_locations * n_periods,) + values.shape[1:]
+            array = np.empty(shape, dtype=values.dtype) if is_complete else np.full(shape, np.nan)
+            array[flat_index] = values
+            fields[name] = array.reshape((n_locations, n_periods) + values.shape[1:])
+        return cls._from_field_arrays(dataclass, period_range, list(locations), fields)
+
+    @classmethod
+    def _from_field_arrays(cls, dataclass, period_range: PeriodRange, locations: list, fields: dict[str, np.ndarray]):
+        return cls(
+            {
+                location: dataclass(period_range, **{name: array[i] for name, array in fields.items()})
+                for i, location in enumerate(locations)
+            }
+        )
+
     def to_csv(self, file_name: str, mode="w"):
         self.to_pandas().to_csv(file_name, mode=mode)
 
@@ -280,12 +388,160 @@ class DataSet(Generic[FeaturesT]):
             data_dict = pickle.load(f)
         return cls({loc: dataclass.from_pickle_dict(val) for loc, val in data_dict.items()})
 
+    def _npz_arrays(self) -> dict[str, np.ndarray]:
+        dense = DenseDataSet.from_dataset(self)
+        arrays = {f"field_{name}": array for name, array in dense.fields.items()}
+        arrays["locations"] = np.array([str(location) for location in dense.keys()])
+        arrays["start_period"] = np.array(dense.period_range[0].id)
+        arrays["n_periods"] = np.array(len(dense.period_range))
+        if self._polygons is not None:
+            arrays["polygons"] = np.array(self._polygons.model_dump_json())
+        return arrays
+
+    def content_hash(self) -> str:
+        """Hash of the values, locations, periods and polygons of the dataset, equal for datasets with equal content"""
+        return _arrays_hash(self._npz_arrays())
+
+    def to_npz(self, file):
+        """Write the dataset, including polygons, as numpy arrays to an uncompressed .npz file"""
+        np.savez(file, **self._npz_arrays())
+
+    @classmethod
+    def from_npz(cls, file, dataclass: Type[FeaturesT]) -> "DataSet[FeaturesT]":
+        with np.load(file, allow_pickle=False) as npz:
+            period_range = PeriodRange.from_start_and_n_periods(
+                TimePeriod.from_id(str(npz["start_period"])), int(npz["n_periods"])
+            )
+            fields = {field.name: npz[f"field_{field.name}"]
+                      for field in dataclasses.fields(dataclass) if field.name != "time_period"}
+            dataset = cls._from_field_arrays(dataclass, period_range, npz["locations"].tolist(), fields)
+            if "polygons" in npz:
+                dataset._polygons = FeatureCollectionModel.model_validate_json(str(npz["polygons"]))
+        return dataset
+
+    _ROW_GROUP_BYTES = 64 * 1024 * 1024
+
+    def to_arrow_table(self):
+        """
+        Convert the dataset to a pyarrow Table with one row per location and period, sorted by location and period.
+        The periods are stored as integer ordinals (see PeriodRange.ordinals) in the 'period' column, with the
+        unit and step of the ordinals in the schema metadata. Fields with an extra dimension, like samples,
+        are stored as fixed size lists.
+        """
+        import pyarrow as pa
+
+        dense = DenseDataSet.from_dataset(self)
+        locations = np.array([str(location) for location in dense.keys()], dtype=object)
+        order = np.argsort(locations, kind="stable")
+        is_sorted = np.all(order == np.arange(len(order)))
+        period_range = dense.period_range
+        n_rows = len(locations) * len(period_range)
+        columns = {
+            "location": pa.array(np.repeat(locations[order], len(period_range)), type=pa.string()),
+            "period": pa.array(np.tile(period_range.ordinals, len(locations)).astype(np.int64)),
+        }
+        for name, array in dense.fields.items():
+            assert array.ndim <= 3, (name, array.shape)
+            values = (array if is_sorted else array[order]).reshape((n_rows,) + array.shape[2:])
+            if values.ndim == 1:
+                columns[name] = pa.array(values)
+            else:
+                columns[name] = pa.FixedSizeListArray.from_arrays(pa.array(values.ravel()), values.shape[1])
+        metadata = {"period_unit": period_range._unit, "period_step": str(period_range._step)}
+        if self._polygons is not None:
+            metadata["polygons"] = self._polygons.model_dump_json()
+        return pa.table(columns).replace_schema_metadata(metadata)
+
+    def _rows_per_group(self, table) -> int:
+        """Number of rows in each parquet row group/arrow record batch. Always a whole number of locations"""
+        n_periods = len(self.period_range)
+        location_bytes = max(1, table.nbytes * n_periods // max(table.num_rows, 1))
+        return max(1, self._ROW_GROUP_BYTES // location_bytes) * n_periods
+
+    def to_parquet(self, file_name, compression="snappy"):
+        """
+        Write the dataset to a parquet file (see to_arrow_table for the layout). Each row group holds whole
+        locations, so that reading only some locations or periods can skip the row groups that are not needed.
+        """
+        import pyarrow.parquet as pq
+
+        table = self.to_arrow_table()
+        pq.write_table(table, str(file_name), row_group_size=self._rows_per_group(table), compression=compression)
+
+    def to_arrow(self, file_name):
+        """Write the dataset to an uncompressed Arrow IPC file, which is memory mapped when reading it back"""
+        import pyarrow as pa
+
+        table = self.to_arrow_table()
+        with pa.OSFile(str(file_name), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=self._rows_per_group(table))
+
+    @classmethod
+    def from_parquet(cls, file_name, dataclass: Type[FeaturesT], locations: Optional[Iterable[str]] = None,
+                     period_range: Optional[PeriodRange] = None) -> "DataSet[FeaturesT]":
+        """
+        Read a dataset written by to_parquet. Only the columns for the fields of the dataclass are read,
+        and if locations or period_range is given, only the rows for those locations and periods.
+        """
+        return cls._from_arrow_dataset(file_name, "parquet", dataclass, locations, period_range)
+
+    @classmethod
+    def from_arrow(cls, file_name, dataclass: Type[FeaturesT], locations: Optional[Iterable[str]] = None,
+                   period_range: Optional[PeriodRange] = None) -> "DataSet[FeaturesT]":
+        """Read a dataset written by to_arrow. Selecting columns and rows works as in from_parquet"""
+        return cls._from_arrow_dataset(file_name, "ipc", dataclass, locations, period_range)
+
+    @classmethod
+    def _from_arrow_dataset(cls, file_name, file_format: str, dataclass: Type[FeaturesT],
+                            locations: Optional[Iterable[str]], period_range: Optional[PeriodRange]):
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        arrow_dataset = ds.dataset(str(file_name), format=file_format, filesystem=fs.LocalFileSystem(use_mmap=True))
+        metadata = {key.decode(): value.decode() for key, value in (arrow_dataset.schema.metadata or {}).items()}
+        unit, step = metadata["period_unit"], int(metadata["period_step"])
+        filters = []
+        if locations is not None:
+            locations = [str(location) for location in locations]
+            filters.append(ds.field("location").isin(locations))
+        if period_range is not None:
+            if (period_range._unit, period_range._step) != (unit, step):
+                raise ValueError(f"Period range {period_range} does not match the periods in {file_name}")
+            filters.append((ds.field("period") >= period_range._start_ordinal)
+                           & (ds.field("period") < period_range._end_ordinal))
+        field_names = [field.name for field in dataclasses.fields(dataclass) if field.name != "time_period"]
+        table = arrow_dataset.to_table(columns=["location", "period", *field_names],
+                                       filter=functools.reduce(operator.and_, filters) if filters else None)
+        if not table.num_rows:
+            raise ValueError(f"No data in {file_name} for the given locations and period range")
+        location_codes, location_names = pd.factorize(table.column("location").to_numpy(zero_copy_only=False))
+        period_codes, ordinals = pd.factorize(table.column("period").to_numpy())
+        fields = {name: _arrow_column_to_numpy(table.column(name)) for name in field_names}
+        dataset = cls._from_ordinal_codes(dataclass, location_codes, list(location_names), period_codes, ordinals,
+                                          _ordinal_time_delta(unit, step), fields, fill_missing=True)
+        if dataset is None:
+            raise ValueError(f"Duplicate rows for the same location and period in {file_name}")
+        if "polygons" in metadata:
+            polygons = FeatureCollectionModel.model_validate_json(metadata["polygons"])
+            if locations is not None:
+                polygons = polygons.model_copy(
+                    update={"features": [feature for feature in polygons.features if feature.id in locations]}
+                )
+            dataset._polygons = polygons
+        return dataset
+
     @classmethod
     def from_file(cls, file_name: str, dataclass: Type[FeaturesT]) -> "DataSet[FeaturesT]":
         if file_name.endswith(".csv"):
             return cls.from_csv(file_name, dataclass)
         if file_name.endswith(".pkl"):
             return cls.from_pickle(file_name, dataclass)
+        if file_name.endswith(".npz"):
+            return cls.from_npz(file_name, dataclass)
+        if file_name.endswith(".parquet"):
+            return cls.from_parquet(file_name, dataclass)
+        if file_name.endswith(".arrow"):
+            return cls.from_arrow(file_name, dataclass)
         raise ValueError("Unknown file type")
 
     @classmethod
@@ -333,8 +589,52 @@ class DataSet(Generic[FeaturesT]):
         return cls(data_dict)
 
     @classmethod
-    def from_csv(cls, file_name: str, dataclass: Type[FeaturesT]) -> "DataSet[FeaturesT]":
-        return cls.from_pandas(pd.read_csv(file_name), dataclass)
+    def from_csv(cls, file_name: str, dataclass: Type[FeaturesT], chunk_size: Optional[int] = 100_000) -> "DataSet[FeaturesT]":
+        """
+        Read a dataset from a csv file name or file object. The file is read in chunks of chunk_size rows, keeping
+        only integer codes for the locations and periods along with the dataclass fields, so that peak memory is
+        close to the size of the final arrays. Locations are always read as strings. With chunk_size=None the whole
+        file is read with pandas at once.
+        """
+        if chunk_size is None or dataclass.from_pandas.__func__ is not TimeSeriesData.from_pandas.__func__:
+            return cls.from_pandas(pd.read_csv(file_name), dataclass)
+        field_names = [field.name for field in dataclasses.fields(dataclass) if field.name != "time_period"]
+        columns = {"location", "time_period", *field_names}
+        location_ids, period_ids = {}, {}
+        location_codes, period_codes = [], []
+        field_values = {name: [] for name in field_names}
+        # fixed dtypes for the keys, since pandas infers dtypes separately for each chunk
+        chunks = pd.read_csv(file_name, chunksize=chunk_size, usecols=lambda column: column in columns,
+                             dtype={"location": str, "time_period": str})
+        for chunk in chunks:
+            location_codes.append(_global_codes(chunk["location"], location_ids))
+            period_codes.append(_global_codes(chunk["time_period"].astype(str), period_ids))
+            for name in field_names:
+                if name in chunk.columns:
+                    field_values[name].append(chunk[name].to_numpy())
+
+        n_rows = sum(len(codes) for codes in location_codes)
+        location_codes = np.concatenate(location_codes) if location_codes else np.zeros(0, dtype=int)
+        period_codes = np.concatenate(period_codes) if period_codes else np.zeros(0, dtype=int)
+        field_values = {name: np.concatenate(values) for name, values in field_values.items() if values}
+        locations = np.array(list(location_ids), dtype=object)
+        period_strings = clean_timestrings(pd.Series(list(period_ids), dtype=object)).to_numpy(dtype=object)
+
+        # _from_codes expects sorted locations, code -1 (missing) is kept as -1
+        order = np.argsort(locations, kind="stable")
+        rank = np.empty(len(order) + 1, dtype=int)
+        rank[order] = np.arange(len(order))
+        rank[-1] = -1
+        location_codes = rank[location_codes]
+        locations = locations[order]
+        if n_rows and len(field_values) == len(field_names):
+            dataset = cls._from_codes(dataclass, location_codes, locations, period_codes, period_strings, field_values)
+            if dataset is not None:
+                return dataset
+        df = pd.DataFrame({"location": np.append(locations, np.nan)[location_codes],
+                           "time_period": np.append(period_strings, np.nan)[period_codes],
+                           **field_values})
+        return cls.from_pandas(df, dataclass)
 
     def join_on_time(self, other: "DataSet[FeaturesT]") -> "DataSet[Tuple[FeaturesT, FeaturesT]]":
         """Join two SpatioTemporalDicts on time. Returns a new SpatioTemporalDict.
@@ -409,4 +709,233 @@ class DataSet(Generic[FeaturesT]):
             plt.show()
 
     def resample(self, freq):
-        return self.__class__({loc: data.resample(freq) for loc, data in self.items()}, self._polygons)
\ No newline at end of file
+        return self.__class__({loc: data.resample(freq) for loc, data in self.items()}, self._polygons)
+
+class DenseDataSet(DataSet[FeaturesT]):
+    """
+    DataSet where all locations share one period range. Each field is stored as a single array
+    of shape (n_locations, n_periods, ...), so that time slicing is a view and field operations
+    run once across all locations. Per-location access returns the usual dataclass objects,
+    backed by views into the stacked arrays.
+    """
+
+    def __init__(self, data_dict: dict[str, FeaturesT], polygons=None):
+        data_dict = self._fill_missing(dict(data_dict))
+        first = next(iter(data_dict.values()))
+        field_names = [field.name for field in dataclasses.fields(first) if field.name != "time_period"]
+        self._init_arrays(
+            first.__class__,
+            first.time_period,
+            list(data_dict.keys()),
+            {name: np.stack([getattr(data, name) for data in data_dict.values()]) for name in field_names},
+            polygons,
+        )
+
+    def _init_arrays(self, dataclass, period_range, locations, fields, polygons):
+        self._dataclass = dataclass
+        self._period_range = period_range
+        self._locations = list(locations)
+        self._location_index = {location: i for i, location in enumerate(self._locations)}
+        self._fields = fields
+        self._polygons = polygons
+        for name, array in fields.items():
+            assert array.shape[:2] == (len(self._locations), len(period_range)), (name, array.shape)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        dataclass: Type[FeaturesT],
+        period_range: PeriodRange,
+        locations: Iterable[str],
+        fields: dict[str, np.ndarray],
+        polygons=None,
+    ) -> "DenseDataSet[FeaturesT]":
+        """Create a DenseDataSet directly from (n_locations, n_periods, ...) arrays for each field"""
+        dataset = cls.__new__(cls)
+        dataset._init_arrays(dataclass, period_range, locations, fields, polygons)
+        return dataset
+
+    @classmethod
+    def _from_field_arrays(cls, dataclass, period_range: PeriodRange, locations: list, fields: dict[str, np.ndarray]):
+        return cls.from_arrays(dataclass, period_range, locations, fields)
+
+    @classmethod
+    def from_dataset(cls, dataset: DataSet[FeaturesT]) -> "DenseDataSet[FeaturesT]":
+        if isinstance(dataset, DenseDataSet):
+            return dataset
+        return cls(dict(dataset.items()), dataset.polygons)
+
+    def to_dataset(self) -> DataSet[FeaturesT]:
+        return DataSet(dict(self.items()), self._polygons)
+
+    @property
+    def fields(self) -> dict[str, np.ndarray]:
+        return self._fields
+
+    @property
+    def _data_dict(self) -> dict[str, FeaturesT]:
+        return {location: self[location] for location in self._locations}
+
+    def _with_fields(self, fields, dataclass=None, period_range=None, locations=None):
+        return self.from_arrays(
+            dataclass or self._dataclass,
+            self._period_range if period_range is None else period_range,
+            self._locations if locations is None else locations,
+            fields,
+            self._polygons,
+        )
+
+    def __getitem__(self, location: str) -> FeaturesT:
+        i = self._location_index[location]
+        return self._dataclass(self._period_range, **{name: array[i] for name, array in self._fields.items()})
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._dataclass.__name__}, {self._period_range}, {len(self._locations)} locations)"
+
+    def keys(self) -> Iterable[str]:
+        return self._location_index.keys()
+
+    def locations(self) -> Iterable[Location]:
+        return self._location_index.keys()
+
+    def items(self) -> Iterable[Tuple[str, FeaturesT]]:
+        return ((location, self[location]) for location in self._locations)
+
+    def values(self) -> Iterable[FeaturesT]:
+        return (self[location] for location in self._locations)
+
+    def data(self) -> Iterable[FeaturesT]:
+        return [self[location] for location in self._locations]
+
+    @property
+    def period_range(self) -> PeriodRange:
+        return self._period_range
+
+    @property
+    def start_timestamp(self) -> pd.Timestamp:
+        return self._period_range.start_timestamp
+
+    @property
+    def end_timestamp(self) -> pd.Timestamp:
+        return self._period_range.end_timestamp
+
+    def get_locations(self, location: Iterable[Location]) -> "DenseDataSet[FeaturesT]":
+        locations = list(location)
+        idx = [self._location_index[loc] for loc in locations]
+        return self._with_fields({name: array[idx] for name, array in self._fields.items()}, locations=locations)
+
+    def filter_locations(self, locations: Iterable[str]) -> "DenseDataSet[FeaturesT]":
+        locations = set(locations)
+        dataset = self.get_locations([loc for loc in self._locations if loc in locations])
+        dataset._polygons = None
+        return dataset
+
+    def restrict_time_period(self, period_range: TemporalIndexType) -> "DenseDataSet[FeaturesT]":
+        assert period_range.step is None
+        start, stop = (None, None)
+        if period_range.start is not None:
+            start = self._period_range.searchsorted(period_range.start)
+        if period_range.stop is not None:
+            stop = self._period_range.searchsorted(period_range.stop, side="right")
+        return self._with_fields(
+            {name: array[:, start:stop] for name, array in self._fields.items()},
+            period_range=self._period_range[start:stop],
+        )
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Join the pandas frame for all locations with locations as column"""
+        if self._dataclass.topandas is not TimeSeriesData.topandas or any(
+            array.ndim > 2 for array in self._fields.values()
+        ):
+            return super().to_pandas()
+        n_locations, n_periods = len(self._locations), len(self._period_range)
+        time_period = self._period_range.topandas()
+        df = pd.DataFrame(
+            {"time_period": np.tile(time_period.to_numpy(), n_locations)}
+            | {name: array.reshape(-1) for name, array in self._fields.items()},
+            index=np.tile(np.arange(n_periods), n_locations),
+        )
+        df["time_period"] = df["time_period"].astype(time_period.dtype)
+        df["location"] = np.repeat(np.array(self._locations, dtype=object), n_periods)
+        return df
+
+    def interpolate(self, field_names=None):
+        fields = {
+            name: _interpolate_rows(array) if field_names is None or name in field_names else array
+            for name, array in self._fields.items()
+        }
+        return self._with_fields(fields)
+
+    def remove_field(self, field_name, new_class=None):
+        if new_class is None:
+            new_class = remove_field(self[self._locations[0]], field_name).__class__
+        return self._with_fields(
+            {name: array for name, array in self._fields.items() if name != field_name}, dataclass=new_class
+        )
+
+    def join_on_time(self, other: "DataSet[FeaturesT]") -> "DataSet[FeaturesT]":
+        if not isinstance(other, DenseDataSet) or other._locations != self._locations:
+            return super().join_on_time(other)
+        return self._with_fields(
+            {name: np.concatenate([array, other._fields[name]], axis=1) for name, array in self._fields.items()},
+            period_range=self._period_range.concatenate(other._period_range),
+        )
+
+    def merge(self, other_dataset: "DataSet", result_dataclass: type[TimeSeriesData]) -> "DataSet":
+        if not isinstance(other_dataset, DenseDataSet):
+            return super().merge(other_dataset, result_dataclass)
+        if self.polygons is not None and other_dataset.polygons is not None:
+            raise Exception("Trying to merge two datasets with polygons, not sure how to do this (not implemented yet)")
+        other_locations = set(other_dataset.locations())
+        assert all(location in other_locations for location in self.locations()), (self.locations(), other_locations)
+        if len(self._period_range) != len(other_dataset.period_range) or np.any(
+            self._period_range != other_dataset.period_range
+        ):
+            raise ValueError(f"{self._period_range} != {other_dataset.period_range}")
+        other_idx = [other_dataset._location_index[location] for location in self._locations]
+        fields = {}
+        for field in dataclasses.fields(result_dataclass):
+            name = field.name
+            if name == "time_period":
+                continue
+            if name in self._fields:
+                assert name not in other_dataset._fields, f"Field {name} in both data"
+                fields[name] = self._fields[name]
+            elif name in other_dataset._fields:
+                fields[name] = other_dataset._fields[name][other_idx]
+            else:
+                raise ValueError(f"Field {name} not in either data")
+        new_dataset = self._with_fields(fields, dataclass=result_dataclass)
+        new_dataset._polygons = self.polygons if self.polygons is not None else other_dataset.polygons
+        return new_dataset
+
+
+def _interpolate_rows(array: np.ndarray) -> np.ndarray:
+    """
+    Linearly interpolate nans along the time axis (axis 1) for all locations at once. Fields with more
+    dimensions, like samples, are interpolated separately for each entry along the trailing axes.
+    """
+    if array.ndim > 2:
+        rows = np.moveaxis(array, 1, -1)
+        interpolated = _interpolate_rows(rows.reshape(-1, array.shape[1]))
+        return np.moveaxis(interpolated.reshape(rows.shape), -1, 1)
+    array = array.astype(float)
+    nans = np.isnan(array)
+    if not nans.any():
+        return array
+    n_periods = array.shape[1]
+    idx = np.where(~nans, np.arange(n_periods), -1)
+    previous = np.maximum.accumulate(idx, axis=1)
+    idx = np.where(~nans, np.arange(n_periods), n_periods)
+    following = np.minimum.accumulate(idx[:, ::-1], axis=1)[:, ::-1]
+    has_previous, has_following = previous >= 0, following < n_periods
+    rows = np.arange(array.shape[0])[:, None]
+    previous_value = array[rows, np.maximum(previous, 0)]
+    following_value = array[rows, np.minimum(following, n_periods - 1)]
+    weight = (np.arange(n_periods) - previous) / np.maximum(following - previous, 1)
+    interpolated = np.where(
+        has_previous & has_following,
+        previous_value + weight * (following_value - previous_value),
+        np.where(has_previous, previous_value, following_value),
+    )
+    return np.where(nans, interpolated, array)
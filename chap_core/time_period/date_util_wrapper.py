@@ -1,5 +1,7 @@
 import logging
 import functools
+import operator
+import re
 from datetime import datetime
 from numbers import Number
 from typing import Union, Iterable, Tuple
@@ -325,6 +327,12 @@ def clean_timestring(timestring: str):
     return timestring
 
 
+def clean_timestrings(timestrings: pd.Series) -> pd.Series:
+    """Vectorized version of clean_timestring for a whole column of time strings"""
+    timestrings = timestrings.astype(str)
+    return timestrings.str.replace(r"W(\d)$", r"W0\1", regex=True)
+
+
 class Month(TimePeriod):
     _used_attributes = ["year", "month"]
     _extension = relativedelta(months=1)
@@ -427,7 +435,60 @@ class TimeDelta(DateUtilWrapper):
             return (end_stamp - start_stamp) // self
 
 
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def _ordinal_unit(time_delta: TimeDelta) -> Tuple[str, int]:
+    """Get the base unit ('D', 'M' or 'Y') and the number of units per step for a time delta.
+    Weeks are represented as steps of seven days"""
+    delta = time_delta._relative_delta
+    n_months = delta.months + 12 * delta.years
+    if delta.days and not n_months:
+        return "D", delta.days
+    if n_months and not delta.days:
+        if n_months % 12 == 0:
+            return "Y", n_months // 12
+        return "M", n_months
+    raise ValueError(f"Cannot represent time delta {time_delta} as integer ordinals")
+
+
+def _ordinal_time_delta(unit: str, step: int) -> TimeDelta:
+    """Inverse of _ordinal_unit"""
+    return TimeDelta(relativedelta(**{{"D": "days", "M": "months", "Y": "years"}[unit]: int(step)}))
+
+
+def _date_to_ordinal(date: datetime, unit: str) -> int:
+    """Number of units between 1970-01-01 and date"""
+    if unit == "Y":
+        return date.year - 1970
+    if unit == "M":
+        return (date.year - 1970) * 12 + date.month - 1
+    return date.toordinal() - _EPOCH_ORDINAL
+
+
+def _ordinal_to_date(ordinal: int, unit: str) -> datetime:
+    ordinal = int(ordinal)
+    if unit == "Y":
+        return datetime(1970 + ordinal, 1, 1)
+    if unit == "M":
+        year, month = divmod(ordinal, 12)
+        return datetime(1970 + year, month + 1, 1)
+    return datetime.fromordinal(ordinal + _EPOCH_ORDINAL)
+
+
+_period_classes = {("D", 1): Day, ("D", 7): Week, ("M", 1): Month, ("Y", 1): Year}
+_pandas_freqs = {("D", 1): "D", ("D", 7): "W", ("M", 1): "M", ("Y", 1): "Y"}
+
+
 class PeriodRange(BNPDataClass):
+    """
+    A consecutive range of time periods.
+
+    Internally the range is represented by integer ordinals for its start and (exclusive) end,
+    counted in days, months or years since 1970-01-01, together with the number of units per period.
+    This makes length, indexing, slicing, searchsorted and comparisons constant time or numpy operations.
+    """
+
     def __init__(
             self,
             start_timestamp: TimeStamp,
@@ -437,18 +498,38 @@ class PeriodRange(BNPDataClass):
         self._start_timestamp = start_timestamp
         self._end_timestamp = end_timestamp
         self._time_delta = time_delta
+        self._unit, self._step = _ordinal_unit(time_delta)
+        self._start_ordinal = _date_to_ordinal(start_timestamp._date, self._unit)
+        self._end_ordinal = _date_to_ordinal(end_timestamp._date, self._unit)
+
+    @classmethod
+    def _from_ordinals(cls, start_ordinal: int, end_ordinal: int, time_delta: TimeDelta) -> "PeriodRange":
+        unit, _ = _ordinal_unit(time_delta)
+        return cls(
+            TimeStamp(_ordinal_to_date(start_ordinal, unit)),
+            TimeStamp(_ordinal_to_date(end_ordinal, unit)),
+            time_delta,
+        )
+
+    @property
+    def ordinals(self) -> np.ndarray:
+        """The integer ordinal (in days, months or years since 1970-01-01) of the start of each period"""
+        return self._start_ordinal + np.arange(len(self)) * self._step
+
+    def _start_dates(self) -> np.ndarray:
+        return (np.datetime64("1970", self._unit) + self.ordinals).astype("datetime64[D]")
 
     @property
     def month(self):
-        return np.array([p.start_timestamp.month for p in self])
+        return self._start_dates().astype("datetime64[M]").astype(int) % 12 + 1
 
     @property
     def year(self):
-        return np.array([p.start_timestamp.year for p in self])
+        return self._start_dates().astype("datetime64[Y]").astype(int) + 1970
 
     @property
     def week(self):
-        return np.array([p.start_timestamp.week for p in self])
+        return pd.DatetimeIndex(self._start_dates()).isocalendar().week.to_numpy().astype(int)
 
     @property
     def delta(self):
@@ -468,12 +549,7 @@ class PeriodRange(BNPDataClass):
         return cls(start_timestamp, end_timestamp, time_delta)
 
     def __len__(self):
-        if self._time_delta._relative_delta.days != 0:
-            assert self._time_delta._relative_delta.months == 0 and self._time_delta._relative_delta.years == 0
-            days = (self._end_timestamp._date - self._start_timestamp._date).days
-            return days // self._time_delta._relative_delta.days
-        delta = relativedelta(self._end_timestamp._date, self._start_timestamp._date)
-        return TimeDelta(delta) // self._time_delta
+        return max((self._end_ordinal - self._start_ordinal) // self._step, 0)
 
     def __eq__(self, other: TimePeriod) -> np.ndarray[bool]:
         """Check each period in the range for equality to the given period"""
@@ -482,9 +558,29 @@ class PeriodRange(BNPDataClass):
     def _vectorize(self, funcname: str, other: TimePeriod):
         if isinstance(other, PeriodRange):
             assert len(self) == len(other), (len(self), len(other), self, other)
+            if (self._unit, self._step) == (other._unit, other._step):
+                return self._compare_ordinals(funcname, other.ordinals)
             return np.array([getattr(period, funcname)(other_period) for period, other_period in zip(self, other)])
+        if isinstance(other, TimePeriod) and other._extension is not None and other.time_delta == self._time_delta:
+            return self._compare_ordinals(funcname, _date_to_ordinal(other._date, self._unit))
         return np.array([getattr(period, funcname)(other) for period in self])
 
+    def _compare_ordinals(self, funcname: str, other_starts) -> np.ndarray:
+        """
+        TimePeriod comparison of the periods with periods of the same length starting at other_starts. Like
+        TimePeriod, ordering uses both start and end, so that weeks starting on different weekdays compare the same
+        """
+        starts = self.ordinals
+        if funcname == "__lt__":
+            return starts + self._step <= other_starts
+        if funcname == "__le__":
+            return starts < other_starts + self._step
+        if funcname == "__gt__":
+            return starts >= other_starts + self._step
+        if funcname == "__ge__":
+            return starts + self._step > other_starts
+        return getattr(operator, funcname)(starts, other_starts)
+
     def __ne__(self, other: TimePeriod) -> np.ndarray[bool]:
         """Check each period in the range for inequality to the given period"""
         return self._vectorize("__ne__", other)
@@ -496,52 +592,42 @@ class PeriodRange(BNPDataClass):
 
     @property
     def _period_class(self):
-        if self._time_delta == delta_month:
-            return Month
-        elif self._time_delta == delta_year:
-            return Year
-        elif self._time_delta == delta_day:
-            return Day
-        elif self._time_delta == delta_week:
-            return Week
-        raise ValueError(f"Unknown time delta {self._time_delta}")
+        if (self._unit, self._step) not in _period_classes:
+            raise ValueError(f"Unknown time delta {self._time_delta}")
+        return _period_classes[(self._unit, self._step)]
+
+    def _period_at(self, ordinal: int) -> TimePeriod:
+        return self._period_class(_ordinal_to_date(ordinal, self._unit))
 
     def __iter__(self):
-        return (self._period_class((self._start_timestamp + self._time_delta * i)._date) for i in range(len(self)))
+        return (self._period_at(self._start_ordinal + i * self._step) for i in range(len(self)))
 
     def __getitem__(self, item: slice | int):
         """Slice by numeric index in the period range"""
         if isinstance(item, Number):
             if item < 0:
                 item += len(self)
-            return self._period_class((self._start_timestamp + self._time_delta * item)._date)
+            return self._period_at(self._start_ordinal + item * self._step)
         assert item.step is None
-        start = self._start_timestamp
-        end = self._end_timestamp
+        n = len(self)
+        start, stop = 0, n
         if item.stop is not None:
-            if item.stop < 0:
-                end -= self._time_delta * abs(item.stop)
-            else:
-                end = start + self._time_delta * item.stop  # Not sure about the logic here, test more
-
+            stop = n + item.stop if item.stop < 0 else item.stop
         if item.start is not None:
-            offset = item.start if item.start >= 0 else len(self) + item.start
-            start = start + self._time_delta * offset
-        if start > end:
+            start = item.start if item.start >= 0 else n + item.start
+        if start > stop:
             raise ValueError(f"Invalid slice {item} for period range {self} of length {len(self)}")
-        return PeriodRange(start, end, self._time_delta)
+        return self._from_ordinals(
+            self._start_ordinal + start * self._step,
+            self._start_ordinal + stop * self._step,
+            self._time_delta,
+        )
 
     def topandas(self):
-        if self._time_delta == delta_month:
-            return pd.Series([pd.Period(year=p.year, month=p.month, freq="M") for p in self])
-        elif self._time_delta == delta_year:
-            return pd.Series([pd.Period(year=p.year, freq="Y") for p in self])
-        elif self._time_delta == delta_day:
-            return pd.Series([pd.Period(year=p.year, month=p.month, day=p.day, freq="D") for p in self])
-        elif self._time_delta == delta_week:
-            return pd.Series([p.topandas() for p in self])
-        else:
+        if (self._unit, self._step) not in _pandas_freqs:
             raise ValueError(f"Cannot convert period range with time delta {self._time_delta} to pandas")
+        freq = _pandas_freqs[(self._unit, self._step)]
+        return pd.Series(pd.DatetimeIndex(self._start_dates()).to_period(freq))
 
     def to_period_index(self):
         return pd.period_range(
@@ -594,6 +680,10 @@ class PeriodRange(BNPDataClass):
 
     @classmethod
     def from_strings(cls, period_strings: Iterable[str], fill_missing=False):
+        period_strings = list(period_strings)
+        parsed = parse_period_strings(period_strings)
+        if parsed is not None:
+            return cls._from_ordinal_array(*parsed, fill_missing=fill_missing)
         periods = []
         for period_string in period_strings:
             try:
@@ -606,9 +696,34 @@ class PeriodRange(BNPDataClass):
 
     @classmethod
     def from_ids(cls, ids: Iterable[str], fill_missing=False):
+        ids = list(ids)
+        parsed = parse_period_strings(ids)
+        if parsed is not None:
+            return cls._from_ordinal_array(*parsed, fill_missing=fill_missing)
         periods = [TimePeriod.from_id(id) for id in ids]
         return cls.from_period_list(fill_missing, periods)
 
+    @classmethod
+    def _from_ordinal_array(cls, ordinals: np.ndarray, time_delta: TimeDelta, fill_missing=False):
+        """Create a period range from the sorted start ordinals of its periods.
+        If fill_missing is True, also return the indices in the range that are not in ordinals"""
+        _, step = _ordinal_unit(time_delta)
+        ret = cls._from_ordinals(ordinals[0], ordinals[-1] + step, time_delta)
+        steps = np.diff(ordinals)
+        if np.all(steps == step):
+            missing = np.array([], dtype=int)
+        elif fill_missing and np.all((steps > 0) & (steps % step == 0)):
+            mask = np.full(len(ret), True)
+            mask[(ordinals - ordinals[0]) // step] = False
+            missing = np.flatnonzero(mask)
+        else:
+            wrong = np.flatnonzero(steps != step)
+            logger.error(f"Periods are not consecutive at indices {wrong[:10]} with time delta {time_delta}")
+            raise ValueError("Periods must be consecutive.")
+        if fill_missing:
+            return ret, missing
+        return ret
+
     @classmethod
     def from_start_and_n_periods(cls, start_period: pd.Period, n_periods: int):
         if not isinstance(start_period, TimePeriod):
@@ -646,8 +761,7 @@ class PeriodRange(BNPDataClass):
         if side not in ("left", "right"):
             raise ValueError(f"Invalid side {side}")
         assert period.time_delta == self._time_delta, (period, self._time_delta)
-        n_steps = self._time_delta.n_periods(self._start_timestamp, period.start_timestamp)
-        # n_steps = TimeDelta(relativedelta(period._date, self._start_timestamp._date)) // self._time_delta
+        n_steps = (_date_to_ordinal(period._date, self._unit) - self._start_ordinal) // self._step
         if side == "right":
             n_steps += 1
         n_steps = min(max(0, n_steps), len(self))  # if period is outside
@@ -693,3 +807,81 @@ def convert_time_period_string(row):
     if len(row) == 6 and "W" not in row:
         return f"{row[:4]}-{row[4:]}"
     return row
+
+
+_period_formats = [
+    (re.compile(r"(?P<year>\d{4})"), delta_year),
+    (re.compile(r"(?P<year>\d{4})-?(?P<month>\d{1,2})"), delta_month),
+    (re.compile(r"(?P<year>\d{4})-?(?P<month>\d{2})-?(?P<day>\d{2})"), delta_day),
+    (re.compile(r"(?P<year>\d{4})W(?P<week>\d{1,2})"), delta_week),
+    (re.compile(r"(?P<year>\d{4})SunW(?P<week>\d{1,2})"), delta_week),
+    (
+        re.compile(
+            r"(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})/(?P<end_year>\d{4})-(?P<end_month>\d{2})-(?P<end_day>\d{2})"
+        ),
+        delta_week,
+    ),
+]
+
+
+def _iso_week_one_monday(years: np.ndarray) -> np.ndarray:
+    """Day ordinal of the monday of the first ISO week of each year"""
+    jan_fourth = (years - 1970).astype("datetime64[Y]").astype("datetime64[D]").astype(int) + 3
+    return jan_fourth - (jan_fourth + 3) % 7
+
+
+def parse_period_strings(period_strings: Iterable[str]) -> Tuple[np.ndarray, TimeDelta] | None:
+    """
+    Parse period strings in one of the known formats (YYYY, YYYYMM, YYYY-MM, YYYYMMDD, YYYY-MM-DD,
+    YYYYWnn, YYYYSunWnn, YYYY-MM-DD/YYYY-MM-DD) into integer ordinals (see PeriodRange.ordinals)
+    in one vectorized pass. All strings need to have the same format. Returns None if the strings are not in a
+    known format or contain invalid dates, so that the caller can fall back to TimePeriod.parse.
+    """
+    period_strings = pd.Series(period_strings, dtype=object).astype(str)
+    if not len(period_strings):
+        return None
+    first = period_strings.iloc[0]
+    matching = [(pattern, delta) for pattern, delta in _period_formats if pattern.fullmatch(first)]
+    if not matching:
+        return None
+    pattern, time_delta = matching[0]
+    fields = period_strings.str.extract(f"^(?:{pattern.pattern})$")
+    if fields.isna().any(axis=None):
+        return None
+    fields = fields.astype(int)
+    year = fields["year"].to_numpy()
+    if time_delta == delta_year:
+        return year - 1970, time_delta
+    if "week" in fields:
+        week = fields["week"].to_numpy()
+        first_monday = _iso_week_one_monday(year)
+        n_weeks = (_iso_week_one_monday(year + 1) - first_monday) // 7
+        if np.any((week < 1) | (week > n_weeks)):
+            return None
+        ordinals = first_monday + (week - 1) * 7
+        if "SunW" in pattern.pattern:
+            ordinals = ordinals + 6
+        return ordinals, time_delta
+    ordinals = _day_ordinals(year, fields["month"].to_numpy(), fields["day"].to_numpy() if "day" in fields else None)
+    if ordinals is None:
+        return None
+    if "end_day" in fields:
+        end_ordinals = _day_ordinals(*(fields[name].to_numpy() for name in ("end_year", "end_month", "end_day")))
+        if end_ordinals is None or np.any(end_ordinals - ordinals != 6):
+            return None
+    return ordinals, time_delta
+
+
+def _day_ordinals(year: np.ndarray, month: np.ndarray, day: np.ndarray | None) -> np.ndarray | None:
+    """Month ordinals if day is None, else day ordinals. None if any of the dates are invalid"""
+    if np.any((month < 1) | (month > 12)):
+        return None
+    month_ordinals = (year - 1970) * 12 + month - 1
+    if day is None:
+        return month_ordinals
+    month_starts = month_ordinals.astype("datetime64[M]").astype("datetime64[D]").astype(int)
+    next_month_starts = (month_ordinals + 1).astype("datetime64[M]").astype("datetime64[D]").astype(int)
+    ordinals = month_starts + day - 1
+    if np.any((day < 1) | (ordinals >= next_month_starts)):
+        return None
+    return ordinals
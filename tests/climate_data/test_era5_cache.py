@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from diskcache import Cache
+
+from chap_core.datatypes import SimpleClimateData
+from chap_core.google_earth_engine.era5_cache import CachedEra5Client
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.time_period import PeriodRange, Month
+
+
+class CountingGEE:
+    def __init__(self):
+        self.requests = []
+
+    def get_historical_era5(self, features, periodes):
+        locations = [f["id"] for f in features["features"]]
+        self.requests.append((locations, [p.id for p in periodes]))
+        return DataSet({location: SimpleClimateData(periodes,
+                                                    np.array([float(p.month) for p in periodes]),
+                                                    np.array([float(p.year) for p in periodes]) + i)
+                        for i, location in enumerate(locations)})
+
+
+def _features(*locations):
+    return {"type": "FeatureCollection",
+            "features": [{"type": "Feature", "id": location, "properties": {},
+                          "geometry": {"type": "Point", "coordinates": [i, 0]}}
+                         for i, location in enumerate(locations)]}
+
+
+@pytest.fixture
+def cached_client(tmp_path):
+    client = CountingGEE()
+    with Cache(tmp_path) as cache:
+        yield client, CachedEra5Client(client, cache)
+
+
+def test_cached_era5_fetches_only_missing_cells(cached_client):
+    client, cached = cached_client
+    first_range = PeriodRange.from_time_periods(Month(2020, 1), Month(2020, 12))
+    first = cached.get_historical_era5(_features("a", "b"), first_range)
+    assert len(client.requests) == 1
+
+    extended_range = PeriodRange.from_time_periods(Month(2020, 6), Month(2021, 3))
+    extended = cached.get_historical_era5(_features("a", "b"), extended_range)
+    assert client.requests[1] == (["a", "b"], ["202101", "202102", "202103"])
+    np.testing.assert_array_equal(extended["a"].rainfall[:7], first["a"].rainfall[5:])
+    np.testing.assert_array_equal(extended["b"].mean_temperature[-3:], [2022.0] * 3)
+
+    cached.get_historical_era5(_features("a", "b"), first_range)
+    assert len(client.requests) == 2
+
+
+def test_cached_era5_refetches_changed_geometry(cached_client):
+    client, cached = cached_client
+    period_range = PeriodRange.from_time_periods(Month(2020, 1), Month(2020, 3))
+    cached.get_historical_era5(_features("a", "b"), period_range)
+    cached.get_historical_era5(_features("b", "a"), period_range)
+    assert [locations for locations, _ in client.requests] == [["a", "b"], ["b", "a"]]
@@ -420,3 +420,75 @@ def test_gee_api_simple(gee_credentials, polygon_json):
         band_names=["temperature_2m", "total_precipitation_sum"],
     )
     print(data)
+
+
+class FakeInfo:
+    def __init__(self, get_info):
+        self.getInfo = get_info
+
+
+class FakeFeatureCollection:
+    """Stands in for an ee.FeatureCollection, failing the first request for each page"""
+
+    def __init__(self, features, fail_first=True):
+        self.features = features
+        self.requested_pages = []
+        self._failed = set()
+        self._fail_first = fail_first
+
+    def size(self):
+        return FakeInfo(lambda: len(self.features))
+
+    def toList(self, count, offset):
+        def get_info():
+            if self._fail_first and offset not in self._failed:
+                self._failed.add(offset)
+                raise ConnectionError("Temporary failure")
+            self.requested_pages.append(offset)
+            return self.features[offset:offset + count]
+
+        return FakeInfo(get_info)
+
+
+def test_feature_collections_to_list_concurrent_with_retries():
+    helper = Era5LandGoogleEarthEngineHelperFunctions(max_workers=4, retry_backoff=0, page_size=7)
+    collections = [FakeFeatureCollection(list(range(start, start + 30))) for start in (0, 100)]
+    result = helper.feature_collections_to_list(collections)
+    assert result == list(range(30)) + list(range(100, 130))
+    assert sorted(collections[0].requested_pages) == [0, 7, 14, 21, 28]
+
+
+def test_feature_collection_to_list_gives_up():
+    def fail():
+        raise ConnectionError("Down")
+
+    class AlwaysFailing(FakeFeatureCollection):
+        def size(self):
+            return FakeInfo(fail)
+
+    helper = Era5LandGoogleEarthEngineHelperFunctions(max_retries=2, retry_backoff=0)
+    with pytest.raises(GEEError):
+        helper.feature_collection_to_list(AlwaysFailing([]))
+
+
+def test_get_historical_era5_splits_requests(monkeypatch):
+    monkeypatch.setattr(Era5LandGoogleEarthEngine, "_initialize_client", lambda self: None)
+    requests = []
+
+    def reduced_feature_collection(self, features, periodes):
+        requests.append((len(features["features"]), len(periodes)))
+        return FakeFeatureCollection(
+            [{"properties": {"ou": feature["id"], "period": period.id, "indicator": indicator, "value": 1.0}}
+             for feature in features["features"] for period in periodes
+             for indicator in ("rainfall", "mean_temperature")], fail_first=False)
+
+    monkeypatch.setattr(Era5LandGoogleEarthEngine, "_get_reduced_feature_collection", reduced_feature_collection)
+    gee = Era5LandGoogleEarthEngine(max_periods_per_request=5, max_features_per_request=2)
+    features = {"type": "FeatureCollection",
+                "features": [{"type": "Feature", "id": location, "properties": {}, "geometry": None}
+                             for location in ("a", "b", "c")]}
+    period_range = PeriodRange.from_time_periods(Month(2020, 1), Month(2020, 12))
+    dataset = gee.get_historical_era5(features, period_range)
+    assert sorted(requests) == sorted([(2, 5), (2, 5), (2, 2), (1, 5), (1, 5), (1, 2)])
+    assert set(dataset.keys()) == {"a", "b", "c"}
+    assert len(dataset.period_range) == 12
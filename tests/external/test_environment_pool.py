@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+from chap_core.external.environment_pool import EnvironmentPool
+from chap_core.external.mlflow_wrappers import CommandLineTrainPredictRunner, get_train_predict_runner
+
+
+def _make_project(path: Path, requirements="") -> Path:
+    path.mkdir()
+    (path / "python_env.yaml").write_text("build_dependencies: []\ndependencies: []\n" + requirements)
+    (path / "train.py").write_text("import sys\nopen(sys.argv[1], 'w').write(sys.prefix)\n")
+    (path / "MLproject").write_text(
+        "name: pooled\n"
+        "python_env: python_env.yaml\n"
+        "entry_points:\n"
+        "  train:\n"
+        "    command: python train.py {model}\n"
+        "  predict:\n"
+        "    command: echo {out_file}\n"
+    )
+    return path
+
+
+def test_environment_pool_shares_environments(tmp_path):
+    pool = EnvironmentPool(tmp_path / "pool")
+    env_dir = pool.get_environment(_make_project(tmp_path / "a"))
+    assert (env_dir / "bin" / "python").exists()
+    assert pool.get_environment(_make_project(tmp_path / "b")) == env_dir
+    assert [environment["hash"] for environment in pool.list_environments()] == [env_dir.name]
+
+
+def test_mlflow_model_runs_in_pooled_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHAP_ENVIRONMENT_POOL", "1")
+    monkeypatch.setenv("CHAP_ENVIRONMENT_POOL_DIR", str(tmp_path / "pool"))
+    project = _make_project(tmp_path / "model")
+    runner = get_train_predict_runner(project / "MLproject", "mlflow")
+    assert isinstance(runner, CommandLineTrainPredictRunner)
+    runner.train("train.csv", "model")
+    prefix = (project / "model").read_text()
+    assert prefix != sys.prefix
+    assert Path(prefix).parent == tmp_path / "pool"
+
+
+def test_environment_pool_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.delenv("CHAP_ENVIRONMENT_POOL", raising=False)
+    project = _make_project(tmp_path / "model")
+    assert not isinstance(get_train_predict_runner(project / "MLproject", "mlflow"), CommandLineTrainPredictRunner)
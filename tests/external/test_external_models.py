@@ -1,10 +1,17 @@
+import os
+import sys
+
+import numpy as np
+
+from chap_core.assessment.dataset_splitting import train_test_generator
 from chap_core.assessment.prediction_evaluator import evaluate_model
 from chap_core.exceptions import InvalidModelException, ModelFailedException
 from chap_core.file_io.example_data_set import datasets
 import pytest
 from chap_core.geometry import Polygons
 from chap_core.testing.external_model import sanity_check_external_model
-from chap_core.external.external_model import get_model_from_directory_or_github_url
+from chap_core.external.external_model import get_model_from_directory_or_github_url, get_model_from_mlproject_file
+from chap_core.external.run_directory import DataFileStore
 from chap_core.util import docker_available, pyenv_available
 
 
@@ -65,3 +72,120 @@ def test_that_polygons_are_sent_to_runners_through_external_model(data_path, dat
     polygons = Polygons.from_file(data_path / "example_polygons.geojson").data
     #dataset.set_polygons(polygons)
     
+
+
+binary_model_script = """
+import sys
+import pandas as pd
+
+read = {"parquet": pd.read_parquet, "arrow": pd.read_feather}[sys.argv[1]]
+command, files = sys.argv[2], sys.argv[3:]
+if command == "train":
+    open(files[1], "w").write(str(read(files[0]).disease_cases.mean()))
+else:
+    mean = float(open(files[0]).read())
+    future = read(files[2])
+    predictions = future[["location", "time_period"]].assign(**{f"sample_{i}": mean + i for i in range(100)})
+    getattr(predictions, {"parquet": "to_parquet", "arrow": "to_feather"}[sys.argv[1]])(files[3])
+"""
+
+
+@pytest.mark.parametrize("data_format", ["parquet", "arrow"])
+def test_external_model_binary_data_format(health_population_data, tmp_path, data_format):
+    (tmp_path / "model.py").write_text(binary_model_script)
+    (tmp_path / "MLproject").write_text(f"""
+name: binary_model
+data_format: {data_format}
+entry_points:
+  train:
+    command: "{sys.executable} model.py {data_format} train {{train_data}} {{model}}"
+  predict:
+    command: "{sys.executable} model.py {data_format} predict {{model}} {{historic_data}} {{future_data}} {{out_file}}"
+""")
+    model = get_model_from_mlproject_file(tmp_path / "MLproject", ignore_env=True)
+    train_data, test_sets = train_test_generator(health_population_data, 3, 1)
+    historic_data, future_data, _ = next(test_sets)
+    predictions = model.train(train_data).predict(historic_data, future_data)
+    assert (tmp_path / f"predictions.{data_format}").exists()
+    assert set(predictions.keys()) == set(future_data.keys())
+    assert np.all(predictions.period_range == future_data.period_range)
+    samples = predictions[next(iter(future_data.keys()))].samples
+    assert samples.shape == (3, 100)
+    np.testing.assert_allclose(np.diff(samples, axis=1), 1)
+
+
+def test_external_model_does_not_write_into_shared_data_files(health_population_data, tmp_path):
+    store = DataFileStore(tmp_path / ".data")
+    models = []
+    for name in ["run_a", "run_b"]:
+        run_dir = tmp_path / name
+        run_dir.mkdir()
+        (run_dir / "model.py").write_text(binary_model_script)
+        (run_dir / "MLproject").write_text(f"""
+name: binary_model
+data_format: parquet
+entry_points:
+  train:
+    command: "{sys.executable} model.py parquet train {{train_data}} {{model}}"
+  predict:
+    command: "{sys.executable} model.py parquet predict {{model}} {{historic_data}} {{future_data}} {{out_file}}"
+""")
+        models.append(get_model_from_mlproject_file(run_dir / "MLproject", ignore_env=True, data_store=store))
+    train_data, test_sets = train_test_generator(health_population_data, 3, 2)
+    test_sets = list(test_sets)
+    for model in models:
+        model.train(train_data).predict(*test_sets[0][:2])
+    shared = tmp_path / "run_a" / "future_data.parquet"
+    content = shared.read_bytes()
+    assert os.path.samefile(shared, tmp_path / "run_b" / "future_data.parquet")
+
+    models[1].predict(*test_sets[1][:2])
+    assert shared.read_bytes() == content
+
+
+server_model_script = """
+import json, os, sys
+import pandas as pd
+
+def predict(future_data, out_file):
+    future = pd.read_csv(future_data)
+    future[["location", "time_period"]].assign(sample_0=os.getpid()).to_csv(out_file, index=False)
+
+if sys.argv[1] == "serve":
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request["command"] == "train":
+            open(request["model"], "w").write("trained")
+        else:
+            predict(request["future_data"], request["out_file"])
+        print(json.dumps({"status": "ok"}), flush=True)
+elif sys.argv[1] == "train":
+    open(sys.argv[3], "w").write("trained")
+else:
+    predict(sys.argv[2], sys.argv[3])
+"""
+
+
+@pytest.mark.parametrize("serve_command", ["model.py serve", "model.py missing_command_that_exits"])
+def test_external_model_server(health_population_data, tmp_path, serve_command):
+    (tmp_path / "model.py").write_text(server_model_script)
+    (tmp_path / "MLproject").write_text(f"""
+name: server_model
+entry_points:
+  serve:
+    command: "{sys.executable} {serve_command}"
+  train:
+    command: "{sys.executable} model.py train {{train_data}} {{model}}"
+  predict:
+    command: "{sys.executable} model.py predict {{future_data}} {{out_file}}"
+""")
+    model = get_model_from_mlproject_file(tmp_path / "MLproject", ignore_env=True)
+    train_data, test_sets = train_test_generator(health_population_data, 3, 2)
+    model.train(train_data)
+    pids = set()
+    for historic_data, future_data, _ in test_sets:
+        predictions = model.predict(historic_data, future_data)
+        pids.update(np.unique(predictions[next(iter(future_data.keys()))].samples))
+    model.close()
+    assert (tmp_path / "model").read_text() == "trained"
+    assert len(pids) == (1 if serve_command.endswith("serve") else 2)
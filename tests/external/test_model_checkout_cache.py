@@ -0,0 +1,41 @@
+import git
+
+from chap_core.external.model_checkout_cache import ModelCheckoutCache
+
+
+def _make_repo(path):
+    repo = git.Repo.init(path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    commits = []
+    for content in ["first", "second"]:
+        (path / "MLproject").write_text(content)
+        repo.index.add(["MLproject"])
+        commits.append(repo.index.commit(content).hexsha)
+    return commits
+
+
+def test_checkout_cache_clones_once(tmp_path, monkeypatch):
+    first, second = _make_repo(tmp_path / "repo")
+    clones = []
+    clone_from = git.Repo.clone_from
+    monkeypatch.setattr(git.Repo, "clone_from", lambda *args, **kwargs: clones.append(args) or clone_from(*args, **kwargs))
+    cache = ModelCheckoutCache(tmp_path / "cache", max_checkouts=1)
+    url = str(tmp_path / "repo")
+    for i in range(2):
+        run_dir = cache.copy_to(url, first, tmp_path / f"run_{i}")
+        assert (run_dir / "MLproject").read_text() == "first"
+        assert not (run_dir / ".git").exists()
+    assert len(clones) == 1
+
+    cache.copy_to(url, second, tmp_path / "run_second")
+    assert (tmp_path / "run_second" / "MLproject").read_text() == "second"
+    assert [path.name.split("_")[-1] for path in (tmp_path / "cache").iterdir()] == [second]
+
+
+def test_checkout_cache_hardlinks(tmp_path):
+    first, _ = _make_repo(tmp_path / "repo")
+    cache = ModelCheckoutCache(tmp_path / "cache", link_files=True)
+    run_dir = cache.copy_to(str(tmp_path / "repo"), first, tmp_path / "run")
+    assert (run_dir / "MLproject").stat().st_nlink == 2
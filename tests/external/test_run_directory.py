@@ -0,0 +1,89 @@
+import os
+import time
+
+from chap_core.external.run_directory import DataFileStore, RunDirectoryManager
+
+
+def _make_run(base_dir, model_name, run_name, age_hours, size=10):
+    run_dir = base_dir / model_name / run_name
+    run_dir.mkdir(parents=True)
+    (run_dir / "model").write_bytes(b"x" * size)
+    modified = time.time() - age_hours * 3600
+    os.utime(run_dir, (modified, modified))
+    return run_dir
+
+
+def test_runs_to_remove_by_count(tmp_path):
+    runs = [_make_run(tmp_path, "model", f"run_{i}", age_hours=10 - i) for i in range(5)]
+    recent = _make_run(tmp_path, "model", "recent", age_hours=0)
+    _make_run(tmp_path, "model", "latest", age_hours=20)
+    manager = RunDirectoryManager(tmp_path, max_runs_per_model=3)
+    assert manager.runs_to_remove() == runs[:3]
+    manager.collect_garbage()
+    assert sorted(path.name for path in (tmp_path / "model").iterdir()) == ["latest", "recent", "run_3", "run_4"]
+    assert recent.exists()
+
+
+def test_runs_to_remove_by_age_and_size(tmp_path):
+    old = _make_run(tmp_path, "a", "old", age_hours=72)
+    big = _make_run(tmp_path, "b", "big", age_hours=5, size=1000)
+    _make_run(tmp_path, "b", "small", age_hours=2, size=10)
+    _make_run(tmp_path, "b", "recent", age_hours=0.5, size=1000)
+    assert RunDirectoryManager(tmp_path, max_age_days=1).runs_to_remove() == [old]
+    assert RunDirectoryManager(tmp_path, max_total_bytes=1500).runs_to_remove() == [old, big]
+
+
+def test_from_env_only_removes_runs_when_configured(tmp_path, monkeypatch):
+    old = _make_run(tmp_path, "model", "old", age_hours=72)
+    for name in ["CHAP_RUNS_MAX_PER_MODEL", "CHAP_RUNS_MAX_AGE_DAYS", "CHAP_RUNS_MAX_TOTAL_GB"]:
+        monkeypatch.delenv(name, raising=False)
+    assert RunDirectoryManager.from_env(tmp_path).runs_to_remove() == []
+    monkeypatch.setenv("CHAP_RUNS_MAX_AGE_DAYS", "1")
+    assert RunDirectoryManager.from_env(tmp_path).runs_to_remove() == [old]
+    monkeypatch.setenv("CHAP_RUNS_PROTECT_HOURS", "100")
+    assert RunDirectoryManager.from_env(tmp_path).runs_to_remove() == []
+
+
+def test_new_run_dir_is_unique(tmp_path):
+    manager = RunDirectoryManager(tmp_path)
+    first, second = manager.new_run_dir("model"), manager.new_run_dir("model")
+    assert first != second
+    assert first.parent == tmp_path / "model"
+
+
+def test_data_file_store_deduplicates(tmp_path):
+    store = DataFileStore(tmp_path / ".data")
+    targets = [tmp_path / f"run_{i}" / "training_data.csv" for i in range(2)]
+    for target in targets:
+        target.parent.mkdir()
+        store.write(lambda path: path.write_text("a,b\n1,2\n"), target)
+    assert targets[0].read_text() == "a,b\n1,2\n"
+    assert os.path.samefile(targets[0], targets[1])
+    assert len(list((tmp_path / ".data").iterdir())) == 1
+
+    store.write(lambda path: path.write_text("a,b\n3,4\n"), targets[0])
+    assert targets[1].read_text() == "a,b\n1,2\n"
+    targets[1].unlink()
+    assert store.collect_garbage() == 1
+    assert len(list((tmp_path / ".data").iterdir())) == 1
+
+
+def test_data_file_store_write_survives_concurrent_garbage_collection(tmp_path, monkeypatch):
+    store = DataFileStore(tmp_path / ".data")
+    target = tmp_path / "run" / "training_data.csv"
+    target.parent.mkdir()
+    replace = os.replace
+
+    def replace_and_collect(src, dst):
+        replace(src, dst)
+        assert store.collect_garbage() == 0
+
+    monkeypatch.setattr("chap_core.external.run_directory.os.replace", replace_and_collect)
+    store.write(lambda path: path.write_text("a,b\n1,2\n"), target)
+    stored, = (tmp_path / ".data").iterdir()
+    assert os.path.samefile(stored, target)
+
+
+def test_data_store_is_only_used_with_linked_files(tmp_path):
+    assert RunDirectoryManager(tmp_path).data_store is None
+    assert isinstance(RunDirectoryManager(tmp_path, link_files=True).data_store, DataFileStore)
@@ -8,7 +8,7 @@ from chap_core.api_types import EvaluationEntry
 from chap_core.database.base_tables import DBModel
 from chap_core.database.database import SessionWrapper
 from chap_core.database.debug import DebugEntry
-from chap_core.database.tables import PredictionRead
+from chap_core.database.tables import BackTest, PredictionRead
 from chap_core.rest_api_src.v1.rest_api import app
 from fastapi.testclient import TestClient
 
@@ -69,7 +69,9 @@ def test_backtest_flow(celery_session_worker, clean_engine, dependency_overrides
         EvaluationEntry.model_validate(entry)
 
 
-def test_add_dataset_flow(celery_session_worker, dependency_overrides, dataset_create: DatasetCreate):
+@pytest.mark.parametrize("storage", ["observations", "arrays"])
+def test_add_dataset_flow(celery_session_worker, dependency_overrides, dataset_create: DatasetCreate, storage):
+    dataset_create.storage = storage
     response = client.post("/v1/crud/datasets", data=dataset_create.model_dump_json())
     assert response.status_code == 200, response.json()
     db_id = await_result_id(response.json()['id'])
@@ -102,3 +104,20 @@ def test_add_csv_dataset(celery_session_worker, dependency_overrides, data_path)
     geojson_data = open(data_path / 'nicaragua.json', 'rb')
     response = client.post('/v1/crud/datasets/csvFile', files={"csvFile": csv_data, "geojsonFile": geojson_data})
     assert response.status_code == 200, response.json()
+
+
+@pytest.mark.parametrize("storage", ["observations", "arrays"])
+def test_dataset_endpoints_with_storage(clean_engine, dependency_overrides, weekly_full_data, storage):
+    with SessionWrapper(clean_engine) as session:
+        dataset_id = session.add_dataset('full_data', weekly_full_data, 'polygons', storage=storage)
+        backtest = BackTest(dataset_id=dataset_id, model_id="naive_model")
+        session.session.add(backtest)
+        session.session.commit()
+        backtest_id = backtest.id
+    response = client.get(f"/v1/crud/datasets/{dataset_id}")
+    assert response.status_code == 200, response.json()
+    assert len(DataSetWithObservations.model_validate(response.json()).observations) > 0
+    response = client.get(f"/v1/analytics/actual-cases/{backtest_id}")
+    assert response.status_code == 200, response.json()
+    n_cases = sum(len(data) for data in weekly_full_data.values())
+    assert len(response.json()['data']) == n_cases
@@ -1,7 +1,15 @@
+import sys
 from pathlib import Path
 
+import docker.errors
+from diskcache import Cache
+
+from chap_core.docker_helper_functions import create_docker_image, ImageEvictionPolicy
+from chap_core.exceptions import CommandLineException, ModelServerError
 from chap_core.runners.command_line_runner import CommandLineRunner
 from chap_core.runners.docker_runner import DockerImageRunner, DockerRunner
+from chap_core.runners.model_server import ModelServer
+from chap_core.runners.runner import Runner
 import pytest
 
 from chap_core.util import docker_available
@@ -43,3 +51,149 @@ def test_run_command():
     command = "echo 'test2' >&2"
     output = CommandLineRunner("./").run_command(command)
     assert "test2" in output, "Output from command not as expected, output is: " + output
+
+
+echo_server_script = """
+import json, os, sys
+for line in sys.stdin:
+    request = json.loads(line)
+    print("not a response")
+    if request["command"] == "fail":
+        print(json.dumps({"status": "error", "message": "failed"}), flush=True)
+    else:
+        print(json.dumps({"status": "ok", "pid": os.getpid(), **request}), flush=True)
+"""
+
+
+def test_model_server(tmp_path):
+    (tmp_path / "server.py").write_text(echo_server_script)
+    server = ModelServer(CommandLineRunner(tmp_path), f"{sys.executable} server.py", request_timeout=30)
+    first = server.request("train", train_data="train.csv")
+    assert first["train_data"] == "train.csv"
+    assert server.request("predict")["pid"] == first["pid"]
+    with pytest.raises(CommandLineException):
+        server.request("fail")
+    server.stop()
+    assert not server.is_running
+
+
+def test_model_server_that_exits(tmp_path):
+    server = ModelServer(CommandLineRunner(tmp_path), "exit 1", request_timeout=30)
+    with pytest.raises(ModelServerError):
+        server.request("train")
+
+
+def test_model_server_needs_runner_that_supports_servers():
+    assert CommandLineRunner.supports_server and DockerRunner.supports_server
+    assert not Runner.supports_server
+    server = ModelServer(Runner(), "serve", request_timeout=30)
+    with pytest.raises(ModelServerError):
+        server.request("train")
+    assert not server.is_running
+
+
+class FakeImages:
+    def __init__(self):
+        self.labels = {}
+        self.removed = []
+
+    def get(self, name):
+        if name not in self.labels:
+            raise docker.errors.ImageNotFound(name)
+        return type("FakeImage", (), {"labels": self.labels[name]})()
+
+    def remove(self, name, force=False):
+        self.removed.append(name)
+        self.labels.pop(name, None)
+
+
+class FakeApi:
+    def __init__(self, images):
+        self._images = images
+        self.builds = []
+
+    def build(self, fileobj, tag, decode, labels=None):
+        self.builds.append(tag)
+        self._images.labels[tag] = labels or {}
+        return iter([{"stream": f"built {tag}"}])
+
+
+class FakeContainer:
+    def __init__(self, image, volumes):
+        self.id = f"{image}-{len(volumes)}"
+        self.volumes = volumes
+        self.status = "running"
+        self.commands = []
+
+    def reload(self):
+        pass
+
+    def exec_run(self, command, workdir):
+        self.commands.append(command)
+        return (1 if command.startswith("fail") else 0), b"output"
+
+    def remove(self, force=False):
+        self.status = "removed"
+
+
+class FakeContainers:
+    def __init__(self):
+        self.started = []
+
+    def run(self, image, volumes, **kwargs):
+        container = FakeContainer(image, volumes)
+        self.started.append(container)
+        return container
+
+
+class FakeDockerClient:
+    def __init__(self):
+        self.images = FakeImages()
+        self.api = FakeApi(self.images)
+        self.containers = FakeContainers()
+
+
+def test_docker_runner_reuses_container(tmp_path):
+    client = FakeDockerClient()
+    runner = DockerRunner("image", tmp_path / "a", reuse_container=True, client=client)
+    runner.run_command("train")
+    runner.run_command("predict")
+    other = runner.with_working_dir(tmp_path / "b")
+    other.run_command("predict")
+    with pytest.raises(CommandLineException):
+        runner.run_command("fail")
+    assert [container.commands for container in client.containers.started] == [
+        ["train", "predict", "fail"], ["predict"]]
+    runner.teardown()
+    assert client.containers.started[0].status == "running"
+    assert client.images.removed == []
+    runner.close()
+    other.close()
+    assert all(container.status == "removed" for container in client.containers.started)
+
+
+def test_docker_image_build_is_cached(tmp_path):
+    client = FakeDockerClient()
+    image_dir = tmp_path / "my_image"
+    image_dir.mkdir()
+    (image_dir / "Dockerfile").write_text("FROM ubuntu")
+    assert create_docker_image(image_dir, client=client) == "my_image"
+    create_docker_image(image_dir, client=client)
+    assert client.api.builds == ["my_image"]
+    (image_dir / "Dockerfile").write_text("FROM debian")
+    create_docker_image(image_dir, client=client)
+    assert client.api.builds == ["my_image", "my_image"]
+
+
+def test_image_eviction_policy(tmp_path):
+    client = FakeDockerClient()
+    with Cache(tmp_path) as cache:
+        policy = ImageEvictionPolicy(max_images=1, cache=cache)
+        for image in ["a", "b", "c"]:
+            policy.record_use(image)
+        assert policy.evict(client, in_use=("a",)) == ["b"]
+        assert client.images.removed == ["b"]
+    now = 10 * 24 * 3600
+    policy = ImageEvictionPolicy(max_unused_days=2)
+    assert policy.images_to_evict({"old": 0, "new": now - 3600}, now) == ["old"]
+
@@ -3,6 +3,7 @@ import pytest
 
 from chap_core.climate_predictor import (
     MonthlyClimatePredictor,
+    SeasonalStatisticsCache,
     WeeklyClimatePredictor,
 )
 from chap_core.datatypes import ClimateData
@@ -50,3 +51,42 @@ def test_weekly_climate_predictor(weekly_climate_data):
     predictor.train(weekly_climate_data)
     time_period = PeriodRange.from_time_periods(Week(2021, 1), Week(2021, 52))
     prediction = predictor.predict(time_period)
+
+
+def test_climate_predictor_matches_seasonal_regression(weekly_climate_data):
+    from sklearn import linear_model
+
+    predictor = WeeklyClimatePredictor()
+    predictor.train(weekly_climate_data)
+    time_period = PeriodRange.from_time_periods(Week(2021, 1), Week(2021, 52))
+    prediction = predictor.predict(time_period)
+    data = weekly_climate_data["oslo"]
+    x = data.time_period.week[:, None] == np.arange(1, 53)
+    model = linear_model.LinearRegression().fit(x, data.max_temperature)
+    expected = model.predict(time_period.week[:, None] == np.arange(1, 53))
+    np.testing.assert_allclose(prediction["oslo"].max_temperature, expected)
+
+
+def test_climate_predictor_trend():
+    time_period = PeriodRange.from_time_periods(Month.parse("2018-01"), Month.parse("2020-12"))
+    values = np.arange(len(time_period)) + 10.0 * (time_period.month == 1)
+    data = DataSet({"oslo": ClimateData(time_period, values, values * 2, values * 3)})
+    predictor = MonthlyClimatePredictor(trend=True)
+    predictor.train(data)
+    prediction = predictor.predict(PeriodRange.from_time_periods(Month.parse("2021-01"), Month.parse("2021-03")))
+    np.testing.assert_allclose(prediction["oslo"].rainfall, [46, 37, 38])
+    np.testing.assert_allclose(prediction["oslo"].max_temperature, [138, 111, 114])
+
+
+def test_statistics_cache_reuses_shared_prefix(weekly_climate_data):
+    cache = SeasonalStatisticsCache()
+    period_range = weekly_climate_data.period_range
+    for end in [60, 80, 70]:
+        train_data = weekly_climate_data.restrict_time_period(slice(None, period_range[end]))
+        cached = WeeklyClimatePredictor(trend=True)
+        cached.train(train_data, cache)
+        uncached = WeeklyClimatePredictor(trend=True)
+        uncached.train(train_data)
+        time_period = PeriodRange.from_time_periods(Week(2021, 1), Week(2021, 52))
+        np.testing.assert_allclose(cached.predict(time_period)["oslo"].mean_temperature,
+                                   uncached.predict(time_period)["oslo"].mean_temperature)
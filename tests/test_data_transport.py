@@ -0,0 +1,48 @@
+import os
+import time
+
+from pydantic_geojson import PointModel
+
+from chap_core.api_types import FeatureCollectionModel, FeatureModel
+from chap_core.datatypes import HealthPopulationData
+from chap_core.rest_api_src.data_transport import store_dataset, load_dataset, DataSetReference, remove_old_datasets
+from chap_core.testing.testing import assert_dataset_equal
+
+
+def test_store_and_load_dataset(health_population_data, tmp_path, monkeypatch):
+    monkeypatch.setenv("CHAP_SHARED_DATA_DIR", str(tmp_path))
+    health_population_data.set_polygons(FeatureCollectionModel(
+        type="FeatureCollection",
+        features=[FeatureModel(id=location, properties={"name": location},
+                               geometry=PointModel(type="Point", coordinates=[0, 0]), type="Feature")
+                  for location in health_population_data.keys()]))
+    reference = store_dataset(health_population_data)
+    assert isinstance(reference, DataSetReference)
+    assert store_dataset(health_population_data) == reference
+    assert len(list(tmp_path.iterdir())) == 1
+    dataset = load_dataset(reference, HealthPopulationData)
+    assert_dataset_equal(dataset, health_population_data)
+    assert dataset.polygons == health_population_data.polygons
+
+
+def test_load_dataset_from_dict(health_population_data):
+    dataset = load_dataset(health_population_data.model_dump(), HealthPopulationData)
+    assert_dataset_equal(dataset, health_population_data)
+
+
+def test_old_datasets_are_removed(health_population_data, tmp_path, monkeypatch):
+    monkeypatch.setenv("CHAP_SHARED_DATA_DIR", str(tmp_path))
+    old = tmp_path / "old.npz"
+    old.write_bytes(b"")
+    two_days_ago = time.time() - 48 * 3600
+    os.utime(old, (two_days_ago, two_days_ago))
+    reference = store_dataset(health_population_data)
+    assert not old.exists()
+    assert [path.name for path in tmp_path.iterdir()] == [reference.file_name]
+
+    stored = tmp_path / reference.file_name
+    os.utime(stored, (two_days_ago, two_days_ago))
+    assert store_dataset(health_population_data) == reference
+    assert stored.exists()
+    assert remove_old_datasets(max_age_hours=1, now=time.time() + 2 * 3600) == 1
+    assert not stored.exists()
@@ -1,12 +1,14 @@
+import numpy as np
 import pytest
 from sqlalchemy import create_engine
-from sqlmodel import SQLModel, Session, select
+from sqlmodel import SQLModel, Session, select, delete
 
-from chap_core.database.tables import BackTest
-from chap_core.database.dataset_tables import DataSet
+from chap_core.database.tables import BackTest, BackTestForecast, BackTestQuantiles, ForecastSamples
+from chap_core.database.dataset_tables import DataSet, DataSetArrays, Observation
 from chap_core.datatypes import HealthPopulationData
 from chap_core.rest_api_src.db_worker_functions import run_backtest, run_prediction
 from chap_core.testing.testing import assert_dataset_equal
+from chap_core.training_control import TrainingControl
 from chap_core.database.database import SessionWrapper
 import chap_core.database.database
 from chap_core.database.model_spec_tables import seeded_feature_types, seeded_models
@@ -60,3 +62,188 @@ def test_seed(seeded_engine):
             session.create_if_not_exists(feature_type)
 
 
+
+
+def test_add_dataset_in_batches(health_population_data, engine):
+    control = TrainingControl()
+    with SessionWrapper(engine) as session:
+        dataset_id = session.add_dataset('health_population', health_population_data, 'polygons',
+                                         batch_size=100, control=control)
+        n_observations = len(session.list_all(Observation))
+        assert n_observations == sum(len(data) * 2 for data in health_population_data.values())
+        assert control.get_progress() == 1
+        dataset = session.get_dataset(dataset_id, HealthPopulationData)
+        assert_dataset_equal(dataset, health_population_data)
+
+
+def test_dataset_roundtrip_array_storage(health_population_data, engine):
+    with SessionWrapper(engine) as session:
+        dataset_id = session.add_dataset('health_population', health_population_data, 'polygons', storage='arrays')
+        assert not session.list_all(Observation)
+        dataset = session.get_dataset(dataset_id, HealthPopulationData)
+        assert_dataset_equal(dataset, health_population_data)
+        observations = session.get_observations(dataset_id)
+        assert len(observations) == sum(len(data) * 2 for data in health_population_data.values())
+
+
+def test_array_storage_is_decoded_without_copying(health_population_data, engine):
+    with SessionWrapper(engine) as session:
+        dataset_id = session.add_dataset('health_population', health_population_data, 'polygons', storage='arrays')
+        arrays = session.session.exec(select(DataSetArrays)).one()
+        dataset = session.get_dataset(dataset_id, HealthPopulationData)
+    stored = np.frombuffer(arrays.values, dtype=float)
+    for field in dataset.fields.values():
+        assert not field.flags.writeable
+        assert np.shares_memory(field, stored)
+
+
+def test_migrate_dataset_to_arrays(health_population_data, engine):
+    with SessionWrapper(engine) as session:
+        dataset_id = session.add_dataset('health_population', health_population_data, 'polygons')
+        assert session.migrate_datasets_to_arrays() == [dataset_id]
+        assert not session.list_all(Observation)
+        assert len(session.list_all(DataSetArrays)) == 1
+        dataset = session.get_dataset(dataset_id, HealthPopulationData)
+        assert_dataset_equal(dataset, health_population_data)
+
+
+@pytest.mark.parametrize("storage", ["observations", "arrays"])
+def test_append_to_dataset(health_population_data, engine, storage):
+    period_range = health_population_data.period_range
+    locations = list(health_population_data.keys())
+    prefix = health_population_data.restrict_time_period(slice(None, period_range[-4])).filter_locations(locations[1:])
+    delta = health_population_data.restrict_time_period(slice(period_range[-3], None))
+    with SessionWrapper(engine) as session:
+        dataset_id = session.add_dataset('health_population', prefix, 'polygons', storage=storage)
+        assert session.append_to_dataset(dataset_id, delta) == 2
+        dataset = session.get_dataset(dataset_id, HealthPopulationData)
+        versions = session.get_dataset_versions(dataset_id)
+    assert [v.version for v in versions] == [1, 2]
+    assert versions[1].start_period == period_range[-3].id
+    assert set(dataset.keys()) == set(locations)
+    expected = health_population_data.filter_locations(locations[1:])
+    assert_dataset_equal(dataset.filter_locations(locations[1:]), expected)
+    np.testing.assert_array_equal(dataset[locations[0]].disease_cases[-3:],
+                                  health_population_data[locations[0]].disease_cases[-3:])
+    assert np.all(np.isnan(dataset[locations[0]].disease_cases[:-3]))
+
+
+@pytest.mark.parametrize("storage", ["observations", "arrays"])
+def test_unchanged_data_is_not_stored_again(health_population_data, engine, storage):
+    period_range = health_population_data.period_range
+    prefix = health_population_data.restrict_time_period(slice(None, period_range[-4]))
+    delta = health_population_data.restrict_time_period(slice(period_range[-3], None))
+    with SessionWrapper(engine) as session:
+        dataset_id = session.add_dataset('health_population', prefix, 'polygons', storage=storage)
+        n_datasets = len(session.session.exec(select(DataSet)).all())
+        assert session.add_dataset('health_population', prefix, 'polygons', storage=storage) == dataset_id
+        assert len(session.session.exec(select(DataSet)).all()) == n_datasets
+        assert session.add_dataset('other_name', prefix, 'polygons', storage=storage) != dataset_id
+        assert session.append_to_dataset(dataset_id, delta) == 2
+        n_observations = len(session.session.exec(select(Observation)).all())
+        assert session.append_to_dataset(dataset_id, delta) == 2
+        assert len(session.session.exec(select(Observation)).all()) == n_observations
+        assert [v.version for v in session.get_dataset_versions(dataset_id)] == [1, 2]
+        assert session.add_dataset('health_population', prefix, 'polygons', storage=storage) != dataset_id
+
+
+def test_evaluation_quantiles(seeded_engine):
+    with SessionWrapper(seeded_engine) as session:
+        dataset_id = session.session.exec(select(DataSet.id)).first()
+        backtest_id = run_backtest('naive_model', dataset_id, 12, 2, 1, session=session)
+        session.session.execute(delete(BackTestQuantiles))
+        computed = session.get_evaluation_quantiles(backtest_id, [0.1, 0.5])
+        session.session.rollback()
+        stored = session.get_evaluation_quantiles(backtest_id, [0.1, 0.5])
+        assert len(stored) == len(computed) == 12 * 2 * 10
+
+        def order(table):
+            return np.lexsort((table.periods.astype(str), table.org_units.astype(str),
+                               table.split_periods.astype(str)))
+
+        np.testing.assert_allclose(stored.values[order(stored)], computed.values[order(computed)])
+        assert len(session.get_evaluation_quantiles(backtest_id, [0.33]).to_records()) == 12 * 2 * 10
+
+
+@pytest.fixture
+def sample_predictions():
+    from chap_core.data import DataSet as InMemoryDataSet
+    from chap_core.datatypes import Samples
+    from chap_core.time_period import Month, PeriodRange
+
+    rng = np.random.default_rng(0)
+    return [InMemoryDataSet({location: Samples(PeriodRange.from_time_periods(Month(2023, month), Month(2023, month + 2)),
+                                               rng.normal(size=(3, 20)))
+                             for location in ["oslo", "bergen"]})
+            for month in [1, 2]]
+
+
+@pytest.mark.parametrize("storage", ["forecasts", "arrays"])
+def test_backtest_forecast_storage(engine, sample_predictions, storage):
+    from chap_core.time_period import Month
+
+    with SessionWrapper(engine) as session:
+        backtest_id = session.add_evaluation_results(sample_predictions, Month(2022, 12), 1, "model", storage=storage)
+        forecasts = list(session.get_backtest_forecasts(backtest_id))
+        assert len(forecasts) == 2 * 2 * 3
+        samples = session.get_backtest_samples(backtest_id, "bergen", "202303")
+        assert set(samples) == {"202301", "202302"}
+        np.testing.assert_allclose(samples["202302"], sample_predictions[1]["bergen"].samples[1], rtol=1e-6)
+        assert set(session.get_backtest_samples(backtest_id, "oslo", "202304")) == {"202302"}
+        assert session.get_backtest_samples(backtest_id, "trondheim", "202303") == {}
+        quantiles = session.get_evaluation_quantiles(backtest_id, [0.2])
+        assert len(quantiles) == len(forecasts)
+        stored = session.session.exec(select(ForecastSamples)).all()
+        assert len(stored) == (2 if storage == "arrays" else 0)
+
+
+def test_prediction_array_storage(engine, sample_predictions):
+    with SessionWrapper(engine) as session:
+        prediction_id = session.add_predictions(sample_predictions[0], 1, "model", storage="arrays")
+        forecasts = list(session.get_prediction_forecasts(prediction_id))
+        assert [(forecast.org_unit, forecast.period) for forecast in forecasts[:2]] == [("oslo", "202301"), ("oslo", "202302")]
+        np.testing.assert_allclose(forecasts[-1].values, sample_predictions[0]["bergen"].samples[-1], rtol=1e-6)
+
+
+def test_backtest_samples_are_read_without_loading_arrays(engine, sample_predictions):
+    from sqlalchemy import inspect
+    from sqlalchemy.orm import defer
+    from chap_core.time_period import Month
+
+    with SessionWrapper(engine) as session:
+        backtest_id = session.add_evaluation_results(sample_predictions, Month(2022, 12), 1, "model", storage="arrays")
+        session.session.expunge_all()
+        stored = session.session.exec(select(ForecastSamples).options(defer(ForecastSamples.values))).all()
+        samples = session.get_backtest_samples(backtest_id, "oslo", "202301")
+        np.testing.assert_allclose(samples["202301"], sample_predictions[0]["oslo"].samples[0], rtol=1e-6)
+        assert all("values" in inspect(obj).unloaded for obj in stored)
+
+
+def test_truncated_forecast_samples_are_rejected(engine, sample_predictions):
+    from chap_core.time_period import Month
+
+    with SessionWrapper(engine) as session:
+        backtest_id = session.add_evaluation_results(sample_predictions, Month(2022, 12), 1, "model", storage="arrays")
+        for stored in session.session.exec(select(ForecastSamples)).all():
+            stored.values = stored.values[:-4]
+        session.session.commit()
+        with pytest.raises(ValueError):
+            session.get_backtest_samples(backtest_id, "bergen", "202301")
+        with pytest.raises(ValueError):
+            list(session.get_backtest_forecasts(backtest_id))
+
+
+def test_evaluation_results_are_written_while_produced(engine, sample_predictions):
+    from chap_core.time_period import Month
+
+    with SessionWrapper(engine) as session:
+        stored_before_split = []
+
+        def results():
+            for predictions in sample_predictions:
+                stored_before_split.append(len(session.session.exec(select(BackTestForecast)).all()))
+                yield predictions
+
+        backtest_id = session.add_evaluation_results(results(), Month(2022, 12), 1, "model", batch_size=4)
+        assert stored_before_split == [0, 4]
+        assert len(list(session.get_backtest_forecasts(backtest_id))) == 12
@@ -1,3 +1,6 @@
+import numpy as np
+
+from chap_core.datatypes import HealthPopulationData
 from chap_core.spatio_temporal_data.multi_country_dataset import (
     MultiCountryDataSet,
 )
@@ -7,3 +10,12 @@ def test_from_tar():
     url = "https://github.com/dhis2/chap-core/raw/dev/example_data/full_data.tar.gz"
     dataset = MultiCountryDataSet.from_tar(url)
     assert "brazil" in dataset.countries
+
+
+def test_parquet_round_trip(health_population_data, tmp_path):
+    dataset = MultiCountryDataSet({"a": health_population_data, "b": health_population_data})
+    dataset.to_parquet(tmp_path)
+    period_range = health_population_data.period_range[:5]
+    read = MultiCountryDataSet.from_parquet(tmp_path, HealthPopulationData, countries=["b"], period_range=period_range)
+    assert read.countries == ["b"]
+    assert np.all(read.period_range == period_range)
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from chap_core.assessment.dataset_splitting import train_test_generator
+from chap_core.assessment.prediction_evaluator import backtest
+from chap_core.datatypes import Samples
+from chap_core.external.mlflow_wrappers import CommandLineTrainPredictRunner, ExternalModel
+from chap_core.runners.command_line_runner import CommandLineRunner
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+
+
+class SlowPredictor:
+    def __init__(self, working_dir=None):
+        self.working_dir = working_dir
+        self.seen_dirs = set()
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def train(self, data):
+        return self
+
+    def with_working_dir(self, working_dir):
+        predictor = SlowPredictor(working_dir)
+        predictor.seen_dirs = self.seen_dirs
+        return predictor
+
+    def predict(self, historic_data: DataSet, future_data: DataSet) -> DataSet:
+        with self._lock:
+            assert self._active == 0, "Two predictions ran concurrently in the same working dir"
+            self._active += 1
+        self.seen_dirs.add(self.working_dir)
+        # later splits finish first, to check that the order is kept
+        time.sleep(0.05 / len(historic_data.period_range))
+        n_periods = len(future_data.period_range)
+        result = DataSet({location: Samples(future_data.period_range,
+                                            np.full((n_periods, 1), len(historic_data.period_range)))
+                          for location in future_data.keys()})
+        with self._lock:
+            self._active -= 1
+        return result
+
+
+def test_parallel_backtest_keeps_split_order(health_population_data):
+    predictor = SlowPredictor()
+    serial = list(backtest(predictor, health_population_data, 3, 4))
+    parallel = list(backtest(predictor, health_population_data, 3, 4, n_workers=3))
+    assert len(parallel) == 4
+    for s, p in zip(serial, parallel):
+        assert np.all(s.period_range == p.period_range)
+        for location in s.keys():
+            np.testing.assert_array_equal(s[location].samples, p[location].samples)
+    assert len(predictor.seen_dirs - {None}) == 3
+
+
+def test_external_model_with_working_dir(tmp_path):
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "model").write_text("trained")
+    runner = CommandLineTrainPredictRunner(CommandLineRunner(model_dir), "train {train_data} {model}",
+                                           "predict {model} {out_file}")
+    model = ExternalModel(runner, name="test", working_dir=model_dir)
+    copied = model.with_working_dir(tmp_path / "worker")
+    assert (tmp_path / "worker" / "model").read_text() == "trained"
+    assert copied._runner._runner._working_dir == tmp_path / "worker"
+    assert model._runner._runner._working_dir == model_dir
+
+
+class RecordingEstimator:
+    def __init__(self):
+        self.train_lengths = []
+
+    def train(self, data):
+        self.train_lengths.append(len(data.period_range))
+        return SlowPredictor()
+
+
+class WarmStartRecordingEstimator(RecordingEstimator):
+    def __init__(self):
+        super().__init__()
+        self.warm_starts = []
+
+    def warm_start(self, data, predictor):
+        self.warm_starts.append((len(data.period_range), predictor))
+        return SlowPredictor()
+
+
+def test_expanding_window_backtest(health_population_data):
+    estimator = RecordingEstimator()
+    _, test_sets = train_test_generator(health_population_data, 3, 5, stride=2)
+    predictions = list(backtest(estimator, health_population_data, 3, 5, stride=2, n_workers=2, retrain_every=2,
+                                use_stride=True))
+    n_periods = len(health_population_data.period_range)
+    first_split = n_periods - (3 + 4 * 2 + 1) + 1
+    assert sorted(estimator.train_lengths) == [first_split, first_split + 4, first_split + 8]
+    assert len(predictions) == 5
+    for prediction, (_, future_data, _) in zip(predictions, test_sets):
+        assert np.all(prediction.period_range == future_data.period_range)
+
+
+def test_expanding_window_backtest_warm_start(health_population_data):
+    estimator = WarmStartRecordingEstimator()
+    predictions = list(backtest(estimator, health_population_data, 3, 4, retrain_every=1))
+    assert len(predictions) == 4
+    assert len(estimator.train_lengths) == 1
+    assert [length for length, _ in estimator.warm_starts] == [estimator.train_lengths[0] + i for i in range(1, 4)]
+
+
+def test_backtest_splits_do_not_depend_on_retraining(health_population_data):
+    single = list(backtest(RecordingEstimator(), health_population_data, 3, 4, stride=2, use_stride=True))
+    retrained = list(backtest(RecordingEstimator(), health_population_data, 3, 4, stride=2, retrain_every=2,
+                              use_stride=True))
+    assert [p.period_range[0].id for p in single] == [p.period_range[0].id for p in retrained]
+    _, test_sets = train_test_generator(health_population_data, 3, 4, stride=2)
+    assert [p.period_range[0].id for p in single] == [future.period_range[0].id for _, future, _ in test_sets]
+
+
+@pytest.mark.parametrize("retrain_every", [None, 2])
+def test_backtest_default_splits_are_consecutive(health_population_data, retrain_every):
+    predictions = list(backtest(RecordingEstimator(), health_population_data, 3, 4, stride=2,
+                                retrain_every=retrain_every))
+    _, test_sets = train_test_generator(health_population_data, 3, 4)
+    assert [p.period_range[0].id for p in predictions] == [future.period_range[0].id for _, future, _ in test_sets]
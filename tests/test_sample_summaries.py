@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from chap_core.assessment.sample_summaries import QuantileTable, summarize_samples
+from chap_core.datatypes import Samples
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.time_period import PeriodRange, Month
+
+
+@pytest.fixture
+def predictions():
+    period_range = PeriodRange.from_time_periods(Month.parse("2023-01"), Month.parse("2023-03"))
+    rng = np.random.default_rng(0)
+    return DataSet({location: Samples(period_range, rng.normal(size=(3, 50))) for location in ["oslo", "bergen"]})
+
+
+def test_summarize_samples(predictions):
+    summaries = summarize_samples(predictions, q_low=0.1, q_high=0.9)
+    for location, samples in predictions.items():
+        expected = samples.summaries(q_low=0.1, q_high=0.9)
+        for field in ["mean", "median", "std", "min", "max", "quantile_low", "quantile_high"]:
+            np.testing.assert_allclose(getattr(summaries[location], field), getattr(expected, field))
+
+
+def test_quantile_table_from_dataset(predictions):
+    quantiles = [0.1, 0.5, 0.9]
+    table = QuantileTable.from_dataset(predictions, quantiles, split_period="202212")
+    assert len(table) == 6
+    df = table.to_pandas()
+    row = df[(df.orgUnit == "bergen") & (df.period == "202302") & (df["quantile"] == 0.9)]
+    assert row.value.item() == pytest.approx(np.quantile(predictions["bergen"].samples[1], 0.9))
+    records = QuantileTable.concatenate([table, table]).to_records()
+    assert len(records) == 36
+    assert records[0] == {"orgUnit": "oslo", "period": "202301", "quantile": 0.1,
+                          "value": pytest.approx(np.quantile(predictions["oslo"].samples[0], 0.1)),
+                          "splitPeriod": "202212"}
+
+
+def test_quantile_table_from_samples():
+    samples = np.arange(20.0).reshape(2, 10)
+    table = QuantileTable.from_samples(["a", "b"], ["202301", "202301"], samples, [0.0, 1.0],
+                                       split_periods=["202212", "202211"])
+    np.testing.assert_allclose(table.values, [[0, 9], [10, 19]])
+    assert [record["splitPeriod"] for record in table.to_records()] == ["202212", "202212", "202211", "202211"]
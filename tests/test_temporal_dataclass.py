@@ -2,9 +2,12 @@ import pickle
 
 import pytest
 import numpy as np
+import pandas as pd
 from chap_core.api_types import PeriodObservation
-from chap_core.time_period import PeriodRange
-from chap_core.spatio_temporal_data.temporal_dataclass import DataSet
+from chap_core.datatypes import HealthData, HealthPopulationData, TimeSeriesArray, Samples, FullData
+from chap_core.time_period import PeriodRange, Week, Month
+from chap_core.spatio_temporal_data.temporal_dataclass import DataSet, DenseDataSet
+from chap_core.util import interpolate_nans
 
 
 class HealthObservation(PeriodObservation):
@@ -27,3 +30,156 @@ def test_from_period_observations(observations):
     assert np.all(
         d["Oslo"].time_period == PeriodRange.from_strings(["2020-01", "2020-02"])
     )
+
+
+@pytest.fixture
+def dense_health_population_data(health_population_data):
+    return DenseDataSet.from_dataset(health_population_data)
+
+
+def test_dense_dataset_location_access(health_population_data, dense_health_population_data):
+    assert list(dense_health_population_data.keys()) == list(health_population_data.keys())
+    assert dense_health_population_data.fields["disease_cases"].shape == (
+        len(health_population_data.keys()),
+        len(health_population_data.period_range),
+    )
+    for location, data in health_population_data.items():
+        dense_data = dense_health_population_data[location]
+        assert isinstance(dense_data, HealthPopulationData)
+        np.testing.assert_array_equal(dense_data.disease_cases, data.disease_cases)
+
+
+def test_dense_dataset_restrict_time_period(health_population_data, dense_health_population_data):
+    period_range = health_population_data.period_range
+    time_slice = slice(period_range[2], period_range[5])
+    dense = dense_health_population_data.restrict_time_period(time_slice)
+    expected = health_population_data.restrict_time_period(time_slice)
+    assert np.shares_memory(dense.fields["population"], dense_health_population_data.fields["population"])
+    assert len(dense.period_range) == 4
+    pd.testing.assert_frame_equal(dense.to_pandas(), expected.to_pandas(), check_dtype=False)
+
+
+def test_dense_dataset_interpolate():
+    period_range = PeriodRange.from_strings(["2020-01", "2020-02", "2020-03", "2020-04"])
+    values = np.array([[np.nan, 1.0, np.nan, 3.0], [2.0, np.nan, np.nan, 5.0]])
+    dataset = DenseDataSet.from_arrays(TimeSeriesArray, period_range, ["a", "b"], {"value": values})
+    interpolated = dataset.interpolate()
+    np.testing.assert_allclose(interpolated.fields["value"], [[1.0, 1.0, 2.0, 3.0], [2.0, 3.0, 4.0, 5.0]])
+    np.testing.assert_allclose(interpolated["b"].value, interpolate_nans(values[1].copy()))
+
+
+def test_dense_dataset_interpolate_samples():
+    period_range = PeriodRange.from_time_periods(Month(2020, 1), Month(2020, 4))
+    samples = np.arange(24.0).reshape(2, 4, 3)
+    samples[0, 1, 0] = samples[1, 2:, 2] = np.nan
+    dataset = DenseDataSet.from_dataset(DataSet({"a": Samples(period_range, samples[0]),
+                                                 "b": Samples(period_range, samples[1])}))
+    interpolated = dataset.interpolate().fields["samples"]
+    assert interpolated.shape == (2, 4, 3)
+    assert interpolated[0, 1, 0] == 3.0
+    np.testing.assert_allclose(interpolated[1, :, 2], [14.0, 17.0, 17.0, 17.0])
+    np.testing.assert_allclose(interpolated[:, :, 1], samples[:, :, 1])
+
+
+def test_dense_dataset_remove_field_and_merge(dense_health_population_data):
+    without_population = dense_health_population_data.remove_field("population")
+    assert "population" not in without_population.fields
+    population = dense_health_population_data.remove_field("disease_cases")
+    merged = without_population.merge(population, HealthPopulationData)
+    for location, data in dense_health_population_data.items():
+        np.testing.assert_array_equal(merged[location].population, data.population)
+
+
+def test_from_pandas_pads_locations_to_common_range():
+    df = pd.DataFrame(
+        {
+            "location": ["Oslo", "Oslo", "Bergen", "Bergen", "Bergen"],
+            "time_period": ["2020W2", "2020W3", "2020W1", "2020W3", "2020W2"],
+            "disease_cases": [10, 20, 30, 40, 50],
+        }
+    )
+    dataset = DataSet.from_pandas(df, HealthData)
+    assert list(dataset.keys()) == ["Bergen", "Oslo"]
+    assert len(dataset.period_range) == 3
+    np.testing.assert_array_equal(dataset["Bergen"].disease_cases, [30, 50, 40])
+    np.testing.assert_array_equal(dataset["Oslo"].disease_cases, [np.nan, 10, 20])
+
+
+def test_from_pandas_fill_missing():
+    df = pd.DataFrame(
+        {
+            "location": ["Oslo", "Oslo"],
+            "time_period": ["2020-01-06/2020-01-12", "2020-01-20/2020-01-26"],
+            "disease_cases": [10, 20],
+        }
+    )
+    with pytest.raises(ValueError):
+        DataSet.from_pandas(df, HealthData)
+    dataset = DataSet.from_pandas(df, HealthData, fill_missing=True)
+    np.testing.assert_array_equal(dataset["Oslo"].disease_cases, [10, np.nan, 20])
+    assert dataset.period_range[0] == Week(2020, 2)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100_000])
+def test_from_csv_in_chunks(data_path, chunk_size):
+    file_name = data_path / "health_population_data.csv"
+    expected = DataSet.from_csv(file_name, HealthPopulationData, chunk_size=None)
+    with open(file_name) as f:
+        dataset = DataSet.from_csv(f, HealthPopulationData, chunk_size=chunk_size)
+    assert list(dataset.keys()) == list(expected.keys())
+    pd.testing.assert_frame_equal(dataset.to_pandas(), expected.to_pandas(), check_dtype=False)
+
+
+def test_from_csv_in_chunks_with_mixed_location_types(tmp_path):
+    pd.DataFrame(
+        {
+            "location": ["1", "1", "Oslo", "Oslo"],
+            "time_period": ["2020-01", "2020-02", "2020-01", "2020-02"],
+            "disease_cases": [10, 20, 30, 40],
+        }
+    ).to_csv(tmp_path / "data.csv", index=False)
+    dataset = DataSet.from_csv(tmp_path / "data.csv", HealthData, chunk_size=2)
+    assert list(dataset.keys()) == ["1", "Oslo"]
+    np.testing.assert_array_equal(dataset["1"].disease_cases, [10, 20])
+
+
+def test_from_csv_in_chunks_pads_locations(tmp_path):
+    pd.DataFrame(
+        {
+            "location": ["Oslo", "Oslo", "Bergen", "Bergen", "Bergen"],
+            "time_period": ["2020W2", "2020W3", "2020W1", "2020W3", "2020W2"],
+            "disease_cases": [10, 20, 30, 40, 50],
+        }
+    ).to_csv(tmp_path / "data.csv", index=False)
+    dataset = DataSet.from_csv(tmp_path / "data.csv", HealthData, chunk_size=2)
+    assert list(dataset.keys()) == ["Bergen", "Oslo"]
+    np.testing.assert_array_equal(dataset["Bergen"].disease_cases, [30, 50, 40])
+    np.testing.assert_array_equal(dataset["Oslo"].disease_cases, [np.nan, 10, 20])
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_parquet_and_arrow_round_trip(weekly_full_data, tmp_path, file_format):
+    file_name = tmp_path / f"data.{file_format}"
+    getattr(weekly_full_data, f"to_{file_format}")(file_name)
+    dataset = DataSet.from_file(str(file_name), FullData)
+    pd.testing.assert_frame_equal(dataset.to_pandas(), weekly_full_data.to_pandas(), check_dtype=False)
+
+    locations = list(weekly_full_data.keys())[1:3]
+    period_range = weekly_full_data.period_range[10:20]
+    subset = getattr(DataSet, f"from_{file_format}")(file_name, HealthData, locations=locations,
+                                                       period_range=period_range)
+    assert list(subset.keys()) == sorted(locations)
+    assert np.all(subset.period_range == period_range)
+    np.testing.assert_array_equal(subset[locations[0]].disease_cases,
+                                  weekly_full_data[locations[0]].disease_cases[10:20])
+
+
+def test_samples_parquet_round_trip(tmp_path):
+    period_range = PeriodRange.from_time_periods(Month(2020, 1), Month(2020, 12))
+    samples = DataSet({location: Samples(period_range, np.random.rand(12, 100)) for location in ["b", "a"]})
+    samples.to_parquet(tmp_path / "samples.parquet")
+    dataset = DenseDataSet.from_parquet(tmp_path / "samples.parquet", Samples)
+    assert list(dataset.keys()) == ["a", "b"]
+    assert dataset.fields["samples"].shape == (2, 12, 100)
+    for location in samples.keys():
+        np.testing.assert_array_equal(dataset[location].samples, samples[location].samples)
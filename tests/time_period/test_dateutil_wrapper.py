@@ -14,6 +14,8 @@ from chap_core.time_period.date_util_wrapper import (
     Day,
     Year,
     Week,
+    clean_timestrings,
+    parse_period_strings,
 )
 
 
@@ -251,3 +253,86 @@ def test_from_start_and_n_periods():
     period_range = PeriodRange.from_start_and_n_periods(start_period, n_periods)
     assert len(period_range) == n_periods
     assert period_range[0] == TimePeriod.from_pandas(start_period)
+
+
+def test_weekly_period_range_indexing(weekly_period_range):
+    assert len(weekly_period_range) == 3
+    assert weekly_period_range[1] == Week(2020, 2)
+    assert weekly_period_range[-1] == Week(2020, 3)
+    assert list(weekly_period_range[1:]) == [Week(2020, 2), Week(2020, 3)]
+    assert weekly_period_range.searchsorted(Week(2020, 2)) == 1
+    assert weekly_period_range.searchsorted(Week(2021, 2)) == 3
+
+
+def test_period_range_compare_ranges(period_range):
+    assert np.all(period_range == period_range)
+    mask = period_range[:-1] < period_range[1:]
+    assert mask.dtype == bool and np.all(mask)
+    assert not np.any(period_range[1:] <= period_range[:-1])
+
+
+@pytest.mark.parametrize("op", ["__lt__", "__le__", "__gt__", "__ge__", "__eq__", "__ne__"])
+def test_period_range_compare_mixed_week_anchors(op):
+    period_range = PeriodRange.from_time_periods(Week(2023, 1), Week(2023, 5))
+    sunday_week = TimePeriod.from_id("2023SunW03")
+    expected = [getattr(period, op)(sunday_week) for period in period_range]
+    assert getattr(period_range, op)(sunday_week).tolist() == expected
+    sunday_range = PeriodRange.from_time_periods(TimePeriod.from_id("2023SunW01"), TimePeriod.from_id("2023SunW05"))
+    expected = [getattr(period, op)(other) for period, other in zip(period_range, sunday_range)]
+    assert getattr(period_range, op)(sunday_range).tolist() == expected
+
+
+def test_period_range_fields(period_range, weekly_period_range):
+    assert period_range.month.tolist() == list(range(1, 13)) + [1, 2]
+    assert period_range.year.tolist() == [2020] * 12 + [2021] * 2
+    assert weekly_period_range.week.tolist() == [1, 2, 3]
+
+
+def test_sunday_week_period_range():
+    period_range = PeriodRange.from_time_periods(TimePeriod.from_id("2023SunW01"), TimePeriod.from_id("2023SunW04"))
+    assert len(period_range) == 4
+    assert period_range[2].id == "2023SunW03"
+    assert period_range.ordinals[1] - period_range.ordinals[0] == 7
+
+
+@pytest.mark.parametrize(
+    "strings, first",
+    [
+        (["2020", "2021"], Year(2020)),
+        (["202001", "202002"], Month(2020, 1)),
+        (["2020-1", "2020-2"], Month(2020, 1)),
+        (["20200131", "20200201"], Day(2020, 1, 31)),
+        (["2020-12-31", "2021-01-01"], Day(2020, 12, 31)),
+        (["2020W53", "2021W01"], Week(2020, 53)),
+        (["2023SunW01", "2023SunW02"], TimePeriod.from_id("2023SunW01")),
+        (["2020-01-06/2020-01-12", "2020-01-13/2020-01-19"], Week(2020, 2)),
+    ],
+)
+def test_parse_period_strings(strings, first):
+    period_range = PeriodRange.from_strings(strings)
+    assert len(period_range) == 2
+    assert period_range[0] == first
+    assert PeriodRange.from_ids(strings)[0] == first
+
+
+def test_parse_period_strings_invalid_falls_back():
+    assert parse_period_strings(["2021W53"]) is None
+    assert parse_period_strings(["2020-13"]) is None
+    assert parse_period_strings(["2020-01-06/2020-01-19"]) is None
+
+
+def test_from_strings_not_consecutive():
+    with pytest.raises(ValueError):
+        PeriodRange.from_strings(["2020W1", "2020W3"])
+
+
+def test_clean_timestrings():
+    cleaned = clean_timestrings(pd.Series(["2020W1", "2020W12", "2020SunW3", "2020-01", 2020]))
+    assert cleaned.tolist() == ["2020W01", "2020W12", "2020SunW03", "2020-01", "2020"]
+
+
+def test_parse_period_strings_mixed_formats_falls_back():
+    assert parse_period_strings(["2020", "2021", "202203"]) is None
+    assert parse_period_strings(["202001", "2020012"]) is None
+    with pytest.raises(ValueError):
+        PeriodRange.from_strings(["2020", "2021", "202203"])